@@ -1,11 +1,13 @@
 '''
 This is the main entry point for SeaSnake.
 '''
-from __future__ import unicode_literals
+from __future__ import unicode_literals, print_function
 
 import argparse
 import sys
 
+from seasnake.bytecode import BytecodeCompiler
+from seasnake.cache import EmissionCache
 from seasnake.parser import CodeConverter
 
 
@@ -26,6 +28,224 @@ def main():
         action='store_true'
     )
 
+    opts.add_argument(
+        '-d', '--directory',
+        metavar='/path/to/output',
+        help='A directory in which to write the output modules as a package.',
+    )
+
+    opts.add_argument(
+        '--source-map',
+        help='Write a map from each generated line to the C++ source that '
+             'produced it alongside each module (requires --directory).',
+        action='store_true'
+    )
+
+    opts.add_argument(
+        '--eager-imports',
+        help='Import every submodule of a package when the package is '
+             'imported, rather than on first access (requires --directory).',
+        action='store_true'
+    )
+
+    opts.add_argument(
+        '--shard-lines',
+        metavar='N',
+        help='Split any module longer than N lines into several shard '
+             'modules (requires --directory).',
+        type=int,
+    )
+
+    opts.add_argument(
+        '--shard-declarations',
+        metavar='N',
+        help='Split any module with more than N declarations into several '
+             'shard modules (requires --directory).',
+        type=int,
+    )
+
+    opts.add_argument(
+        '--cache',
+        metavar='/path/to/cache',
+        help='A directory in which to cache the code generated for each '
+             'declaration, for reuse when the declaration is unchanged '
+             '(requires --directory).',
+    )
+
+    opts.add_argument(
+        '--slots',
+        help='Declare the instance attributes of each generated class '
+             'using __slots__. Base classes keep a __weakref__ slot (one '
+             'pointer per instance) so they can still be weakly referenced.',
+        action='store_true'
+    )
+
+    opts.add_argument(
+        '--fold-constants',
+        help='Replace integer expressions whose value is known at '
+             'conversion time with a literal.',
+        action='store_true'
+    )
+
+    opts.add_argument(
+        '--inline-enums',
+        help='Use the integer value of each enumerated value wherever it '
+             'is used, rather than looking it up on the enumeration.',
+        action='store_true'
+    )
+
+    opts.add_argument(
+        '--switch-table-size',
+        metavar='N',
+        help='Dispatch any switch with at least N case labels using a '
+             'lookup table (default: 8; 0 disables lookup tables).',
+        type=int,
+        default=8,
+    )
+
+    opts.add_argument(
+        '--inline',
+        help='Replace calls to small functions and non-virtual methods '
+             'with the body of the function.',
+        action='store_true'
+    )
+
+    opts.add_argument(
+        '--inline-size',
+        metavar='N',
+        help='The largest function body, in model nodes, that will be '
+             'inlined (default: 12).',
+        type=int,
+        default=12,
+    )
+
+    opts.add_argument(
+        '--no-wrap-unsigned',
+        dest='wrap_unsigned',
+        help="Don't mask the result of unsigned arithmetic to the width "
+             "of its type (faster, but wrong if the arithmetic overflows).",
+        action='store_false'
+    )
+
+    opts.add_argument(
+        '--hoist-lookups',
+        help='Read attributes, functions and globals that are used but '
+             'not changed inside a loop into local variables before the '
+             'loop starts.',
+        action='store_true'
+    )
+
+    opts.add_argument(
+        '--columnar-structs',
+        help='Store a fixed-size array of a struct that only contains '
+             'numbers as one typed array per attribute.',
+        action='store_true'
+    )
+
+    opts.add_argument(
+        '--no-byte-cursors',
+        dest='byte_cursors',
+        help="Don't represent a pointer into a byte buffer as the buffer "
+             "and an integer index.",
+        action='store_false'
+    )
+
+    opts.add_argument(
+        '--numpy',
+        help='Replace loops that apply the same arithmetic to each element '
+             'of some arrays with NumPy operations. The generated code will '
+             'require NumPy.',
+        action='store_true'
+    )
+
+    opts.add_argument(
+        '--char-codes',
+        help='Represent char values as integer character codes, and string '
+             'literals as bytes.',
+        action='store_true'
+    )
+
+    opts.add_argument(
+        '--eliminate-dead-code',
+        help='Remove code that can never be executed, and local variables '
+             'that are never read.',
+        action='store_true'
+    )
+
+    opts.add_argument(
+        '--entry',
+        dest='entries',
+        metavar='NAME',
+        help='Only generate the declaration with the full C++ name NAME '
+             '(e.g., ns::function or ns::Class), and the declarations it '
+             'depends on. Can be used more than once.',
+        action='append',
+        default=[]
+    )
+
+    opts.add_argument(
+        '--lazy-bodies',
+        help='Only convert the body of a function when code is generated '
+             'for it (with --entry, unneeded bodies are never converted).',
+        action='store_true'
+    )
+
+    opts.add_argument(
+        '--destructors',
+        help='How to convert destructors: as __del__ (del, the default); '
+             'or, dropping destructors that only release memory, as '
+             '__del__ (drop), as a weakref.finalize callback (finalize), '
+             'or as close() and a context manager (close).',
+        choices=['del', 'drop', 'finalize', 'close'],
+        default='del'
+    )
+
+    opts.add_argument(
+        '--memoize',
+        help='Cache the results of functions declared constexpr, or with '
+             'the const or pure attribute, using functools.lru_cache '
+             '(lru_cache) or a bounded dict (dict).',
+        choices=['lru_cache', 'dict'],
+    )
+
+    opts.add_argument(
+        '--memoize-size',
+        metavar='N',
+        help='The number of results cached for each memoized function '
+             '(default: 128).',
+        type=int,
+        default=128,
+    )
+
+    opts.add_argument(
+        '--annotate',
+        help='Annotate the generated code with the Python types of '
+             'parameters, return values, attributes and variables, so it '
+             'can be compiled with mypyc.',
+        action='store_true'
+    )
+
+    opts.add_argument(
+        '-c', '--compile',
+        dest='optimize',
+        metavar='LEVEL',
+        help='Byte-compile each module as it is written, using the given '
+             'optimization level (0, 1 or 2). Can be used more than once. '
+             'On Python 2, the level of the running interpreter is used.',
+        type=int,
+        choices=[0, 1, 2],
+        action='append',
+        default=[]
+    )
+
+    opts.add_argument(
+        '-j', '--jobs',
+        metavar='N',
+        help='The number of processes to use for byte-compilation '
+             '(default: one per CPU)',
+        type=int,
+    )
+
     opts.add_argument(
         '-v', '--verbosity',
         action='count',
@@ -71,7 +291,29 @@ def main():
 
     args = opts.parse_args()
 
-    converter = CodeConverter('output', verbosity=args.verbosity)
+    converter = CodeConverter(
+        'output',
+        verbosity=args.verbosity,
+        slots=args.slots,
+        fold_constants=args.fold_constants,
+        inline_enums=args.inline_enums,
+        switch_table_size=args.switch_table_size,
+        inline=args.inline,
+        inline_size=args.inline_size,
+        wrap_unsigned=args.wrap_unsigned,
+        hoist_lookups=args.hoist_lookups,
+        columnar_structs=args.columnar_structs,
+        byte_cursors=args.byte_cursors,
+        numpy=args.numpy,
+        char_codes=args.char_codes,
+        eliminate_dead_code=args.eliminate_dead_code,
+        entries=args.entries,
+        lazy_bodies=args.lazy_bodies,
+        destructors=args.destructors,
+        memoize=args.memoize,
+        memoize_size=args.memoize_size,
+        annotate=args.annotate,
+    )
     converter.parse(
         args.filename,
         flags=[
@@ -87,15 +329,41 @@ def main():
 
     converter.diagnostics(sys.stderr)
 
-    if args.output:
+    if args.optimize:
+        compiler = BytecodeCompiler(args.optimize, workers=args.jobs)
+    else:
+        compiler = None
+
+    if args.directory:
+        converter.write(
+            args.directory,
+            compiler=compiler,
+            source_map=args.source_map,
+            lazy=not args.eager_imports,
+            shard_lines=args.shard_lines,
+            shard_declarations=args.shard_declarations,
+            cache=EmissionCache(args.cache) if args.cache else None,
+        )
+    elif args.output:
         with open('%s.py' % args.output, 'w') as out:
             converter.output('%s.py' % args.output, out)
+        if compiler:
+            compiler.compile('%s.py' % args.output)
     else:
         if args.stdout:
             converter.output_all(sys.stdout)
         else:
             print("Can't output multiple files (yet!)")
 
+    if compiler:
+        failures = compiler.join()
+        for filename, level, message in failures:
+            print('Unable to compile %s (optimization level %s): %s' % (
+                    filename, level, message
+                ), file=sys.stderr)
+        if failures:
+            sys.exit(1)
+
 
 if __name__ == '__main__':
     main()
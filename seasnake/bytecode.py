@@ -0,0 +1,74 @@
+###########################################################################
+# Bytecode compiler
+#
+# Byte-compiles generated modules as they are written, so that the
+# first import of the generated code on a deployment host doesn't need
+# to compile anything, and so that syntax errors in generated code are
+# reported at conversion time.
+###########################################################################
+from __future__ import unicode_literals, print_function
+
+import multiprocessing
+import py_compile
+import sys
+
+# Can the optimization level be chosen? Before Python 3.2, modules are
+# always compiled at the level of the current interpreter.
+HAS_OPTIMIZE = sys.version_info >= (3, 2)
+
+
+def _compile(filename, optimize):
+    # Compile a single file at a single optimization level. This runs
+    # in a worker process, so it must be a module-level function; it
+    # returns an error message rather than raising, so that one bad
+    # module doesn't abort the whole pool.
+    try:
+        if HAS_OPTIMIZE:
+            py_compile.compile(filename, doraise=True, optimize=optimize)
+        else:
+            py_compile.compile(filename, doraise=True)
+    except py_compile.PyCompileError as e:
+        return e.msg
+    except (IOError, OSError) as e:
+        return str(e)
+
+
+class BytecodeCompiler(object):
+    """Compile Python modules in parallel, as they are written.
+
+    `optimize` is a list of optimization levels; each module is compiled
+    once for each level (-1 uses the level of the current interpreter,
+    0, 1 and 2 match python, python -O and python -OO). Before Python
+    3.2, the level can't be chosen, so each module is compiled once, at
+    the level of the current interpreter. `workers` is the number of
+    worker processes to use; by default, one per CPU.
+    """
+    def __init__(self, optimize=None, workers=None):
+        self.optimize = optimize if optimize and HAS_OPTIMIZE else [-1]
+        self.pool = multiprocessing.Pool(workers)
+        self.pending = []
+
+    def compile(self, filename):
+        for level in self.optimize:
+            self.pending.append((
+                filename,
+                level,
+                self.pool.apply_async(_compile, (filename, level))
+            ))
+
+    def join(self):
+        """Wait for all outstanding compilations to finish.
+
+        Returns a list of (filename, level, message) tuples describing
+        every module that failed to compile.
+        """
+        self.pool.close()
+        self.pool.join()
+
+        failures = []
+        for filename, level, result in self.pending:
+            message = result.get()
+            if message:
+                failures.append((filename, level, message))
+        self.pending = []
+        return failures
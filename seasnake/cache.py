@@ -0,0 +1,168 @@
+###########################################################################
+# Emission cache
+#
+# Most top-level declarations produce exactly the same Python each time
+# a library is reconverted. The emission cache stores the generated code
+# for each top-level class, struct and function, keyed by a structural
+# fingerprint of its model subtree; re-emitting an unchanged declaration
+# is then a hash lookup, rather than a full output() traversal.
+###########################################################################
+from __future__ import unicode_literals, print_function
+
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+from collections import OrderedDict
+
+from . import __version__
+from .model import Expression, CONSUMED, UNDEFINED
+from .writer import CodeWriter
+
+# Python 2 compatibility shims
+if sys.version_info.major <= 2:
+    text = unicode
+else:
+    text = str
+
+
+# Increment this whenever a change to the model or the writer would
+# change the code generated for a model that hasn't changed.
+CACHE_VERSION = 1
+
+
+def _reference(decl):
+    # A reference to a declaration elsewhere in the tree is described
+    # by the names used to refer to it, not by its content.
+    if decl is None:
+        return None
+    try:
+        full_name = decl.full_name
+    except TypeError:
+        # Anonymous declarations don't have a full name.
+        full_name = decl.name
+    return (decl.__class__.__name__, full_name, getattr(decl, 'module_name', None))
+
+
+def describe(value, locations=False):
+    """Return a structure of tuples and simple values describing `value`.
+
+    Two model subtrees with the same description will produce the same
+    generated code. If `locations` is True, the C++ source location of
+    each node is included in the description.
+    """
+    if value is None or isinstance(value, (bool, int, float, text)):
+        return value
+    elif value is UNDEFINED:
+        return '<undefined>'
+    elif value is CONSUMED:
+        return '<consumed>'
+    elif isinstance(value, Expression):
+        description = [value.__class__.__name__]
+        if locations:
+            description.append(value.location)
+        for field in value.fields:
+            description.append(describe(getattr(value, field), locations))
+        for reference in value.references:
+            description.append(_reference(getattr(value, reference)))
+        return tuple(description)
+    elif isinstance(value, OrderedDict):
+        return tuple(
+            (describe(key), describe(item, locations))
+            for key, item in value.items()
+        )
+    elif isinstance(value, dict):
+        return tuple(sorted(
+            (describe(key), describe(item, locations))
+            for key, item in value.items()
+        ))
+    elif isinstance(value, (list, tuple)):
+        return tuple(describe(item, locations) for item in value)
+    else:
+        return text(value)
+
+
+def fingerprint(node, locations=False, options=None):
+    """Return a stable hash of the structure of the model subtree at `node`.
+
+    If `options` is provided, the hash also depends on the options used
+    to generate code from the subtree.
+    """
+    description = repr((
+        CACHE_VERSION,
+        __version__,
+        describe(node, locations),
+        describe(options),
+    ))
+    return hashlib.sha1(description.encode('utf-8')).hexdigest()
+
+
+class EmissionCache(object):
+    """A persistent cache of the code generated for top-level declarations.
+
+    Each entry is stored as a JSON file in `directory`, named after the
+    fingerprint of the declaration that produced it.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def filename(self, key):
+        return os.path.join(self.directory, key[:2], '%s.json' % key)
+
+    def load(self, key):
+        try:
+            with io.open(self.filename(key), encoding='utf-8') as data:
+                entry = json.load(data)
+        except (IOError, OSError, ValueError):
+            return None
+
+        return entry['code'], dict(
+            (int(line), tuple(location))
+            for line, location in entry['lines'].items()
+        )
+
+    def save(self, key, code, lines):
+        filename = self.filename(key)
+        directory = os.path.dirname(filename)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        # Write to a temporary file, then move it into place, so that a
+        # concurrent reader never sees a partially written entry.
+        fd, temp_filename = tempfile.mkstemp(dir=directory)
+        with io.open(fd, 'w', encoding='utf-8') as out:
+            out.write(text(json.dumps({
+                'code': code,
+                'lines': dict(
+                    (str(line), list(location))
+                    for line, location in lines.items()
+                ),
+            })))
+        os.rename(temp_filename, filename)
+
+    def output(self, decl, out):
+        "Output `decl` to the writer `out`, using cached code if possible."
+        source_map = out.source_map is not None
+        key = fingerprint(decl, locations=source_map, options=out.options)
+
+        entry = self.load(key)
+        if entry:
+            self.hits += 1
+            code, lines = entry
+        else:
+            self.misses += 1
+            buf = io.StringIO()
+            writer = CodeWriter(buf, source_map=source_map, options=out.options)
+            writer.mark(decl)
+            decl.output(writer)
+            code = buf.getvalue()
+            lines = writer.source_map if source_map else {}
+            self.save(key, code, lines)
+
+        out.clear_major_block()
+        out.write_block(code, lines)
+        out.clear_major_block()
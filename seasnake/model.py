@@ -7,6 +7,7 @@
 ###########################################################################
 from __future__ import unicode_literals, print_function
 
+import copy
 import sys
 
 from collections import OrderedDict
@@ -22,18 +23,22 @@ else:
 
 __all__ = (
     'CONSUMED', 'UNDEFINED',
+    'CHARACTER_TYPES', 'INTEGER_TYPES', 'FLOAT_TYPES',
+    'BYTE_TYPES', 'ARRAY_TYPECODES',
+    'integer_value',
     'Module',
     'Enumeration', 'EnumValue',
     'Function', 'Parameter', 'Variable',
     'Typedef',
     'Class', 'Struct', 'Union',
     'Attribute', 'Constructor', 'Destructor', 'Method',
-    'Return', 'Block', 'If', 'Do', 'While', 'For',
+    'Return', 'Block', 'If', 'Do', 'While', 'For', 'Switch', 'Case',
     'Break', 'Continue',
     'VariableReference', 'TypeReference', 'PrimitiveTypeReference', 'AttributeReference', 'SelfReference',
-    'Literal', 'ListLiteral',
+    'Annotation',
+    'Literal', 'ListLiteral', 'DictLiteral', 'ArrayStorage', 'ColumnStorage',
     'UnaryOperation', 'BinaryOperation', 'ConditionalOperation',
-    'Parentheses', 'ArraySubscript',
+    'Parentheses', 'ArraySubscript', 'Slice', 'NumpyReference',
     'Cast', 'Invoke', 'New',
 )
 
@@ -44,17 +49,177 @@ CONSUMED = object()
 # A marker for unknown values
 UNDEFINED = object()
 
+# The C types that are represented by each Python type.
+CHARACTER_TYPES = (
+    TypeKind.CHAR_U,
+    TypeKind.UCHAR,
+    TypeKind.CHAR16,
+    TypeKind.CHAR32,
+    TypeKind.CHAR_S,
+    TypeKind.SCHAR,
+    TypeKind.WCHAR,
+)
+
+INTEGER_TYPES = (
+    TypeKind.USHORT,
+    TypeKind.UINT,
+    TypeKind.ULONG,
+    TypeKind.ULONGLONG,
+    TypeKind.UINT128,
+    TypeKind.SHORT,
+    TypeKind.INT,
+    TypeKind.LONG,
+    TypeKind.LONGLONG,
+    TypeKind.INT128,
+)
+
+FLOAT_TYPES = (
+    TypeKind.FLOAT,
+    TypeKind.DOUBLE,
+    TypeKind.LONGDOUBLE,
+)
+
+# The C types whose arrays are stored as a bytearray.
+BYTE_TYPES = (
+    TypeKind.CHAR_U,
+    TypeKind.UCHAR,
+    TypeKind.CHAR_S,
+)
+
+# The array module typecode used to store arrays of each C type.
+ARRAY_TYPECODES = {
+    TypeKind.SCHAR: 'b',
+    TypeKind.SHORT: 'h',
+    TypeKind.USHORT: 'H',
+    TypeKind.INT: 'i',
+    TypeKind.UINT: 'I',
+    TypeKind.LONG: 'l',
+    TypeKind.ULONG: 'L',
+    TypeKind.LONGLONG: 'q',
+    TypeKind.ULONGLONG: 'Q',
+    TypeKind.CHAR16: 'H',
+    TypeKind.CHAR32: 'I',
+    TypeKind.FLOAT: 'f',
+    TypeKind.DOUBLE: 'd',
+    TypeKind.LONGDOUBLE: 'd',
+}
+
+# The Python types used to represent primitive C types.
+PRIMITIVE_PYTHON_TYPES = {
+    'bool': 'bool',
+    'char': 'str',
+    'signed char': 'int',
+    'unsigned char': 'int',
+    'short': 'int',
+    'unsigned short': 'int',
+    'int': 'int',
+    'unsigned int': 'int',
+    'unsigned': 'int',
+    'long': 'int',
+    'unsigned long': 'int',
+    'long long': 'int',
+    'unsigned long long': 'int',
+    'float': 'float',
+    'double': 'float',
+    'long double': 'float',
+}
+
+# The operators that assign a new value to their left operand.
+ASSIGNMENT_OPERATORS = (
+    '=', '+=', '-=', '*=', '/=', '//=', '%=', '&=', '|=', '^=', '<<=', '>>=',
+)
+
+
+def integer_value(expr):
+    """Return the value of an integer literal expression.
+
+    Returns None if the expression isn't an integer literal.
+    """
+    while isinstance(expr, Parentheses):
+        expr = expr.body
+
+    if isinstance(expr, UnaryOperation) and expr.name == '-':
+        value = integer_value(expr.value)
+        return None if value is None else -value
+    elif not isinstance(expr, Literal) or isinstance(expr.value, bool):
+        return None
+
+    # Strip any C type suffix (e.g., 10u, 10L, 10ULL)
+    value = text(expr.value).rstrip('uUlL')
+    try:
+        if len(value) > 1 and value[0] == '0' and value[1] not in 'xXbB':
+            return int(value, 8)
+        return int(value, 0)
+    except ValueError:
+        return None
+
+
+def tuple_literal(names):
+    "Return the Python source for a tuple of the given names as strings."
+    return '(%s%s)' % (
+        ', '.join("'%s'" % name for name in names),
+        ',' if len(names) == 1 else ''
+    )
+
+
+def slot_names(attributes, superclass=None):
+    """Return the names of the __slots__ of a class with the given
+    attributes.
+
+    A class without a superclass also has a slot for weak references,
+    so that its instances (and those of its subclasses) can still be
+    referred to weakly.
+    """
+    names = list(attributes)
+    if superclass is None:
+        names.append('__weakref__')
+    return names
+
 
 class Expression(object):
     # An expression is the left node of the AST. Operations,
     # literals, and references to attributes/members are all
     # expresisons. Expressions don't have context
+
+    # The attributes that describe the structure of the node: child
+    # nodes (or lists and dictionaries of child nodes), and the simple
+    # values that affect the generated code.
+    fields = ()
+
+    # The attributes that refer to declarations owned by some other
+    # part of the tree.
+    references = ()
+
+    # The (filename, line, column) in the C++ source that
+    # produced this node. This is set by the parser.
+    location = None
+
     def __repr__(self):
         return "<%s>" % (self.__class__.__name__)
 
     def clean_argument(self):
         return self
 
+    def children(self):
+        "Iterate over the nodes that are directly contained by this node."
+        for field in self.fields:
+            value = getattr(self, field)
+            if isinstance(value, dict):
+                value = value.values()
+            elif not isinstance(value, (list, tuple)):
+                value = [value]
+
+            for child in value:
+                if isinstance(child, Expression):
+                    yield child
+
+    def walk(self):
+        "Iterate over this node, and every node it contains."
+        yield self
+        for child in self.children():
+            for node in child.walk():
+                yield node
+
 
 class Declaration(Expression):
     # A Declaration is a named expression. As they are named,
@@ -62,6 +227,8 @@ class Declaration(Expression):
     # scope in which the declaration is valid.
     # An anonymous declaration is a declaration without a
     # discoverable name.
+    fields = ('name',)
+
     def __init__(self, context, name):
         self._name = None
 
@@ -168,12 +335,15 @@ class Context(Declaration):
 ###########################################################################
 
 class Module(Context):
+    fields = ('name', 'declarations')
+
     def __init__(self, name, context=None):
         super(Module, self).__init__(context=context, name=name)
         self.declarations = []
         self.classes = set()
 
         self.imports = {}
+        self.deferred_imports = {}
         self.submodules = {}
         self.module = self
         self.using = None
@@ -236,7 +406,16 @@ class Module(Context):
         statement.add_imports(self)
 
     def add_import(self, path, symbol=None):
-        self.imports.setdefault(path, set()).add(symbol)
+        # With no symbol, the module itself is imported.
+        symbols = self.imports.setdefault(path, set())
+        if symbol is not None:
+            symbols.add(symbol)
+
+    def add_deferred_import(self, path, symbol):
+        # Deferred imports are made after the module's own declarations
+        # have been defined. This allows modules that refer to each other
+        # (such as the shards of a large module) to be imported.
+        self.deferred_imports.setdefault(path, set()).add(symbol)
 
     def add_imports(self, context):
         pass
@@ -264,14 +443,197 @@ class Module(Context):
                 out.clear_line()
 
         out.clear_major_block()
-        for decl in self.declarations:
-            # Ignore symbols that are known to be internal.
-            if self.context is None and decl.name in (
-                        'ptrdiff_t', 'max_align_t', 'va_list', '__gnuc_va_list'
-                    ):
-                continue
+        for decl in self.public_declarations:
             out.clear_minor_block()
-            decl.output(out)
+            out.mark(decl)
+            if out.cache is not None and isinstance(decl, (Class, Struct, Function)):
+                out.cache.output(decl, out)
+            else:
+                decl.output(out)
+        out.clear_line()
+
+        if self.deferred_imports:
+            out.clear_major_block()
+            for path in sorted(self.deferred_imports):
+                out.write('from %s import %s' % (
+                    path,
+                    ', '.join(sorted(self.deferred_imports[path]))
+                ))
+                out.clear_line()
+
+    @property
+    def public_declarations(self):
+        "The declarations of this module, excluding known internal symbols"
+        return [
+            decl
+            for decl in self.declarations
+            if not (self.context is None and decl.name in (
+                'ptrdiff_t', 'max_align_t', 'va_list', '__gnuc_va_list'
+            ))
+        ]
+
+    @property
+    def named_declarations(self):
+        "The public declarations that define a top-level name in this module"
+        return [
+            decl
+            for decl in self.public_declarations
+            if isinstance(decl, Declaration) and decl.name and '::' not in decl.name
+        ]
+
+    def references(self, decl):
+        """Return the imports that would be needed to use `decl` on its own.
+
+        The result is a dictionary of module paths to sets of names; any
+        names defined in this module are included under this module's own
+        path.
+        """
+        # Collect the imports in an empty module; since the probe isn't
+        # the module that contains any of the references, every reference
+        # will be reported.
+        probe = Module(self.name)
+        decl.add_imports(probe)
+        return probe.imports
+
+    def shard(self, groups, paths):
+        """Split this module into a facade and several shard modules.
+
+        `groups` is a list of lists of named declarations, in dependency
+        order; `paths` is the module path at which each group will be
+        written. Returns a tuple of the facade module, the list of shard
+        modules, and a dictionary that maps each name defined in a shard
+        to the path of that shard.
+
+        Each shard imports the names it needs from the shards before it;
+        names from later shards can only be needed by function bodies,
+        so they are imported after the shard's own declarations, which
+        avoids import cycles. Declarations without a name (e.g., static
+        attribute assignments) are kept in the facade, so they are still
+        executed when the module is imported.
+        """
+        path = self.full_name.replace('::', '.')
+
+        located = OrderedDict()
+        for shard_path, group in zip(paths, groups):
+            for decl in group:
+                located[decl.name] = shard_path
+
+        def add_imports(module, module_path, decl, position):
+            for import_path, names in self.references(decl).items():
+                if import_path != path:
+                    for name in names:
+                        module.add_import(import_path, name)
+                    continue
+
+                for name in names:
+                    source = located.get(name, path)
+                    if source == module_path:
+                        continue
+                    elif source != path and paths.index(source) < position:
+                        module.add_import(source, name)
+                    else:
+                        module.add_deferred_import(source, name)
+
+        shards = []
+        for position, (shard_path, group) in enumerate(zip(paths, groups)):
+            shard = Module(shard_path.split('.')[-1])
+            for decl in group:
+                shard.declarations.append(decl)
+                add_imports(shard, shard_path, decl, position)
+            shards.append(shard)
+
+        facade = Module(self.name)
+        named = self.named_declarations
+        for decl in self.public_declarations:
+            if decl not in named:
+                facade.declarations.append(decl)
+                add_imports(facade, path, decl, len(paths))
+
+        return facade, shards, located
+
+    @property
+    def exports(self):
+        "The names brought into this namespace from other modules by `using`"
+        exports = OrderedDict()
+        if self.using:
+            for name, decl in self.using.names.items():
+                if decl.context.is_module and decl.context != self:
+                    exports[name] = decl.context.full_name.replace('::', '.')
+        return exports
+
+    def output_interface(self, out, lazy=True, exports=None):
+        """Output the names this module provides from other modules.
+
+        The interface makes the submodules of a package, any names
+        exported into the namespace by a `using` declaration, and any
+        extra `exports` (a dictionary of names to module paths) available
+        as attributes of the module. By default these are resolved on
+        first access, using a module-level __getattr__ (PEP 562); if
+        `lazy` is False, they are imported when the module is imported.
+        """
+        submodules = sorted(self.submodules)
+        all_exports = self.exports
+        if exports:
+            all_exports.update(exports)
+        exports = all_exports
+        if not submodules and not exports:
+            return
+
+        out.clear_major_block()
+        if lazy:
+            out.write('_submodules = %s' % tuple_literal(submodules))
+            out.clear_line()
+            out.write('_exports = {')
+            out.start_block()
+            for name, path in exports.items():
+                out.clear_line()
+                out.write("'%s': '%s'," % (name, path))
+            out.end_block()
+            out.clear_line()
+            out.write('}')
+
+            out.clear_major_block()
+            out.write('def __getattr__(name):')
+            out.start_block()
+            out.clear_line()
+            out.write('import importlib')
+            out.clear_line()
+            out.write('if name in _submodules:')
+            out.start_block()
+            out.clear_line()
+            out.write("return importlib.import_module('%s.%s' % (__name__, name))")
+            out.end_block()
+            out.clear_line()
+            out.write('elif name in _exports:')
+            out.start_block()
+            out.clear_line()
+            out.write('value = getattr(importlib.import_module(_exports[name]), name)')
+            out.clear_line()
+            out.write('globals()[name] = value')
+            out.clear_line()
+            out.write('return value')
+            out.end_block()
+            out.clear_line()
+            out.write('raise AttributeError("module %r has no attribute %r" % (__name__, name))')
+            out.end_block()
+
+            out.clear_major_block()
+            out.write('def __dir__():')
+            out.start_block()
+            out.clear_line()
+            out.write('return sorted(set(globals()) | set(_submodules) | set(_exports))')
+            out.end_block()
+        else:
+            if submodules:
+                out.write('from . import %s' % ', '.join(submodules))
+                out.clear_line()
+            grouped = OrderedDict()
+            for name, path in exports.items():
+                if name not in self.imports.get(path, ()):
+                    grouped.setdefault(path, []).append(name)
+            for path, names in grouped.items():
+                out.write('from %s import %s' % (path, ', '.join(sorted(names))))
+                out.clear_line()
         out.clear_line()
 
 
@@ -352,6 +714,8 @@ class Parent(Context):
 ###########################################################################
 
 class Enumeration(Parent):
+    fields = ('name', 'enumerators')
+
     def __init__(self, context, name):
         super(Enumeration, self).__init__(context=context, name=name)
         self.enumerators = []
@@ -369,7 +733,12 @@ class Enumeration(Parent):
 
     def output(self, out):
         out.clear_major_block()
-        out.write("class %s(Enum):" % self.name)
+        if out.options.get('inline_enums'):
+            # Uses of the values are replaced with integers, so the
+            # enumeration must compare equal to those integers.
+            out.write("class %s(int, Enum):" % self.name)
+        else:
+            out.write("class %s(Enum):" % self.name)
         out.start_block()
         if self.enumerators:
             for enumerator in self.enumerators:
@@ -388,6 +757,9 @@ class EnumValue(Declaration):
     # A value in an enumeration.
     # EnumValues are slightly odd, becaues they are Declarations
     # in the same context as the Enumeration they belong to.
+    fields = ('name', 'value')
+    references = ('enumeration',)
+
     def __init__(self, context, name, value):
         super(EnumValue, self).__init__(context, name)
         self.name = name
@@ -402,7 +774,11 @@ class EnumValue(Declaration):
             )
 
     def output(self, out):
-        out.write('%s.%s' % (self.enumeration.module_name, self.name))
+        if out.options.get('inline_enums'):
+            out.write('%s' % self.value)
+            out.comment('%s.%s' % (self.enumeration.module_name, self.name))
+        else:
+            out.write('%s.%s' % (self.enumeration.module_name, self.name))
 
 
 ###########################################################################
@@ -410,10 +786,26 @@ class EnumValue(Declaration):
 ###########################################################################
 
 class Function(Parent):
+    fields = (
+        'name', 'parameters', 'statements', 'returns', 'result_typekind',
+        'purity', 'cache_policy', 'cache_size',
+    )
+
     def __init__(self, context, name):
         super(Function, self).__init__(context=context, name=name)
         self.parameters = []
         self.statements = None
+        # The annotation of the return type, if it is annotated.
+        self.returns = None
+        # The canonical C type of the return value, if it is known.
+        self.result_typekind = None
+        # How the function is declared to be free of side effects:
+        # 'const' or 'pure' (from __attribute__), 'constexpr', or None.
+        self.purity = None
+        # How the results of the function are cached ('lru_cache' or
+        # 'dict', or None if they aren't), and the size of the cache.
+        self.cache_policy = None
+        self.cache_size = None
 
     def add_parameter(self, parameter):
         self.parameters.append(parameter)
@@ -428,22 +820,40 @@ class Function(Parent):
         for param in self.parameters:
             param.add_imports(context)
 
+        if self.returns:
+            self.returns.add_imports(context)
+
+        if self.statements:
+            for statement in self.statements:
+                statement.add_imports(context)
+
     def add_statement(self, statement):
         self.statements.append(statement)
         statement.add_imports(self)
 
     def output(self, out):
         out.clear_major_block()
-        out.write('def %s(' % self.name)
+        if self.cache_policy == 'lru_cache':
+            out.write('@functools.lru_cache(maxsize=%s)' % self.cache_size)
+            out.clear_line()
+        # With a dict cache, the function is defined under another
+        # name, and wrapped by a function that checks the cache.
+        name = '_%s' % self.name if self.cache_policy == 'dict' else self.name
+        out.write('def %s(' % name)
         for i, param in enumerate(self.parameters):
             if i != 0:
                 out.write(', ')
             param.output(out)
-        out.write('):')
+        out.write(')')
+        if self.returns:
+            out.write(' -> ')
+            self.returns.output(out)
+        out.write(':')
         out.start_block()
         if self.statements:
             for statement in self.statements:
                 out.clear_line()
+                out.mark(statement)
                 statement.output(out)
         else:
             out.clear_line()
@@ -451,12 +861,71 @@ class Function(Parent):
         out.end_block()
         out.clear_major_block()
 
+        if self.cache_policy == 'dict':
+            self.output_cache(out)
+
+    def output_cache(self, out):
+        "Output a bounded dict cache, and the function that uses it."
+        names = [param.name for param in self.parameters]
+        key = names[0] if len(names) == 1 else '(%s)' % ', '.join(names)
+        cache = '_%s_cache' % self.name
+        # The result mustn't be stored in a parameter, as the parameters
+        # are still needed for the key.
+        result = '_result'
+        while result in names:
+            result = '_' + result
+
+        out.write('%s = {}' % cache)
+        out.clear_major_block()
+        # The wrapper takes the same parameters (and defaults) as the
+        # function it wraps.
+        out.write('def %s(' % self.name)
+        for i, param in enumerate(self.parameters):
+            if i != 0:
+                out.write(', ')
+            param.output(out)
+        out.write('):')
+        out.start_block()
+        out.clear_line()
+        out.write('try:')
+        out.start_block()
+        out.clear_line()
+        out.write('return %s[%s]' % (cache, key))
+        out.end_block()
+        out.clear_line()
+        out.write('except KeyError:')
+        out.start_block()
+        out.clear_line()
+        out.write('if len(%s) >= %s:' % (cache, self.cache_size))
+        out.start_block()
+        out.clear_line()
+        out.write('%s.clear()' % cache)
+        out.end_block()
+        out.clear_line()
+        out.write('%s = %s[%s] = _%s(%s)' % (result, cache, key, self.name, ', '.join(names)))
+        out.clear_line()
+        out.write('return %s' % result)
+        out.end_block()
+        out.end_block()
+        out.clear_major_block()
+
 
 class Parameter(Declaration):
-    def __init__(self, function, name, ctype, default):
+    fields = ('name', 'ctype', 'default', 'typekind', 'pointee', 'annotation')
+
+    def __init__(self, function, name, ctype, default, typekind=None, pointee=None, annotation=None):
         super(Parameter, self).__init__(context=function, name=name)
         self.ctype = ctype
         self.default = default
+        # The canonical C type of the parameter, if it is known.
+        self.typekind = typekind
+        # The canonical C type that the parameter points to, if it is
+        # a pointer.
+        self.pointee = pointee
+        # The annotation of the parameter's type, if it is annotated.
+        self.annotation = annotation
+        # True if char values are represented by their integer codes.
+        self.char_codes = False
 
     @property
     def module_name(self):
@@ -465,23 +934,75 @@ class Parameter(Declaration):
     def add_to_context(self, context):
         context.add_parameter(self)
 
+    @property
+    def required(self):
+        "Must a value be provided for this parameter?"
+        return self.default is UNDEFINED
+
+    @property
+    def python_type(self):
+        """The Python type that is used to represent values of this parameter.
+
+        Returns the class, struct or union declaration for a parameter
+        of a declared type; the name of a builtin type for a primitive;
+        or None if the type isn't known.
+        """
+        words = self.ctype.replace('&', ' ').replace('*', ' * ').split()
+        words = [w for w in words if w not in ('const', 'volatile', 'struct', 'class', 'union')]
+        if '*' in words:
+            return 'str' if words[0] == 'char' and not self.char_codes else None
+
+        name = ' '.join(words)
+        if name in PRIMITIVE_PYTHON_TYPES:
+            if self.char_codes and PRIMITIVE_PYTHON_TYPES[name] == 'str':
+                return 'int'
+            return PRIMITIVE_PYTHON_TYPES[name]
+
+        try:
+            decl = self.context[name]
+        except KeyError:
+            return None
+        if isinstance(decl, (Class, Struct, Union)):
+            return decl
+
     def add_imports(self, context):
         if self.default is not UNDEFINED and self.default is not None:
             self.default.add_imports(context)
+        if self.annotation:
+            self.annotation.add_imports(context)
 
     def output(self, out):
         out.write(self.name)
+        if self.annotation:
+            # PEP 8 puts spaces around the = of an annotated default.
+            out.write(': ')
+            self.annotation.output(out)
+            equals = ' = '
+        else:
+            equals = '='
         if self.default is None:
-            out.write('=None')
+            out.write('%sNone' % equals)
         elif self.default is not UNDEFINED:
-            out.write('=')
+            out.write(equals)
             self.default.output(out)
 
 
 class Variable(Declaration):
-    def __init__(self, context, name, value):
+    fields = ('name', 'value', 'const', 'typekind', 'pointee', 'size', 'annotation')
+
+    def __init__(self, context, name, value, const=False, typekind=None, pointee=None,
+                 size=None, annotation=None):
         super(Variable, self).__init__(context=context, name=name)
         self.value = value
+        self.const = const
+        self.typekind = typekind
+        # The canonical C type that the variable points to, if it is
+        # a pointer.
+        self.pointee = pointee
+        # The number of elements, if the variable is a fixed-size array.
+        self.size = size
+        # The annotation of the variable's type, if it is annotated.
+        self.annotation = annotation
 
     @property
     def module_name(self):
@@ -493,9 +1014,23 @@ class Variable(Declaration):
     def add_imports(self, context):
         if self.value and self.value is not UNDEFINED:
             self.value.add_imports(context)
+        if self.annotation:
+            self.annotation.add_imports(context)
 
     def output(self, out):
-        if self.value is not UNDEFINED:
+        if self.annotation:
+            # An annotated variable is declared, even if it doesn't
+            # have a value yet.
+            out.write('%s: ' % self.name.replace('::', '.'))
+            self.annotation.output(out)
+            if self.value is not UNDEFINED:
+                out.write(' = ')
+                if self.value:
+                    self.value.output(out)
+                else:
+                    out.write('None')
+            out.clear_line()
+        elif self.value is not UNDEFINED:
             out.write('%s = ' % self.name.replace('::', '.'))
             if self.value:
                 self.value.output(out)
@@ -505,6 +1040,8 @@ class Variable(Declaration):
 
 
 class Typedef(Declaration):
+    fields = ('name', 'type')
+
     def __init__(self, context, name, typ):
         super(Typedef, self).__init__(context=context, name=name)
         self.type = typ
@@ -534,6 +1071,12 @@ class Typedef(Declaration):
 ###########################################################################
 
 class Struct(Parent):
+    fields = (
+        'name', 'constructors', 'destructor', 'class_attributes',
+        'attributes', 'methods', 'classes', 'columnar',
+    )
+    references = ('superclass',)
+
     def __init__(self, context, name):
         super(Struct, self).__init__(context=context, name=name)
         self._superclass = None
@@ -543,6 +1086,8 @@ class Struct(Parent):
         self.attributes = OrderedDict()
         self.methods = OrderedDict()
         self.classes = OrderedDict()
+        # Set if arrays of the struct are stored in columns.
+        self.columnar = False
 
     @property
     def superclass(self):
@@ -554,10 +1099,38 @@ class Struct(Parent):
         self._superclass = ref.type
         self.related_contexts.add(ref.type)
 
+    @property
+    def columns(self):
+        """The array typecode for each attribute of the struct, when an
+        array of the struct is stored as one array per attribute.
+
+        Returns None if the struct contains anything other than numbers.
+        """
+        if self.superclass or not self.attributes:
+            return None
+
+        columns = OrderedDict()
+        for name, attr in self.attributes.items():
+            if attr.typekind not in ARRAY_TYPECODES or attr.typekind in CHARACTER_TYPES:
+                return None
+            columns[name] = ARRAY_TYPECODES[attr.typekind]
+        return columns
+
+    @property
+    def columns_name(self):
+        "The name of the class that stores an array of the struct in columns."
+        return '%sColumns' % self.name
+
     def add_imports(self, context):
+        if self.superclass:
+            TypeReference(self.superclass).add_imports(context)
+
         for constructor in self.constructors.values():
             constructor.add_imports(context)
 
+        if self.destructor:
+            self.destructor.add_imports(context)
+
         for attr in self.class_attributes.values():
             attr.add_imports(context)
 
@@ -570,6 +1143,9 @@ class Struct(Parent):
         for method in self.methods.values():
             method.add_imports(context)
 
+        if self.columnar:
+            context.module.add_import('array', 'array')
+
     def add_class(self, klass):
         self.classes[klass.name] = klass
 
@@ -614,43 +1190,99 @@ class Struct(Parent):
             out.write("class %s:" % self.name)
         out.start_block()
 
+        slots = out.options.get('slots')
+        if slots:
+            # Each class only declares the slots for its own attributes;
+            # inherited attributes (and weak references) are provided by
+            # the superclass.
+            out.clear_line()
+            out.write('__slots__ = %s' % tuple_literal(slot_names(self.attributes, self.superclass)))
+            out.clear_minor_block()
+
         if self.class_attributes or self.attributes or self.destructor or self.classes or self.methods:
             if self.class_attributes:
                 for name, variable in self.class_attributes.items():
                     out.clear_line()
+                    out.mark(variable)
                     variable.output(out)
                 out.clear_minor_block()
 
             if self.attributes:
+                output_declarations(out, self.attributes)
                 out.clear_line()
-                params = ''.join(', %s=None' % name for name in self.attributes.keys())
-                out.write('def __init__(self%s):' % params)
+                out.write('def __init__(self')
+                for name, attr in self.attributes.items():
+                    attr.output_parameter(out)
+                out.write('):')
                 out.start_block()
                 for name, attr in self.attributes.items():
                     out.clear_line()
+                    out.mark(attr)
                     attr.output(out, init=True)
                 out.end_block()
 
             if self.destructor:
+                out.mark(self.destructor)
                 self.destructor.output(out)
 
             for name, klass in self.classes.items():
+                out.mark(klass)
                 klass.output(out)
 
             for name, method in self.methods.items():
+                out.mark(method)
                 method.output(out)
-        else:
+        elif not slots:
             out.clear_line()
             out.write('pass')
         out.end_block()
         out.clear_major_block()
 
+        if self.columnar:
+            self.output_columns(out)
+
+    def output_columns(self, out):
+        # A container for an array of the struct, with one typed array
+        # for each attribute.
+        out.clear_major_block()
+        out.write('class %s:' % self.columns_name)
+        out.start_block()
+        out.clear_line()
+        out.write('__slots__ = %s' % tuple_literal(list(self.attributes)))
+        out.clear_minor_block()
+
+        out.clear_line()
+        out.write('def __init__(self, size):')
+        out.start_block()
+        for name, typecode in self.columns.items():
+            out.clear_line()
+            out.write("self.%s = array('%s', [%s]) * size" % (
+                name, typecode, '0.0' if typecode in 'fd' else '0'
+            ))
+        out.end_block()
+        out.clear_minor_block()
+
+        out.clear_line()
+        out.write('def __len__(self):')
+        out.start_block()
+        out.clear_line()
+        out.write('return len(self.%s)' % next(iter(self.attributes)))
+        out.end_block()
+        out.end_block()
+        out.clear_major_block()
+
 
 ###########################################################################
 # Unions
 ###########################################################################
 
 class Union(Parent):
+    fields = (
+        'name', 'class_attributes', 'attributes', 'enumerations',
+        'methods', 'classes',
+    )
+    references = ('superclass',)
+
     def __init__(self, context, name):
         super(Union, self).__init__(context=context, name=name)
         self._superclass = None
@@ -671,6 +1303,9 @@ class Union(Parent):
         self.related_contexts.add(ref.type)
 
     def add_imports(self, context):
+        if self.superclass:
+            TypeReference(self.superclass).add_imports(context)
+
         for attr in self.class_attributes.values():
             attr.add_imports(context)
 
@@ -711,32 +1346,46 @@ class Union(Parent):
         out.clear_major_block()
         out.write("class %s:" % self.name)
         out.start_block()
+        slots = out.options.get('slots')
+        if slots:
+            out.clear_line()
+            out.write('__slots__ = %s' % tuple_literal(slot_names(self.attributes)))
+            out.clear_minor_block()
+
         if self.class_attributes or self.attributes or self.classes or self.methods:
             if self.class_attributes:
                 for name, variable in self.class_attributes.items():
                     out.clear_line()
+                    out.mark(variable)
                     variable.output(out)
                 out.clear_minor_block()
 
             if self.attributes:
-                params = ''.join(', %s=None' % name for name in self.attributes.keys())
+                output_declarations(out, self.attributes)
                 out.clear_line()
-                out.write('def __init__(self%s):' % params)
+                out.write('def __init__(self')
+                for name, attr in self.attributes.items():
+                    attr.output_parameter(out)
+                out.write('):')
                 out.start_block()
                 for name, attr in self.attributes.items():
                     out.clear_line()
+                    out.mark(attr)
                     attr.output(out, init=True)
                 out.end_block()
 
             for name, enum in self.enumerations.items():
+                out.mark(enum)
                 enum.output(out)
 
             for name, klass in self.classes.items():
+                out.mark(klass)
                 klass.output(out)
 
             for name, method in self.methods.items():
+                out.mark(method)
                 method.output(out)
-        else:
+        elif not slots:
             out.clear_line()
             out.write('pass')
 
@@ -750,6 +1399,12 @@ class Union(Parent):
 ###########################################################################
 
 class Class(Parent):
+    fields = (
+        'name', 'constructors', 'destructor', 'class_attributes',
+        'attributes', 'enumerations', 'methods', 'classes',
+    )
+    references = ('superclass',)
+
     def __init__(self, context, name):
         super(Class, self).__init__(context=context, name=name)
         self._superclass = None
@@ -772,9 +1427,24 @@ class Class(Parent):
         self.related_contexts.add(ref.type)
 
     def add_imports(self, context):
+        if self.superclass:
+            TypeReference(self.superclass).add_imports(context)
+
         for constructor in self.constructors.values():
             constructor.add_imports(context)
 
+        # Overloaded constructors are selected using the types of
+        # their arguments.
+        if len(self.constructors) > 1:
+            for arities, candidates in self.constructor_dispatch():
+                for tests, index in candidates:
+                    for position, python_type in tests:
+                        if isinstance(python_type, Expression):
+                            TypeReference(python_type).add_imports(context)
+
+        if self.destructor:
+            self.destructor.add_imports(context)
+
         for attr in self.class_attributes.values():
             attr.add_imports(context)
 
@@ -820,6 +1490,100 @@ class Class(Parent):
         else:
             self.destructor = method
 
+    def constructor_dispatch(self):
+        """Work out which constructor to use for each number of arguments.
+
+        Returns a list of (arities, candidates) pairs, in order of arity.
+        `candidates` is a list of (tests, index) pairs, where `index` is
+        the position of a constructor in sorted signature order, and
+        `tests` is a list of (argument position, Python type) pairs that
+        must all be true for that constructor to be used. The tests of
+        the last candidate are never needed.
+        """
+        # The order in which to test types; more specific types first.
+        def rank(python_type):
+            return {'bool': 1, 'str': 2, 'int': 3, 'float': 4}.get(python_type, 0)
+
+        constructors = [constructor for signature, constructor in sorted(self.constructors.items())]
+        by_arity = OrderedDict()
+        for index, constructor in enumerate(constructors):
+            for arity in constructor.arities:
+                by_arity.setdefault(arity, []).append(index)
+
+        dispatch = []
+        for arity in sorted(by_arity):
+            candidates = []
+            for index in by_arity[arity]:
+                tests = []
+                if len(by_arity[arity]) > 1:
+                    for position, param in enumerate(constructors[index].parameters[:arity]):
+                        python_type = param.python_type
+                        if python_type is not None:
+                            tests.append((position, python_type))
+                candidates.append((tests, index))
+            candidates.sort(key=lambda candidate: (
+                sorted(rank(t) for p, t in candidate[0]) if candidate[0] else [99]
+            ))
+            # If the types can't tell two constructors apart, only
+            # the first of them can ever be used.
+            for i, (tests, index) in enumerate(candidates):
+                if not tests:
+                    del candidates[i + 1:]
+                    break
+
+            # Consecutive arities with the same constructor are merged.
+            if dispatch and dispatch[-1][1] == candidates and len(candidates) == 1:
+                dispatch[-1][0].append(arity)
+            else:
+                dispatch.append(([arity], candidates))
+        return dispatch
+
+    def output_constructor_dispatch(self, out):
+        out.clear_minor_block()
+        out.write('def __init__(self, *args):')
+        out.start_block()
+        out.clear_line()
+        out.write('arity = len(args)')
+
+        dispatch = self.constructor_dispatch()
+        for i, (arities, candidates) in enumerate(dispatch):
+            out.clear_line()
+            out.write('if ' if i == 0 else 'elif ')
+            if len(arities) == 1:
+                out.write('arity == %s:' % arities[0])
+            else:
+                out.write('%s <= arity <= %s:' % (arities[0], arities[-1]))
+            out.start_block()
+            for j, (tests, index) in enumerate(candidates):
+                out.clear_line()
+                if len(candidates) > 1:
+                    if j == len(candidates) - 1:
+                        out.write('else:')
+                    else:
+                        out.write('if ' if j == 0 else 'elif ')
+                        out.write(' and '.join(
+                            'isinstance(args[%s], %s)' % (
+                                position,
+                                python_type if isinstance(python_type, text) else python_type.module_name
+                            )
+                            for position, python_type in tests
+                        ))
+                        out.write(':')
+                    out.start_block()
+                    out.clear_line()
+                out.write('self._init_%s(*args)' % index)
+                if len(candidates) > 1:
+                    out.end_block()
+            out.end_block()
+
+        out.clear_line()
+        out.write('else:')
+        out.start_block()
+        out.clear_line()
+        out.write("raise TypeError('No constructor for %s takes %%s arguments' %% arity)" % self.name)
+        out.end_block()
+        out.end_block()
+
     def add_class_attribute(self, var):
         self.class_attributes[var.name] = var
 
@@ -845,28 +1609,53 @@ class Class(Parent):
         else:
             out.write("class %s:" % self.name)
         out.start_block()
+        slots = out.options.get('slots')
+        if slots:
+            # Each class only declares the slots for its own attributes;
+            # inherited attributes (and weak references) are provided by
+            # the superclass.
+            out.clear_line()
+            out.write('__slots__ = %s' % tuple_literal(slot_names(self.attributes, self.superclass)))
+            out.clear_minor_block()
+
         if self.class_attributes or self.attributes or self.constructors or self.destructor or self.enumerations or self.classes or self.methods:
             if self.class_attributes:
                 for name, variable in self.class_attributes.items():
                     out.clear_line()
+                    out.mark(variable)
                     variable.output(out)
                 out.clear_minor_block()
 
-            for signature, constructor in sorted(self.constructors.items()):
-                constructor.output(out)
+            output_declarations(out, self.attributes)
+
+            if len(self.constructors) > 1:
+                # Overloaded constructors are implemented as separate
+                # methods, and __init__ picks one based on the arguments.
+                self.output_constructor_dispatch(out)
+                for index, (signature, constructor) in enumerate(sorted(self.constructors.items())):
+                    out.mark(constructor)
+                    constructor.output(out, name='_init_%s' % index)
+            else:
+                for signature, constructor in self.constructors.items():
+                    out.mark(constructor)
+                    constructor.output(out)
 
             if self.destructor:
+                out.mark(self.destructor)
                 self.destructor.output(out)
 
             for name, enum in self.enumerations.items():
+                out.mark(enum)
                 enum.output(out)
 
             for name, klass in self.classes.items():
+                out.mark(klass)
                 klass.output(out)
 
             for name, method in self.methods.items():
+                out.mark(method)
                 method.output(out)
-        else:
+        elif not slots:
             out.clear_line()
             out.write('pass')
         out.end_block()
@@ -877,11 +1666,30 @@ class Class(Parent):
 # Class/Struct/Union components
 ###########################################################################
 
+def output_declarations(out, attributes):
+    "Output the annotations of the instance attributes of a class."
+    annotated = False
+    for name, attr in attributes.items():
+        if attr.annotation:
+            out.clear_line()
+            out.write('%s: ' % name)
+            attr.annotation.output(out)
+            annotated = True
+    if annotated:
+        out.clear_minor_block()
+
+
 class Attribute(Declaration):
-    def __init__(self, klass, name, value=None, static=False):
+    fields = ('name', 'value', 'static', 'typekind', 'annotation')
+
+    def __init__(self, klass, name, value=None, static=False, typekind=None, annotation=None):
         super(Attribute, self).__init__(context=klass, name=name)
         self.value = value
         self.static = static
+        # The canonical C type of the attribute, if it is known.
+        self.typekind = typekind
+        # The annotation of the attribute's type, if it is annotated.
+        self.annotation = annotation
 
     @property
     def module(self):
@@ -900,6 +1708,27 @@ class Attribute(Declaration):
     def add_imports(self, context):
         if self.value:
             self.value.add_imports(context)
+        if self.annotation:
+            self.annotation.add_imports(context)
+            if self.value and isinstance(self.context, (Struct, Union)):
+                # The parameter that sets the attribute is Optional
+                # (see output_parameter()).
+                context.module.add_import('typing', 'Optional')
+
+    def output_parameter(self, out):
+        "Output the parameter of a struct's __init__ that sets the attribute."
+        out.write(', %s' % self.name)
+        if self.annotation is None:
+            out.write('=None')
+        elif self.value is None and self.annotation.zero is not None:
+            # A number defaults to zero, as it is in C++.
+            out.write(': ')
+            self.annotation.output(out)
+            out.write(' = %s' % self.annotation.zero)
+        else:
+            out.write(': ')
+            self.annotation.output(out, optional=True)
+            out.write(' = None')
 
     def output(self, out, init=False):
         if not self.static:
@@ -920,6 +1749,8 @@ class Attribute(Declaration):
 
 
 class Constructor(Parent):
+    fields = ('parameters', 'statements')
+
     def __init__(self, klass):
         super(Constructor, self).__init__(context=klass, name=None)
         self.parameters = []
@@ -941,13 +1772,22 @@ class Constructor(Parent):
         for param in self.parameters:
             param.add_imports(context)
 
+        for statement in self.statements:
+            statement.add_imports(context)
+
     def add_statement(self, statement):
         self.statements.append(statement)
         statement.add_imports(self.context)
 
-    def output(self, out):
+    @property
+    def arities(self):
+        "The numbers of arguments that the constructor accepts."
+        required = len([p for p in self.parameters if p.required])
+        return range(required, len(self.parameters) + 1)
+
+    def output(self, out, name='__init__'):
         out.clear_minor_block()
-        out.write("def __init__(self")
+        out.write("def %s(self" % name)
         if self.parameters:
             for param in self.parameters:
                 out.write(', ')
@@ -959,12 +1799,14 @@ class Constructor(Parent):
             for name, attr in self.context.attributes.items():
                 if attr.value is not None:
                     out.clear_line()
+                    out.mark(attr)
                     attr.output(out)
                     has_init = True
 
             if self.statements:
                 for statement in self.statements:
                     out.clear_line()
+                    out.mark(statement)
                     statement.output(out)
             elif not has_init:
                 out.clear_line()
@@ -977,16 +1819,28 @@ class Constructor(Parent):
 
 
 class Destructor(Parent):
+    fields = ('statements', 'style', 'state')
+
     def __init__(self, klass):
         super(Destructor, self).__init__(context=klass, name=None)
         self.parameters = []
         self.statements = None
+        # How the destructor is provided: as `__del__`; as a
+        # `_finalize` function that is registered with weakref.finalize
+        # by the constructors; or as a `close()` method, with the
+        # context manager protocol.
+        self.style = 'del'
+        # The parameters of a finalizer; the attributes of the instance
+        # that the destructor uses.
+        self.state = []
 
     def add_to_context(self, klass):
         self.context.add_destructor(self)
 
     def add_imports(self, context):
-        pass
+        if self.statements:
+            for statement in self.statements:
+                statement.add_imports(context)
 
     def add_statement(self, statement):
         if self.statements:
@@ -997,25 +1851,58 @@ class Destructor(Parent):
 
     def output(self, out):
         out.clear_minor_block()
-        out.write("def __del__(self):")
-        out.start_block()
+        if self.style == 'finalize':
+            out.write('@staticmethod')
+            out.clear_line()
+            out.write('def _finalize(%s):' % ', '.join(param.name for param in self.state))
+            out.start_block()
+        elif self.style == 'close':
+            out.write('def close(self):')
+            out.start_block()
+        else:
+            out.write('def __del__(self):')
+            out.start_block()
+
         if self.statements:
             for statement in self.statements:
                 out.clear_line()
+                out.mark(statement)
                 statement.output(out)
         else:
             out.clear_line()
             out.write('pass')
         out.end_block()
 
+        if self.style == 'close':
+            out.clear_minor_block()
+            out.write('def __enter__(self):')
+            out.start_block()
+            out.clear_line()
+            out.write('return self')
+            out.end_block()
+            out.clear_minor_block()
+            out.write('def __exit__(self, *exc_info):')
+            out.start_block()
+            out.clear_line()
+            out.write('self.close()')
+            out.end_block()
+
 
 class Method(Parent):
-    def __init__(self, klass, name, pure_virtual, static):
+    fields = ('name', 'parameters', 'statements', 'returns', 'pure_virtual', 'static', 'virtual')
+
+    def __init__(self, klass, name, pure_virtual, static, virtual=False):
         super(Method, self).__init__(context=klass, name=name)
         self.parameters = []
         self.statements = None
+        # The annotation of the return type, if it is annotated.
+        self.returns = None
         self.pure_virtual = pure_virtual
+        # How the method is declared to be free of side effects (see
+        # Function).
+        self.purity = None
         self.static = static
+        self.virtual = virtual
 
     def add_parameter(self, parameter):
         self.parameters.append(parameter)
@@ -1027,6 +1914,9 @@ class Method(Parent):
         for param in self.parameters:
             param.add_imports(context)
 
+        if self.returns:
+            self.returns.add_imports(context)
+
         if self.statements:
             for statement in self.statements:
                 statement.add_imports(context)
@@ -1051,12 +1941,17 @@ class Method(Parent):
             if i != 0 or not self.static:
                 out.write(', ')
             param.output(out)
-        out.write('):')
+        out.write(')')
+        if self.returns:
+            out.write(' -> ')
+            self.returns.output(out)
+        out.write(':')
 
         out.start_block()
         if self.statements:
             for statement in self.statements:
                 out.clear_line()
+                out.mark(statement)
                 statement.output(out)
         elif self.pure_virtual:
             out.clear_line()
@@ -1072,6 +1967,8 @@ class Method(Parent):
 ###########################################################################
 
 class Block(Parent):
+    fields = ('statements',)
+
     def __init__(self, context):
         super(Block, self).__init__(context=context, name=None)
         self.statements = []
@@ -1091,6 +1988,7 @@ class Block(Parent):
         if self.statements:
             for statement in self.statements:
                 out.clear_line()
+                out.mark(statement)
                 statement.output(out)
         else:
             out.clear_line()
@@ -1099,6 +1997,8 @@ class Block(Parent):
 
 
 class Return(Expression):
+    fields = ('value',)
+
     def __init__(self):
         self.value = None
 
@@ -1118,6 +2018,8 @@ class Return(Expression):
 
 
 class If(Parent):
+    fields = ('condition', 'if_true', 'if_false')
+
     def __init__(self, condition, context):
         super(If, self).__init__(context, name=None)
         self.condition = condition
@@ -1157,6 +2059,8 @@ class If(Parent):
 
 
 class Do(Parent):
+    fields = ('statements', 'condition')
+
     def __init__(self, context):
         super(Do, self).__init__(context, name=None)
         self.condition = None
@@ -1191,6 +2095,8 @@ class Do(Parent):
         out.end_block()
 
 class While(Parent):
+    fields = ('condition', 'statements')
+
     def __init__(self, condition, context):
         super(While, self).__init__(context, name=None)
         self.condition = condition
@@ -1213,15 +2119,21 @@ class While(Parent):
 
 
 class For(Parent):
+    fields = ('init_stmt', 'expr_stmt', 'end_expr', 'integral', 'statements')
+
     def __init__(self, init_stmt, expr_stmt, end_expr, context):
         super(For, self).__init__(context, name=None)
         self.init_stmt = init_stmt
         self.expr_stmt = expr_stmt
         self.end_expr = end_expr
         self.statements = Block(self)
+
+        # Set by the parser if the loop declares an integer variable
+        # in its initial statement.
+        self.integral = False
         
     def __repr__(self):
-        return '<For %s>' % self.condition
+        return '<For %s>' % self.expr_stmt
     
     def add_imports(self, context):
         if self.init_stmt:
@@ -1232,11 +2144,147 @@ class For(Parent):
             self.end_expr.add_imports(context)
         
         self.statements.add_imports(context)
-    
+
+    def _is_var(self, expr, var):
+        while isinstance(expr, Parentheses):
+            expr = expr.body
+        # Compare by name; a nested declaration that shadows the variable
+        # is treated as a write to it, so the name is unambiguous.
+        return isinstance(expr, VariableReference) and expr.var.name == var.name
+
+    def _writes(self, var):
+        # Does the body of the loop modify (or take the address of) var?
+        for node in self.statements.walk():
+            if isinstance(node, BinaryOperation):
+                if node.name in ASSIGNMENT_OPERATORS and self._is_var(node.lvalue, var):
+                    return True
+            elif isinstance(node, UnaryOperation):
+                if node.name in ('++', '--', '&') and self._is_var(node.value, var):
+                    return True
+            elif isinstance(node, Variable) and node.name == var.name:
+                return True
+        return False
+
+    def _is_invariant(self, expr):
+        # Is the expression guaranteed to have the same value on every
+        # iteration of the loop?
+        non_local = False
+        for node in expr.walk():
+            if isinstance(node, VariableReference):
+                if self._writes(node.var):
+                    return False
+                if not isinstance(node.var, Parameter) and (
+                            not isinstance(node.var, Variable)
+                            or isinstance(node.var.context, (Module, Class, Struct, Union))
+                        ):
+                    non_local = True
+            elif isinstance(node, (AttributeReference, ArraySubscript)):
+                non_local = True
+            elif isinstance(node, UnaryOperation):
+                if node.name in ('++', '--'):
+                    return False
+            elif isinstance(node, BinaryOperation):
+                if node.name in ASSIGNMENT_OPERATORS:
+                    return False
+            elif not isinstance(node, (Literal, EnumValue, Parentheses, Cast, SelfReference)):
+                return False
+
+        # Anything other than a local variable could be modified as a
+        # side effect of a call, or by an assignment through self.
+        if non_local:
+            for node in self.statements.walk():
+                if isinstance(node, (Invoke, New)):
+                    return False
+                elif isinstance(node, BinaryOperation) and node.name in ASSIGNMENT_OPERATORS:
+                    if isinstance(node.lvalue, (AttributeReference, ArraySubscript)):
+                        return False
+        return True
+
+    @property
+    def range_arguments(self):
+        """The (start, stop, step) arguments for an equivalent range().
+
+        A loop can be expressed as a range if it declares a single integer
+        variable, compares that variable against a loop-invariant bound,
+        and changes it by a constant step that moves towards the bound,
+        and the body of the loop doesn't modify the variable. Returns None
+        if the loop can't be expressed as a range.
+        """
+        if not (self.integral and isinstance(self.init_stmt, Variable)
+                and isinstance(self.expr_stmt, BinaryOperation)):
+            return None
+
+        var = self.init_stmt
+        if var.value is None or var.value is UNDEFINED:
+            return None
+
+        # Work out the step
+        if isinstance(self.end_expr, UnaryOperation) and self._is_var(self.end_expr.value, var):
+            step = {'++': 1, '--': -1}.get(self.end_expr.name)
+        elif isinstance(self.end_expr, BinaryOperation) and self._is_var(self.end_expr.lvalue, var):
+            step = integer_value(self.end_expr.rvalue)
+            if step is not None and self.end_expr.name == '-=':
+                step = -step
+            elif self.end_expr.name != '+=':
+                step = None
+        else:
+            step = None
+
+        if not step:
+            return None
+
+        # Work out the bound
+        condition = self.expr_stmt
+        if not self._is_var(condition.lvalue, var):
+            return None
+
+        bound = condition.rvalue
+        if step > 0 and condition.name == '<':
+            offset = 0
+        elif step > 0 and condition.name == '<=':
+            offset = 1
+        elif step < 0 and condition.name == '>':
+            offset = 0
+        elif step < 0 and condition.name == '>=':
+            offset = -1
+        else:
+            return None
+
+        if self._writes(var) or not self._is_invariant(bound):
+            return None
+
+        if offset:
+            value = integer_value(bound)
+            if value is not None:
+                stop = Literal(value + offset)
+            else:
+                if not isinstance(bound, (Literal, VariableReference, AttributeReference,
+                                          ArraySubscript, Invoke, Parentheses)):
+                    bound = Parentheses(bound)
+                stop = BinaryOperation(bound, '+' if offset > 0 else '-', Literal(1))
+        else:
+            stop = bound
+
+        return var.value, stop, step
+
     def output(self, out):
         out.clear_line()
-        # TODO: convert simple expressions to a range statement
-        
+
+        arguments = self.range_arguments
+        if arguments:
+            start, stop, step = arguments
+            out.write('for %s in range(' % self.init_stmt.name)
+            if step != 1 or integer_value(start) != 0:
+                start.output(out)
+                out.write(', ')
+            stop.output(out)
+            if step != 1:
+                out.write(', %s' % step)
+            out.write('):')
+
+            self.statements.output(out)
+            return
+
         if self.init_stmt:
             self.init_stmt.output(out)
         
@@ -1257,7 +2305,319 @@ class For(Parent):
             self.end_expr.output(out)
             out.end_block()
         
-class Break(object):
+class Switch(Parent):
+    """A switch statement.
+
+    Each case is output with the body of every case that it falls
+    through into, so that cases can be tested in any order. Small
+    switches are output as an if/elif chain. If the parser has built a
+    lookup `table` for the switch (a dictionary at module level), the
+    table either maps each label to the result of the case (if every
+    case just returns or assigns a constant), or to the index of the
+    case, which is then found by bisection.
+    """
+    fields = ('condition', 'cases', 'table', 'table_kind')
+
+    def __init__(self, condition, context):
+        super(Switch, self).__init__(context, name=None)
+        self.condition = condition
+        self.cases = []
+
+        # A reference to the lookup table for the switch, and the kind
+        # of the table ('value' or 'index'). Set by the parser.
+        self.table = None
+        self.table_kind = None
+
+    def __repr__(self):
+        return '<Switch %s>' % self.condition
+
+    def add_case(self, case):
+        self.cases.append(case)
+
+    def add_imports(self, context):
+        self.condition.add_imports(context)
+        for case in self.cases:
+            case.add_imports(context)
+        if self.table:
+            self.table.add_imports(context)
+
+    @property
+    def default(self):
+        for case in self.cases:
+            if case.default:
+                return case
+
+    def _terminates(self, statements):
+        # Does control leave the switch at the end of these statements?
+        return bool(statements) and isinstance(statements[-1], (Return, Break, Continue))
+
+    def bodies(self):
+        """The statements executed when each case is matched.
+
+        This includes the statements of any cases that are reached by
+        falling through, but not the break that leaves the switch.
+        """
+        bodies = []
+        for i, case in enumerate(self.cases):
+            statements = []
+            for following in self.cases[i:]:
+                statements.extend(following.statements)
+                if self._terminates(following.statements):
+                    break
+
+            if statements and isinstance(statements[-1], Break) and statements[-1].target is self:
+                statements = statements[:-1]
+            bodies.append(statements)
+        return bodies
+
+    @property
+    def breaks_early(self):
+        "Does any case leave the switch before the end of its statements?"
+        return any(
+            isinstance(node, Break) and node.target is self
+            for statements in self.bodies()
+            for statement in statements
+            for node in statement.walk()
+        )
+
+    @property
+    def continues_outer(self):
+        "Does any case continue a loop that encloses the switch?"
+        contents = list(self.walk())
+        return any(
+            isinstance(node, Continue) and node.loop not in contents
+            for node in contents
+        )
+
+    def _breaks(self, statement):
+        # Does the statement contain a break that leaves the switch?
+        return any(isinstance(node, Break) and node.target is self for node in statement.walk())
+
+    def _guard_breaks(self, statements):
+        # Rewrite statements that break out of the switch early so that
+        # they don't need a loop to break out of: everything that follows
+        # a conditional break is moved into the branches that don't break.
+        guarded = []
+        for i, statement in enumerate(statements):
+            if isinstance(statement, Break) and statement.target is self:
+                break
+            if isinstance(statement, If) and self._breaks(statement):
+                guarded.append(self._guard_if(statement, statements[i + 1:]))
+                break
+            if isinstance(statement, Block) and self._breaks(statement):
+                guarded.extend(self._guard_breaks(statement.statements + statements[i + 1:]))
+                break
+            guarded.append(statement)
+        return guarded
+
+    def _guard_branch(self, context, statements, rest):
+        block = Block(context)
+        if not (statements and isinstance(statements[-1], (Return, Continue))):
+            statements = statements + rest
+        block.statements = self._guard_breaks(statements)
+        return block
+
+    def _guard_if(self, statement, rest):
+        guarded = copy.copy(statement)
+        guarded.if_true = self._guard_branch(statement, statement.if_true.statements, rest)
+        if isinstance(statement.if_false, If):
+            guarded.if_false = self._guard_if(statement.if_false, rest)
+        elif isinstance(statement.if_false, Block):
+            guarded.if_false = self._guard_branch(statement, statement.if_false.statements, rest)
+        elif statement.if_false is not None:
+            guarded.if_false = self._guard_branch(statement, [statement.if_false], rest)
+        elif rest:
+            guarded.if_false = self._guard_branch(statement, [], rest)
+        return guarded
+
+    def _output_body(self, out, statements):
+        out.start_block()
+        if statements:
+            for statement in statements:
+                out.clear_line()
+                out.mark(statement)
+                statement.output(out)
+        else:
+            out.clear_line()
+            out.write('pass')
+        out.end_block()
+
+    def _output_value(self, out):
+        # Make sure the value being switched on is only evaluated once.
+        # Returns an expression that can be used to refer to the value.
+        if isinstance(self.condition, (VariableReference, Literal)):
+            return self.condition
+
+        out.write('_switch = ')
+        self.condition.output(out)
+        out.clear_line()
+        return Literal('_switch')
+
+    def _output_match(self, out, value, labels):
+        value.output(out)
+        if len(labels) == 1:
+            out.write(' == ')
+            labels[0].output(out)
+        else:
+            out.write(' in (')
+            for i, label in enumerate(labels):
+                if i != 0:
+                    out.write(', ')
+                label.output(out)
+            out.write(')')
+
+    def _output_tree(self, out, indices, bodies):
+        # Find the body for a case index using a binary search.
+        if len(indices) <= 3:
+            for i, index in enumerate(indices):
+                out.clear_line()
+                out.write('if _case == %s:' % index if i == 0 else 'elif _case == %s:' % index)
+                self._output_body(out, bodies[index])
+        else:
+            middle = len(indices) // 2
+            out.clear_line()
+            out.write('if _case < %s:' % indices[middle])
+            out.start_block()
+            self._output_tree(out, indices[:middle], bodies)
+            out.end_block()
+            out.clear_line()
+            out.write('else:')
+            out.start_block()
+            self._output_tree(out, indices[middle:], bodies)
+            out.end_block()
+
+    def output(self, out):
+        out.clear_line()
+        bodies = self.bodies()
+
+        if self.table_kind == 'value':
+            default = self.default
+            result = bodies[0][0]
+            if default:
+                # Look up the result, using the default if there's no match.
+                if isinstance(result, Return):
+                    out.write('return ')
+                    default_value = bodies[self.cases.index(default)][0].value
+                else:
+                    result.lvalue.output(out)
+                    out.write(' = ')
+                    default_value = bodies[self.cases.index(default)][0].rvalue
+                self.table.output(out)
+                out.write('.get(')
+                self.condition.output(out)
+                out.write(', ')
+                default_value.output(out)
+                out.write(')')
+            else:
+                value = self._output_value(out)
+                out.write('if ')
+                value.output(out)
+                out.write(' in ')
+                self.table.output(out)
+                out.write(':')
+                out.start_block()
+                out.clear_line()
+                if isinstance(result, Return):
+                    out.write('return ')
+                else:
+                    result.lvalue.output(out)
+                    out.write(' = ')
+                self.table.output(out)
+                out.write('[')
+                value.output(out)
+                out.write(']')
+                out.end_block()
+            out.clear_line()
+            return
+
+        # A break that doesn't end a case must leave the switch early;
+        # wrap the switch in a loop so that the break has somewhere to go.
+        # That loop would catch a continue for a loop that encloses the
+        # switch, so in that case the breaks are rewritten instead (the
+        # parser doesn't build a table for such a switch).
+        loop = self.breaks_early
+        if loop and self.continues_outer:
+            bodies = [self._guard_breaks(statements) for statements in bodies]
+            loop = False
+        if loop:
+            out.write('while True:')
+            out.start_block()
+            out.clear_line()
+
+        if self.table_kind == 'index':
+            default = self.default
+            out.write('_case = ')
+            self.table.output(out)
+            out.write('.get(')
+            self.condition.output(out)
+            out.write(', %s)' % (self.cases.index(default) if default else -1))
+            self._output_tree(
+                out,
+                [i for i, statements in enumerate(bodies) if statements],
+                bodies
+            )
+        else:
+            value = self._output_value(out)
+
+            first = True
+            for case, statements in zip(self.cases, bodies):
+                if case.default or not case.labels:
+                    continue
+                out.clear_line()
+                out.write('if ' if first else 'elif ')
+                self._output_match(out, value, case.labels)
+                out.write(':')
+                self._output_body(out, statements)
+                first = False
+
+            default = self.default
+            if default:
+                statements = bodies[self.cases.index(default)]
+                if first:
+                    # A switch with only a default case.
+                    for statement in statements:
+                        out.clear_line()
+                        out.mark(statement)
+                        statement.output(out)
+                elif statements:
+                    out.clear_line()
+                    out.write('else:')
+                    self._output_body(out, statements)
+
+        if loop:
+            out.clear_line()
+            out.write('break')
+            out.end_block()
+        out.clear_line()
+
+
+class Case(Block):
+    "A group of case labels in a switch, and the statements that follow them."
+    fields = ('labels', 'default', 'statements')
+
+    def __init__(self, switch):
+        super(Case, self).__init__(switch)
+        self.labels = []
+        self.default = False
+
+    def __repr__(self):
+        return '<Case %s>' % ('default' if self.default else self.labels)
+
+    def add_label(self, label):
+        self.labels.append(label)
+
+    def add_imports(self, context):
+        for label in self.labels:
+            label.add_imports(context)
+        super(Case, self).add_imports(context)
+
+
+class Break(Expression):
+    references = ('target',)
+
+    def __init__(self, target=None):
+        # The loop or switch that the break leaves.
+        self.target = target
     
     def add_imports(self, context):
         pass
@@ -1268,10 +2628,18 @@ class Break(object):
         out.clear_line()
 
 
-class Continue(object):
-    
-    def __init__(self, end_expr):
-        self.end_expr = end_expr
+class Continue(Expression):
+    references = ('loop',)
+
+    def __init__(self, loop):
+        self.loop = loop
+
+    @property
+    def end_expr(self):
+        # A continue inside a for loop that is output as a while loop
+        # must perform the loop's increment before continuing.
+        if isinstance(self.loop, For) and self.loop.range_arguments is None:
+            return self.loop.end_expr
     
     def add_imports(self, context):
         pass
@@ -1280,8 +2648,9 @@ class Continue(object):
         out.clear_line()
         # this exists for when a continue is used inside of a for
         # loop that has an incrementing expression in it
-        if self.end_expr:
-            self.end_expr.output(out)
+        end_expr = self.end_expr
+        if end_expr:
+            end_expr.output(out)
             out.clear_line()
         out.write('continue')
         out.clear_line()
@@ -1292,6 +2661,8 @@ class Continue(object):
 
 # A reference to a variable
 class VariableReference(Expression):
+    references = ('var',)
+
     def __init__(self, var, node):
         self.var = var
         self.node = node
@@ -1327,6 +2698,8 @@ class VariableReference(Expression):
 
 # A reference to a type
 class TypeReference(Expression):
+    references = ('type',)
+
     def __init__(self, typ):
         self.type = typ
 
@@ -1364,6 +2737,8 @@ class TypeReference(Expression):
 
 # A reference to a primitive type
 class PrimitiveTypeReference(Expression):
+    fields = ('name',)
+
     def __init__(self, name):
         self.name = name
 
@@ -1374,6 +2749,47 @@ class PrimitiveTypeReference(Expression):
         out.write(self.name)
 
 
+# The PEP 484 annotation of a type: the name of a builtin type, or a
+# class, struct, union or enumeration.
+class Annotation(Expression):
+    fields = ('optional',)
+    references = ('type',)
+
+    def __init__(self, typ, optional=False):
+        self.type = typ
+        # Can the value also be None?
+        self.optional = optional
+
+    def __repr__(self):
+        return '<Annotation %s>' % self.type
+
+    @property
+    def zero(self):
+        "The zero value of a number type; None for any other type."
+        if not self.optional:
+            return {'bool': 'False', 'int': '0', 'float': '0.0'}.get(self.type)
+
+    def add_imports(self, context):
+        if self.optional:
+            context.module.add_import('typing', 'Optional')
+        if isinstance(self.type, Declaration):
+            TypeReference(self.type).add_imports(context)
+
+    def output(self, out, optional=False):
+        if isinstance(self.type, Enumeration) and out.options.get('inline_enums'):
+            name = 'int'
+        elif isinstance(self.type, Declaration):
+            # The name is quoted, as the class may not be defined yet.
+            name = "'%s'" % self.type.module_name
+        else:
+            name = self.type
+
+        if self.optional or optional:
+            out.write('Optional[%s]' % name)
+        else:
+            out.write(name)
+
+
 # A reference to self.
 class SelfReference(Expression):
     def add_imports(self, context):
@@ -1385,9 +2801,13 @@ class SelfReference(Expression):
 
 # A reference to an attribute on a class
 class AttributeReference(Expression):
-    def __init__(self, instance, attr):
+    fields = ('instance', 'name', 'typekind')
+
+    def __init__(self, instance, attr, typekind=None):
         self.instance = instance
         self.name = attr
+        # The canonical C type of the attribute, if it is known.
+        self.typekind = typekind
 
     # def add_to_context(self, context):
     #     pass
@@ -1405,8 +2825,12 @@ class AttributeReference(Expression):
 ###########################################################################
 
 class Literal(Expression):
-    def __init__(self, value):
+    fields = ('value', 'typekind')
+
+    def __init__(self, value, typekind=None):
         self.value = value
+        # The C type of the literal, if it is known.
+        self.typekind = typekind
 
     def __repr__(self):
         return "<%s %s>" % (self.__class__.__name__, self.value)
@@ -1419,6 +2843,8 @@ class Literal(Expression):
 
 
 class ListLiteral(Expression):
+    fields = ('value',)
+
     def __init__(self):
         self.value = []
 
@@ -1441,14 +2867,128 @@ class ListLiteral(Expression):
         out.write(']')
 
 
+class DictLiteral(Expression):
+    fields = ('keys', 'values')
+
+    def __init__(self):
+        self.keys = []
+        self.values = []
+
+    def __repr__(self):
+        return "<%s %s>" % (self.__class__.__name__, len(self.keys))
+
+    def add_imports(self, context):
+        for key, value in zip(self.keys, self.values):
+            key.add_imports(context)
+            value.add_imports(context)
+
+    def add_item(self, key, value):
+        self.keys.append(key)
+        self.values.append(value)
+
+    def output(self, out):
+        out.write('{')
+        out.start_block()
+        for key, value in zip(self.keys, self.values):
+            out.clear_line()
+            key.output(out)
+            out.write(': ')
+            value.output(out)
+            out.write(',')
+        out.end_block()
+        out.clear_line()
+        out.write('}')
+
+
 ###########################################################################
 # Expressions
 ###########################################################################
 
+class ArrayStorage(Expression):
+    """Preallocated storage for a fixed-size array.
+
+    `storage` is one of 'bytearray', 'array' (an array.array with the
+    given `typecode`) or 'list'. `element` is the initial value of
+    each element; for a list, it may be another ArrayStorage. `record`
+    is the struct or class declaration of the elements, if known.
+    """
+    fields = ('storage', 'typecode', 'size', 'element')
+    references = ('record',)
+
+    def __init__(self, storage, size, typecode=None, element=None, record=None):
+        self.storage = storage
+        self.size = size
+        self.typecode = typecode
+        self.element = element
+        self.record = record
+
+    def __repr__(self):
+        return "<%s %s[%s]>" % (self.__class__.__name__, self.storage, self.size)
+
+    def add_imports(self, context):
+        if self.storage == 'array':
+            context.module.add_import('array', 'array')
+        elif self.element:
+            self.element.add_imports(context)
+
+    def output(self, out):
+        if self.storage == 'bytearray':
+            out.write('bytearray(%s)' % self.size)
+        elif self.storage == 'array':
+            out.write("array('%s', [" % self.typecode)
+            self.element.output(out)
+            out.write(']) * %s' % self.size)
+        elif isinstance(self.element, ArrayStorage):
+            # Each row of a multi-dimensional array must be distinct.
+            out.write('[')
+            self.element.output(out)
+            out.write(' for _ in range(%s)]' % self.size)
+        else:
+            out.write('[')
+            if self.element:
+                self.element.output(out)
+            else:
+                out.write('None')
+            out.write('] * %s' % self.size)
+
+
+class ColumnStorage(Expression):
+    """Storage for a fixed-size array of a plain-data struct, as one
+    typed array per attribute of the struct.
+
+    Element `i` of attribute `x` is accessed as `array.x[i]`.
+    """
+    fields = ('size',)
+    references = ('record',)
+
+    def __init__(self, record, size):
+        self.record = record
+        self.size = size
+
+    def __repr__(self):
+        return "<%s %s[%s]>" % (self.__class__.__name__, self.record.name, self.size)
+
+    def add_imports(self, context):
+        if context.module != self.record.module:
+            context.module.add_import(
+                self.record.module.full_name.replace('::', '.'),
+                self.record.columns_name
+            )
+
+    def output(self, out):
+        out.write('%s(%s)' % (self.record.columns_name, self.size))
+
+
 class UnaryOperation(Expression):
-    def __init__(self, op, value):
+    fields = ('name', 'value', 'typekind', 'postfix')
+
+    def __init__(self, op, value, typekind=None, postfix=False):
         self.name = op
         self.value = value
+        # The canonical C type of the result, if it is known.
+        self.typekind = typekind
+        # True for a postfix increment or decrement (`x++`).
+        self.postfix = postfix
 
     def add_imports(self, context):
         self.value.add_imports(context)
@@ -1467,7 +3007,7 @@ class UnaryOperation(Expression):
             self.value.output(out)
             out.write(' += 1')
         elif python_op == '--':
-            out.write(python_op)
+            self.value.output(out)
             out.write(' -= 1')
         else:
             out.write(python_op)
@@ -1484,10 +3024,14 @@ class UnaryOperation(Expression):
 
 
 class BinaryOperation(Expression):
-    def __init__(self, lvalue, op, rvalue):
+    fields = ('lvalue', 'name', 'rvalue', 'typekind')
+
+    def __init__(self, lvalue, op, rvalue, typekind=None):
         self.lvalue = lvalue
         self.name = op
         self.rvalue = rvalue
+        # The canonical C type of the result, if it is known.
+        self.typekind = typekind
 
     def __repr__(self):
         return "<%s %s>" % (self.__class__.__name__, self.name)
@@ -1510,6 +3054,7 @@ class BinaryOperation(Expression):
             '-': ' - ',
             '*': ' * ',
             '/': ' / ',
+            '//': ' // ',
             '%': ' % ',
 
             # Comparison
@@ -1532,6 +3077,7 @@ class BinaryOperation(Expression):
             '-=': ' -= ',
             '*=': ' *= ',
             '/=': ' /= ',
+            '//=': ' //= ',
             '%=': ' %= ',
 
             '&=': ' &= ',
@@ -1551,6 +3097,8 @@ class BinaryOperation(Expression):
 
 
 class ConditionalOperation(Expression):
+    fields = ('condition', 'true_result', 'false_result')
+
     def __init__(self, condition, true_result, false_result):
         self.condition = condition
         self.true_result = true_result
@@ -1570,6 +3118,8 @@ class ConditionalOperation(Expression):
 
 
 class Parentheses(Expression):
+    fields = ('body',)
+
     def __init__(self, body):
         self.body = body
 
@@ -1586,9 +3136,13 @@ class Parentheses(Expression):
 
 
 class ArraySubscript(Expression):
-    def __init__(self, value, index):
+    fields = ('value', 'index', 'typekind')
+
+    def __init__(self, value, index, typekind=None):
         self.value = value
         self.index = index
+        # The canonical C type of the element, if it is known.
+        self.typekind = typekind
 
     def add_imports(self, context):
         self.value.add_imports(context)
@@ -1604,7 +3158,57 @@ class ArraySubscript(Expression):
         return self
 
 
+class Slice(Expression):
+    """A slice of a sequence: `value[start:stop:step]`.
+
+    Any of `start`, `stop` and `step` may be None, in which case it is
+    omitted.
+    """
+    fields = ('value', 'start', 'stop', 'step')
+
+    def __init__(self, value, start=None, stop=None, step=None):
+        self.value = value
+        self.start = start
+        self.stop = stop
+        self.step = step
+
+    def add_imports(self, context):
+        self.value.add_imports(context)
+        for bound in (self.start, self.stop, self.step):
+            if bound is not None:
+                bound.add_imports(context)
+
+    def output(self, out):
+        self.value.output(out)
+        out.write('[')
+        if self.start is not None:
+            self.start.output(out)
+        out.write(':')
+        if self.stop is not None:
+            self.stop.output(out)
+        if self.step is not None:
+            out.write(':')
+            self.step.output(out)
+        out.write(']')
+
+
+# A reference to a function in the numpy module.
+class NumpyReference(Expression):
+    fields = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def add_imports(self, context):
+        context.module.add_import('numpy')
+
+    def output(self, out):
+        out.write('numpy.%s' % self.name)
+
+
 class Cast(Expression):
+    fields = ('typekind', 'value')
+
     def __init__(self, typekind, value):
         self.typekind = typekind
         self.value = value
@@ -1622,38 +3226,15 @@ class Cast(Expression):
             out.write('bool(')
             self.value.output(out)
             out.write(')')
-        elif self.typekind in (
-                    TypeKind.CHAR_U,
-                    TypeKind.UCHAR,
-                    TypeKind.CHAR16,
-                    TypeKind.CHAR32,
-                    TypeKind.CHAR_S,
-                    TypeKind.SCHAR,
-                    TypeKind.WCHAR,
-                ):
+        elif self.typekind in CHARACTER_TYPES:
             out.write('str(')
             self.value.output(out)
             out.write(')')
-        elif self.typekind in (
-                    TypeKind.USHORT,
-                    TypeKind.UINT,
-                    TypeKind.ULONG,
-                    TypeKind.ULONGLONG,
-                    TypeKind.UINT128,
-                    TypeKind.SHORT,
-                    TypeKind.INT,
-                    TypeKind.LONG,
-                    TypeKind.LONGLONG,
-                    TypeKind.INT128,
-                ):
+        elif self.typekind in INTEGER_TYPES:
             out.write('int(')
             self.value.output(out)
             out.write(')')
-        elif self.typekind in (
-                    TypeKind.FLOAT,
-                    TypeKind.DOUBLE,
-                    TypeKind.LONGDOUBLE
-                ):
+        elif self.typekind in FLOAT_TYPES:
             out.write('float(')
             self.value.output(out)
             out.write(')')
@@ -1665,9 +3246,14 @@ class Cast(Expression):
 
 
 class Invoke(Expression):
-    def __init__(self, fn):
+    fields = ('fn', 'arguments')
+    references = ('klass',)
+
+    def __init__(self, fn, klass=None):
         self.fn = fn
         self.arguments = []
+        # If a method is being invoked, the class that declares it.
+        self.klass = klass
 
     def __repr__(self):
         return "<Invoke %s>" % self.fn
@@ -1692,6 +3278,8 @@ class Invoke(Expression):
 
 
 class New(Expression):
+    fields = ('typeref', 'arguments')
+
     def __init__(self, typeref):
         self.typeref = typeref
         self.arguments = []
@@ -0,0 +1,2686 @@
+###########################################################################
+# Optimization passes
+#
+# These passes rewrite the data model produced by the parser before any
+# code is generated, so that the generated code does less work at
+# runtime than a literal translation of the C++ would.
+###########################################################################
+from __future__ import unicode_literals, print_function
+
+import ast
+import copy
+import re
+import sys
+from collections import OrderedDict
+
+from clang.cindex import TypeKind
+
+from .model import (
+    ASSIGNMENT_OPERATORS, BYTE_TYPES, CHARACTER_TYPES, FLOAT_TYPES, INTEGER_TYPES, UNDEFINED,
+    Expression, Declaration, EnumValue, Variable, Parameter,
+    Module, Parent, Function, Method, Class, Struct, Union, Attribute, Constructor, Return,
+    Block, If, For, While, Do, Switch, Break, Continue,
+    VariableReference, TypeReference, PrimitiveTypeReference, SelfReference, AttributeReference,
+    Literal, ListLiteral, ArrayStorage, ColumnStorage, ArraySubscript, Slice, NumpyReference,
+    UnaryOperation, BinaryOperation, ConditionalOperation, Parentheses,
+    Cast, Invoke, New,
+    integer_value,
+)
+
+# Python 2 compatibility shims
+if sys.version_info.major <= 2:
+    text = unicode
+else:
+    text = str
+
+
+class Transformer(object):
+    """Rewrite a model tree in place.
+
+    Each node is passed to the `transform_<class name>` method of the
+    transformer, if there is one; otherwise the children of the node are
+    transformed. The return value of the method replaces the node in the
+    tree.
+    """
+    def run(self, module):
+        "Apply the transformation to a module, and all its submodules."
+        self.transform(module)
+        for submodule in module.submodules.values():
+            self.run(submodule)
+
+    def transform(self, node):
+        handler = getattr(
+            self,
+            'transform_%s' % node.__class__.__name__.lower(),
+            self.transform_children
+        )
+        return handler(node)
+
+    def transform_children(self, node, fields=None):
+        for field in node.fields if fields is None else fields:
+            value = getattr(node, field)
+            if isinstance(value, Expression):
+                setattr(node, field, self.transform(value))
+            elif isinstance(value, list):
+                value[:] = [
+                    self.transform(item) if isinstance(item, Expression) else item
+                    for item in value
+                ]
+            elif isinstance(value, dict):
+                for key, item in value.items():
+                    if isinstance(item, Expression):
+                        value[key] = self.transform(item)
+        return node
+
+    def transform_module(self, node):
+        # Submodules are transformed by run().
+        return self.transform_children(node)
+
+
+class FunctionTransformer(Transformer):
+    "A transformer that can add local variables to functions."
+    def __init__(self):
+        # The names of the local variables in the current function.
+        self.local_names = set()
+
+    def transform_function(self, node):
+        self.local_names = set(
+            decl.name
+            for decl in node.walk()
+            if isinstance(decl, (Variable, Parameter))
+        )
+        self.transform_body(node)
+        self.local_names = set()
+        return node
+
+    transform_method = transform_function
+    transform_constructor = transform_function
+    transform_destructor = transform_function
+
+    def transform_body(self, node):
+        "Transform a function, once the names of its locals are known."
+        self.transform_children(node)
+
+    def local_name(self, name, template='_%s'):
+        "Return an unused local variable name based on `name`."
+        local_name = template % name
+        i = 1
+        while local_name in self.local_names:
+            i += 1
+            local_name = template % ('%s%s' % (name, i))
+        self.local_names.add(local_name)
+        return local_name
+
+
+class Rewriter(Transformer):
+    """A transformer that replaces expressions with compound expressions.
+
+    A replacement is parenthesized (using `bracket()`) in case it is
+    part of a larger expression; the parentheses are removed again
+    wherever the expression turns out to be a statement, a return value,
+    or the value assigned to a variable.
+    """
+    def __init__(self):
+        # The parentheses that were added around replacements.
+        self.brackets = set()
+
+    def bracket(self, expr):
+        if isinstance(expr, (BinaryOperation, ConditionalOperation)):
+            expr = Parentheses(expr)
+            self.brackets.add(expr)
+        return expr
+
+    def unbracket(self, expr):
+        if expr in self.brackets:
+            return expr.body
+        return expr
+
+    def transform_children(self, node, fields=None):
+        super(Rewriter, self).transform_children(node, fields)
+        statements = getattr(node, 'statements', None)
+        if isinstance(statements, list):
+            statements[:] = [self.unbracket(statement) for statement in statements]
+        return node
+
+    def transform_return(self, node):
+        self.transform_children(node)
+        if node.value is not None:
+            node.value = self.unbracket(node.value)
+        return node
+
+    def transform_variable(self, node):
+        self.transform_children(node)
+        if isinstance(node.value, Expression):
+            node.value = self.unbracket(node.value)
+        return node
+
+    def transform_binaryoperation(self, node):
+        self.transform_children(node)
+        if node.name == '=':
+            node.rvalue = self.unbracket(node.rvalue)
+        return node
+
+
+###########################################################################
+# Constant folding
+###########################################################################
+
+# The (bits, signed) representation of each C integer type, assuming
+# an LP64 platform.
+INTEGER_REPRESENTATIONS = {
+    TypeKind.BOOL: (1, False),
+    TypeKind.CHAR_S: (8, True),
+    TypeKind.SCHAR: (8, True),
+    TypeKind.CHAR_U: (8, False),
+    TypeKind.UCHAR: (8, False),
+    TypeKind.SHORT: (16, True),
+    TypeKind.USHORT: (16, False),
+    TypeKind.CHAR16: (16, False),
+    TypeKind.INT: (32, True),
+    TypeKind.UINT: (32, False),
+    TypeKind.WCHAR: (32, True),
+    TypeKind.CHAR32: (32, False),
+    TypeKind.LONG: (64, True),
+    TypeKind.ULONG: (64, False),
+    TypeKind.LONGLONG: (64, True),
+    TypeKind.ULONGLONG: (64, False),
+    TypeKind.INT128: (128, True),
+    TypeKind.UINT128: (128, False),
+}
+
+BOOL = (1, False)
+INT = (32, True)
+
+# The type used to represent the result of a folded operation.
+REPRESENTATION_TYPES = {
+    (32, True): TypeKind.INT,
+    (32, False): TypeKind.UINT,
+    (64, True): TypeKind.LONG,
+    (64, False): TypeKind.ULONG,
+    (128, True): TypeKind.INT128,
+    (128, False): TypeKind.UINT128,
+}
+
+# Operators whose result is a truth value.
+BOOLEAN_OPERATORS = ('==', '!=', '<', '<=', '>', '>=', '&&', '||', '!')
+
+
+def _in_range(value, ctype):
+    bits, signed = ctype
+    if signed:
+        return -(1 << (bits - 1)) <= value < (1 << (bits - 1))
+    return 0 <= value < (1 << bits)
+
+
+def _convert(value, ctype):
+    # Convert an integer to the given type, as a C cast would.
+    bits, signed = ctype
+    if bits == 1:
+        return 1 if value else 0
+    value &= (1 << bits) - 1
+    if signed and value >= (1 << (bits - 1)):
+        value -= 1 << bits
+    return value
+
+
+def _promote(ctype):
+    # Integer promotion: anything smaller than an int becomes an int.
+    if ctype[0] < 32:
+        return INT
+    return ctype
+
+
+def _common(left, right):
+    # The usual arithmetic conversions, for integer operands.
+    left = _promote(left)
+    right = _promote(right)
+    if left[0] != right[0]:
+        return max(left, right)
+    return (left[0], left[1] and right[1])
+
+
+def _literal_type(expr, value):
+    # The type of an integer literal.
+    if getattr(expr, 'typekind', None) in INTEGER_REPRESENTATIONS:
+        return INTEGER_REPRESENTATIONS[expr.typekind]
+
+    # Without type information, use the rules for an unsuffixed
+    # literal: decimal literals are signed, but hex and octal literals
+    # become unsigned if that is the only way they will fit.
+    decimal = not text(expr.value).startswith('0') or text(expr.value) == '0'
+    for ctype in [(32, True), (32, False), (64, True), (64, False)]:
+        if (ctype[1] or not decimal) and _in_range(value, ctype):
+            return ctype
+
+
+class ConstantFolder(Transformer):
+    """Replace expressions whose value is known at conversion time
+    with a single literal.
+
+    Integer arithmetic over literals, enumerated values and initialized
+    const variables is evaluated using C semantics (on an LP64
+    platform). An expression is left alone if its value would be
+    undefined in C, or depends on floating point arithmetic.
+    """
+    def evaluate(self, expr):
+        """Return the (value, (bits, signed)) of a constant expression.
+
+        Returns None if the expression isn't an integer constant.
+        """
+        if isinstance(expr, Literal):
+            if expr.value in ('True', 'False'):
+                return (1 if expr.value == 'True' else 0), BOOL
+            value = integer_value(expr)
+            if value is None:
+                return None
+            ctype = _literal_type(expr, value)
+            if ctype is None:
+                return None
+            return value, ctype
+
+        elif isinstance(expr, EnumValue):
+            if isinstance(expr.value, int):
+                return expr.value, INT
+
+        elif isinstance(expr, VariableReference):
+            var = expr.var
+            if isinstance(var, Variable) and var.const and var.value not in (None, UNDEFINED):
+                result = self.evaluate(var.value)
+                if result and var.typekind in INTEGER_REPRESENTATIONS:
+                    ctype = INTEGER_REPRESENTATIONS[var.typekind]
+                    return _convert(result[0], ctype), ctype
+                return result
+
+        elif isinstance(expr, Parentheses):
+            return self.evaluate(expr.body)
+
+        elif isinstance(expr, Cast):
+            if expr.typekind in INTEGER_REPRESENTATIONS and expr.typekind not in CHARACTER_TYPES:
+                result = self.evaluate(expr.value)
+                if result:
+                    ctype = INTEGER_REPRESENTATIONS[expr.typekind]
+                    return _convert(result[0], ctype), ctype
+
+        elif isinstance(expr, UnaryOperation):
+            operand = self.evaluate(expr.value)
+            if operand:
+                value, ctype = operand[0], _promote(operand[1])
+                if expr.name == '!':
+                    return (0 if value else 1), INT
+                elif expr.name == '+':
+                    result = value
+                elif expr.name == '-':
+                    result = -value
+                elif expr.name == '~':
+                    result = ~value
+                else:
+                    return None
+                return self._result(result, ctype)
+
+        elif isinstance(expr, BinaryOperation):
+            if expr.name in ('&&', '||'):
+                left = self.evaluate(expr.lvalue)
+                right = self.evaluate(expr.rvalue)
+                if left and right:
+                    if expr.name == '&&':
+                        return (1 if left[0] and right[0] else 0), INT
+                    else:
+                        return (1 if left[0] or right[0] else 0), INT
+                return None
+
+            left = self.evaluate(expr.lvalue)
+            right = self.evaluate(expr.rvalue)
+            if not (left and right):
+                return None
+
+            if expr.name in ('<<', '>>'):
+                # The result of a shift has the type of the left operand.
+                ctype = _promote(left[1])
+                a = _convert(left[0], ctype)
+                b = right[0]
+                if b < 0 or b >= ctype[0]:
+                    return None
+                if expr.name == '>>':
+                    return a >> b, ctype
+                if a < 0:
+                    return None
+                return self._result(a << b, ctype)
+
+            ctype = _common(left[1], right[1])
+            a = _convert(left[0], ctype)
+            b = _convert(right[0], ctype)
+            if expr.name == '+':
+                result = a + b
+            elif expr.name == '-':
+                result = a - b
+            elif expr.name == '*':
+                result = a * b
+            elif expr.name in ('/', '%'):
+                if b == 0:
+                    return None
+                # C division truncates towards zero.
+                quotient = abs(a) // abs(b)
+                if (a < 0) != (b < 0):
+                    quotient = -quotient
+                result = quotient if expr.name == '/' else a - b * quotient
+            elif expr.name == '&':
+                result = a & b
+            elif expr.name == '|':
+                result = a | b
+            elif expr.name == '^':
+                result = a ^ b
+            elif expr.name == '==':
+                return (1 if a == b else 0), INT
+            elif expr.name == '!=':
+                return (1 if a != b else 0), INT
+            elif expr.name == '<':
+                return (1 if a < b else 0), INT
+            elif expr.name == '<=':
+                return (1 if a <= b else 0), INT
+            elif expr.name == '>':
+                return (1 if a > b else 0), INT
+            elif expr.name == '>=':
+                return (1 if a >= b else 0), INT
+            else:
+                return None
+            return self._result(result, ctype)
+
+    def _result(self, value, ctype):
+        # Unsigned arithmetic wraps; signed overflow is undefined,
+        # so it can't be folded.
+        if ctype[1]:
+            if _in_range(value, ctype):
+                return value, ctype
+            return None
+        return _convert(value, ctype), ctype
+
+    def fold(self, expr):
+        # Replace the expression with a literal, if it is a constant.
+        result = self.evaluate(expr)
+        if result is None:
+            return expr
+
+        value, ctype = result
+        if ctype == BOOL or (
+                    isinstance(expr, (BinaryOperation, UnaryOperation))
+                    and expr.name in BOOLEAN_OPERATORS
+                ):
+            return Literal('True' if value else 'False')
+        elif isinstance(expr, Parentheses) and isinstance(expr.body, Literal):
+            return expr.body
+        return Literal(text(value), typekind=REPRESENTATION_TYPES.get(ctype, TypeKind.INT))
+
+    def transform_binaryoperation(self, node):
+        if node.name in ASSIGNMENT_OPERATORS:
+            # The target of an assignment is never a constant, but it
+            # may contain constant subexpressions (e.g., an index).
+            if not isinstance(node.lvalue, VariableReference):
+                node.lvalue = self.transform(node.lvalue)
+            node.rvalue = self.transform(node.rvalue)
+            return node
+
+        self.transform_children(node)
+        return self.fold(node)
+
+    def transform_unaryoperation(self, node):
+        if node.name in ('++', '--', '&'):
+            # These operate on a variable, not on its value.
+            return node
+
+        self.transform_children(node)
+        return self.fold(node)
+
+    def transform_parentheses(self, node):
+        self.transform_children(node)
+        return self.fold(node)
+
+    def transform_cast(self, node):
+        self.transform_children(node)
+        return self.fold(node)
+
+    def transform_variablereference(self, node):
+        var = node.var
+        if isinstance(var, Variable) and var.const:
+            return self.fold(node)
+        return node
+
+
+###########################################################################
+# Inlining
+###########################################################################
+
+# The default maximum number of nodes in the body of a function that
+# will be inlined.
+INLINE_SIZE = 12
+
+
+def _copy(node, substitute):
+    # Copy an expression tree. `substitute` is called on each node; if
+    # it returns a value, that value is used in place of the node.
+    # Declarations (such as enumerated values) are shared, not copied.
+    replacement = substitute(node)
+    if replacement is not None:
+        return replacement
+    if isinstance(node, Declaration):
+        return node
+
+    new = copy.copy(node)
+    for field in node.fields:
+        value = getattr(node, field)
+        if isinstance(value, Expression):
+            setattr(new, field, _copy(value, substitute))
+        elif isinstance(value, list):
+            setattr(new, field, [
+                _copy(item, substitute) if isinstance(item, Expression) else item
+                for item in value
+            ])
+    return new
+
+
+def _has_side_effects(expr):
+    for node in expr.walk():
+        if isinstance(node, (Invoke, New)):
+            return True
+        elif isinstance(node, BinaryOperation) and node.name in ASSIGNMENT_OPERATORS:
+            return True
+        elif isinstance(node, UnaryOperation) and node.name in ('++', '--'):
+            return True
+    return False
+
+
+def _bracket(expr):
+    # Parenthesize an expression that is substituted into another.
+    if isinstance(expr, (BinaryOperation, ConditionalOperation)):
+        return Parentheses(expr)
+    return expr
+
+
+class Inliner(Rewriter):
+    """Replace calls to small functions and non-virtual methods with
+    the body of the function.
+
+    A function can be inlined if its body is a single return statement,
+    or (where the call is a statement) a single assignment, and that
+    statement contains no more than `size` nodes. Calls are only inlined
+    if evaluating the arguments has no side effects, so that the
+    arguments can be safely evaluated more than once (or not at all).
+
+    `inlined` records the number of calls that were replaced, keyed by
+    the full name of the function that was called.
+    """
+    def __init__(self, size=INLINE_SIZE):
+        super(Inliner, self).__init__()
+        self.size = size
+        self.inlined = OrderedDict()
+        self.module = None
+        # The names of the local variables at the call site.
+        self.local_names = set()
+
+    def run(self, module):
+        self.module = module
+        super(Inliner, self).run(module)
+
+    def report(self, out):
+        "Describe the calls that were inlined."
+        for name, count in self.inlined.items():
+            print('Inlined %s (%s call%s)' % (name, count, '' if count == 1 else 's'), file=out)
+
+    def callee(self, node):
+        """Return the (function, instance) invoked by `node`.
+
+        `instance` is the expression that provides `self` for a method
+        call. Returns (None, None) if the call can't be resolved.
+        """
+        if isinstance(node.fn, VariableReference):
+            if isinstance(node.fn.var, Function):
+                return node.fn.var, None
+            elif isinstance(node.fn.var, Method) and node.fn.var.static:
+                return node.fn.var, None
+        elif isinstance(node.fn, AttributeReference) and isinstance(node.klass, (Class, Struct, Union)):
+            method = node.klass.methods.get(node.fn.name)
+            if method is not None and not method.static:
+                return method, node.fn.instance
+        return None, None
+
+    def body(self, fn):
+        "Return the statement that makes up the body of `fn`, if it can be inlined."
+        if isinstance(fn, Method) and (fn.virtual or fn.pure_virtual):
+            return None
+        if not fn.statements or len(fn.statements) != 1:
+            return None
+        if any(param.default is not UNDEFINED for param in fn.parameters):
+            return None
+
+        statement = fn.statements[0]
+        if isinstance(statement, Return):
+            if statement.value is None:
+                return None
+        elif not (isinstance(statement, BinaryOperation) and statement.name in ASSIGNMENT_OPERATORS):
+            return None
+
+        nodes = list(statement.walk())
+        if len(nodes) > self.size:
+            return None
+
+        for node in nodes:
+            # A recursive function can't be inlined.
+            if isinstance(node, Invoke) and self.callee(node)[0] is fn:
+                return None
+
+            # Neither can a function that modifies its parameters.
+            if isinstance(node, BinaryOperation) and node.name in ASSIGNMENT_OPERATORS:
+                target = node.lvalue
+            elif isinstance(node, UnaryOperation) and node.name in ('++', '--', '&'):
+                target = node.value
+            else:
+                continue
+            if isinstance(target, VariableReference) and target.var in fn.parameters:
+                return None
+
+        return statement
+
+    def inline(self, node, statement=False):
+        """Return the code that replaces the call `node`.
+
+        If `statement` is True, the call is a statement in its own right.
+        Returns `node` if the call can't be inlined.
+        """
+        fn, instance = self.callee(node)
+        if fn is None or len(node.arguments) != len(fn.parameters):
+            return node
+
+        body = self.body(fn)
+        if body is None or (not statement and not isinstance(body, Return)):
+            return node
+
+        if any(_has_side_effects(arg) for arg in node.arguments):
+            return node
+        if instance is not None and _has_side_effects(instance):
+            return node
+
+        # The body mustn't refer to a global name that is hidden by a
+        # local variable at the call site.
+        for ref in body.walk():
+            if (isinstance(ref, VariableReference)
+                    and ref.var not in fn.parameters
+                    and ref.name in self.local_names):
+                return node
+
+        arguments = dict(zip(fn.parameters, node.arguments))
+
+        def substitute(expr):
+            if isinstance(expr, VariableReference) and expr.var in arguments:
+                return self.bracket(_copy(arguments[expr.var], lambda e: None))
+            elif isinstance(expr, SelfReference) and instance is not None:
+                return self.bracket(_copy(instance, lambda e: None))
+
+        result = _copy(body.value if isinstance(body, Return) else body, substitute)
+        result.add_imports(self.module)
+        if result.location is None:
+            result.location = node.location
+
+        self.inlined[fn.full_name] = self.inlined.get(fn.full_name, 0) + 1
+
+        if statement:
+            # The statement isn't transformed again, so an argument that
+            # is the whole value being assigned is unbracketed here.
+            if isinstance(result, BinaryOperation) and result.name == '=':
+                result.rvalue = self.unbracket(result.rvalue)
+            return result
+        return self.bracket(result)
+
+    def transform_children(self, node, fields=None):
+        super(Inliner, self).transform_children(node, fields)
+        statements = getattr(node, 'statements', None)
+        if isinstance(statements, list):
+            statements[:] = [
+                self.inline(statement, statement=True)
+                if isinstance(statement, Invoke) else statement
+                for statement in statements
+            ]
+        return node
+
+    def transform_function(self, node):
+        self.local_names = set(
+            decl.name
+            for decl in node.walk()
+            if isinstance(decl, (Variable, Parameter))
+        )
+        self.transform_children(node)
+        self.local_names = set()
+        return node
+
+    transform_method = transform_function
+    transform_constructor = transform_function
+    transform_destructor = transform_function
+
+    def transform_invoke(self, node):
+        self.transform_children(node)
+        return self.inline(node)
+
+
+###########################################################################
+# Unsigned overflow
+###########################################################################
+
+# The number of bits in each unsigned integer type whose arithmetic
+# wraps around. (Character types are represented as strings, unless
+# they are represented by their codes; see OverflowMasker. Smaller types
+# are promoted to int before any arithmetic is done.)
+UNSIGNED_BITS = dict(
+    (typekind, bits)
+    for typekind, (bits, signed) in INTEGER_REPRESENTATIONS.items()
+    if not signed and bits > 1 and typekind not in CHARACTER_TYPES
+)
+
+# The number of bits in the unsigned character types, when characters
+# are represented by their codes.
+UNSIGNED_CHAR_BITS = {
+    TypeKind.CHAR_U: 8,
+    TypeKind.UCHAR: 8,
+}
+
+# The range of values that can be held by each integer type.
+TYPE_RANGES = dict(
+    (typekind, (0, 1) if bits == 1 else (
+        (-(1 << (bits - 1)), (1 << (bits - 1)) - 1) if signed else (0, (1 << bits) - 1)
+    ))
+    for typekind, (bits, signed) in INTEGER_REPRESENTATIONS.items()
+    if typekind not in CHARACTER_TYPES
+)
+
+# The operators whose result, reduced modulo 2**N, depends only on the
+# values of their operands modulo 2**N.
+MODULAR_OPERATORS = ('+', '-', '*', '&', '|', '^', '<<')
+
+
+def value_range(expr):
+    """Return the (lowest, highest) value that an integer expression
+    can have in the generated code.
+
+    Returns None if the range isn't known. A value of an integer type is
+    assumed to be in the range of that type.
+    """
+    if isinstance(expr, Literal):
+        if expr.value in ('True', 'False'):
+            return (1, 1) if expr.value == 'True' else (0, 0)
+        value = integer_value(expr)
+        if value is not None:
+            return value, value
+
+    elif isinstance(expr, EnumValue):
+        if isinstance(expr.value, int):
+            return expr.value, expr.value
+
+    elif isinstance(expr, VariableReference):
+        return TYPE_RANGES.get(getattr(expr.var, 'typekind', None))
+
+    elif isinstance(expr, AttributeReference):
+        return TYPE_RANGES.get(expr.typekind)
+
+    elif isinstance(expr, Parentheses):
+        return value_range(expr.body)
+
+    elif isinstance(expr, Cast):
+        if expr.typekind in TYPE_RANGES:
+            value = value_range(expr.value)
+            lowest, highest = TYPE_RANGES[expr.typekind]
+            if value and lowest <= value[0] and value[1] <= highest:
+                return value
+            return lowest, highest
+
+    elif isinstance(expr, ConditionalOperation):
+        true_result = value_range(expr.true_result)
+        false_result = value_range(expr.false_result)
+        if true_result and false_result:
+            return min(true_result[0], false_result[0]), max(true_result[1], false_result[1])
+
+    elif isinstance(expr, UnaryOperation):
+        if expr.name == '!':
+            return 0, 1
+        value = value_range(expr.value)
+        if value is None:
+            return None
+        elif expr.name == '+':
+            return value
+        elif expr.name == '-':
+            return -value[1], -value[0]
+        elif expr.name == '~':
+            return ~value[1], ~value[0]
+
+    elif isinstance(expr, BinaryOperation):
+        if expr.name in ('==', '!=', '<', '<=', '>', '>=', '&&', '||'):
+            return 0, 1
+        elif expr.name == '=':
+            return value_range(expr.rvalue)
+
+        left = value_range(expr.lvalue)
+        right = value_range(expr.rvalue)
+        if expr.name == '&':
+            # Masking with a non-negative value bounds the result.
+            bounds = [r[1] for r in (left, right) if r and r[0] >= 0]
+            if bounds:
+                return 0, min(bounds)
+        if left is None or right is None:
+            return None
+
+        if expr.name == '+':
+            return left[0] + right[0], left[1] + right[1]
+        elif expr.name == '-':
+            return left[0] - right[1], left[1] - right[0]
+        elif expr.name == '*':
+            products = [a * b for a in left for b in right]
+            return min(products), max(products)
+        elif expr.name in ('|', '^'):
+            if left[0] >= 0 and right[0] >= 0:
+                return 0, (1 << max(left[1], right[1]).bit_length()) - 1
+        elif expr.name == '<<':
+            if left[0] >= 0 and right[0] >= 0:
+                return left[0] << right[0], left[1] << right[1]
+        elif expr.name == '>>':
+            if left[0] >= 0 and right[0] >= 0:
+                return left[0] >> right[1], left[1] >> right[0]
+        elif expr.name in ('/', '//'):
+            # (Division by zero is undefined, so a divisor of zero can
+            # be ignored.)
+            if left[0] >= 0 and right[0] >= 0 and right[1] > 0:
+                return left[0] // right[1], left[1] // max(right[0], 1)
+        elif expr.name == '%':
+            if left[0] >= 0 and right[0] >= 0 and right[1] > 0:
+                return 0, min(left[1], right[1] - 1)
+
+
+class OverflowMasker(Rewriter):
+    """Emulate the wrap-around of C unsigned integer arithmetic.
+
+    Python integers never overflow, so the result of unsigned arithmetic
+    is masked (e.g., `x & 0xFFFFFFFF`) to the width of its type, unless
+    `value_range()` shows that the value can't be out of range. The mask
+    for an operand of `+`, `-`, `*`, `<<` and the bitwise operators
+    is deferred to the operation that uses it, as the result of those
+    operations doesn't depend on the bits that would be masked.
+
+    As the operands of unsigned division are never negative, C's
+    truncating division is output as floor division (`//`), which keeps
+    the result an integer. If `char_codes` is True, characters are
+    represented by their codes, so the unsigned character types wrap
+    around too (e.g., when an `unsigned char` is incremented).
+    """
+    def __init__(self, char_codes=False):
+        super(OverflowMasker, self).__init__()
+        self.bits = dict(UNSIGNED_BITS)
+        if char_codes:
+            self.bits.update(UNSIGNED_CHAR_BITS)
+
+        # The expressions whose masking is handled by their parent,
+        # and the number of bits that the parent masks to.
+        self.deferred = {}
+
+    def defer(self, expr, bits):
+        if isinstance(expr, Expression):
+            self.deferred[expr] = bits
+
+    def in_range(self, expr, bits):
+        value = value_range(expr)
+        return value is not None and value[0] >= 0 and value[1] < (1 << bits)
+
+    def mask(self, expr, bits):
+        return BinaryOperation(_bracket(expr), '&', Literal('0x%X' % ((1 << bits) - 1)))
+
+    def wrap(self, node, bits):
+        # Mask the result of an operation, unless the operation that
+        # uses it will mask to the same (or fewer) bits, or the result
+        # can't be out of range.
+        deferred = self.deferred.get(node)
+        if (deferred is not None and deferred <= bits) or self.in_range(node, bits):
+            return node
+        return self.bracket(self.mask(node, bits))
+
+    def update(self, lvalue, op, rvalue, bits):
+        # Express `lvalue op= rvalue` as a masked assignment.
+        return BinaryOperation(
+            lvalue, '=',
+            self.mask(BinaryOperation(_copy(lvalue, lambda e: None), op, rvalue), bits)
+        )
+
+    def transform_parentheses(self, node):
+        if node in self.deferred:
+            self.deferred[node.body] = self.deferred[node]
+        self.transform_children(node)
+        node.body = self.unbracket(node.body)
+        return node
+
+    def transform_binaryoperation(self, node):
+        bits = self.bits.get(node.typekind)
+        if bits is None:
+            return super(OverflowMasker, self).transform_binaryoperation(node)
+
+        if node.name in ('/', '/='):
+            node.name = '/' + node.name
+
+        if node.name == '=':
+            self.defer(node.rvalue, bits)
+            super(OverflowMasker, self).transform_binaryoperation(node)
+            if not self.in_range(node.rvalue, bits):
+                node.rvalue = self.mask(node.rvalue, bits)
+            return node
+
+        elif node.name in ASSIGNMENT_OPERATORS:
+            op = node.name[:-1]
+            rewrite = not _has_side_effects(node.lvalue)
+            if rewrite and op in MODULAR_OPERATORS and op != '<<':
+                self.defer(node.rvalue, bits)
+            self.transform_children(node, ['rvalue'])
+            if not rewrite or self.in_range(BinaryOperation(node.lvalue, op, node.rvalue), bits):
+                return node
+            return self.update(node.lvalue, op, node.rvalue, bits)
+
+        if node.name in MODULAR_OPERATORS:
+            self.defer(node.lvalue, bits)
+            if node.name != '<<':
+                self.defer(node.rvalue, bits)
+        self.transform_children(node)
+        return self.wrap(node, bits)
+
+    def transform_unaryoperation(self, node):
+        bits = self.bits.get(node.typekind)
+        if bits is None:
+            return self.transform_children(node)
+
+        if node.name in ('++', '--'):
+            op = '+' if node.name == '++' else '-'
+            if (_has_side_effects(node.value)
+                    or self.in_range(BinaryOperation(node.value, op, Literal('1')), bits)):
+                return node
+            return self.update(node.value, op, Literal('1'), bits)
+
+        elif node.name in ('-', '~'):
+            self.defer(node.value, bits)
+            self.transform_children(node)
+            return self.wrap(node, bits)
+
+        return self.transform_children(node)
+
+    def transform_cast(self, node):
+        self.transform_children(node)
+        bits = self.bits.get(node.typekind)
+        if bits is not None and not self.in_range(node.value, bits):
+            return self.bracket(self.mask(node, bits))
+        return node
+
+    def transform_variable(self, node):
+        bits = self.bits.get(node.typekind)
+        if bits is not None:
+            self.defer(node.value, bits)
+        super(OverflowMasker, self).transform_variable(node)
+        if bits is not None and isinstance(node.value, Expression) and not self.in_range(node.value, bits):
+            node.value = self.mask(node.value, bits)
+        return node
+
+    def transform_for(self, node):
+        # The step of a loop that is expressed as a range() is never
+        # output, so it doesn't need to be masked.
+        if node.range_arguments is not None:
+            return self.transform_children(node, ['init_stmt', 'expr_stmt', 'statements'])
+        return self.transform_children(node)
+
+
+###########################################################################
+# Loop-invariant lookups
+###########################################################################
+
+def _replace(node, replacement, fields=None):
+    # Replace the descendants of `node` for which `replacement` returns
+    # a value, without descending into the replaced nodes.
+    for field in node.fields if fields is None else fields:
+        value = getattr(node, field)
+        if isinstance(value, Expression):
+            new = replacement(value)
+            if new is None:
+                _replace(value, replacement)
+            else:
+                setattr(node, field, new)
+        elif isinstance(value, list):
+            for i, item in enumerate(value):
+                if isinstance(item, Expression):
+                    new = replacement(item)
+                    if new is None:
+                        _replace(item, replacement)
+                    else:
+                        value[i] = new
+
+
+class LoopHoister(FunctionTransformer):
+    """Read loop-invariant attributes and globals into local variables
+    before a loop begins.
+
+    Within a loop, `self.x`, references to module-level functions and
+    variables, and bound methods (`self.method`) are each a dictionary
+    lookup every time they are evaluated; a local variable is much
+    cheaper. A value is only hoisted if the loop doesn't assign to it.
+    A data attribute of self or a non-const global is also left alone
+    if the loop calls anything, as the call could modify it. Since any
+    instance could be an alias for self, an assignment to an attribute
+    of any object prevents the same attribute of self being hoisted.
+    """
+    def transform_children(self, node, fields=None):
+        # Loops are considered before their contents, so values that
+        # are invariant in an outer loop are hoisted out of all of it.
+        statements = getattr(node, 'statements', None)
+        if isinstance(statements, list):
+            hoisted = []
+            for statement in statements:
+                if isinstance(statement, (For, While, Do)):
+                    hoisted.extend(self.hoist(statement))
+                hoisted.append(statement)
+            statements[:] = hoisted
+        return super(LoopHoister, self).transform_children(node, fields)
+
+    def hoist(self, loop):
+        "Hoist lookups out of `loop`; return the assignments to add before it."
+        # The parts of the loop that are evaluated on every iteration.
+        if isinstance(loop, For):
+            if loop.range_arguments is not None:
+                fields = ['statements']
+            else:
+                fields = ['expr_stmt', 'end_expr', 'statements']
+        else:
+            fields = ['condition', 'statements']
+        parts = [getattr(loop, field) for field in fields]
+
+        written_attributes = set()
+        written_variables = set()
+        calls = False
+        methods = set()
+        for node in loop.walk():
+            if isinstance(node, BinaryOperation) and node.name in ASSIGNMENT_OPERATORS:
+                target = node.lvalue
+            elif isinstance(node, UnaryOperation) and node.name in ('++', '--', '&'):
+                target = node.value
+            elif isinstance(node, (Invoke, New)):
+                calls = True
+                if (isinstance(node, Invoke) and isinstance(node.fn, AttributeReference)
+                        and isinstance(node.klass, (Class, Struct, Union))):
+                    method = node.klass.methods.get(node.fn.name)
+                    if method is not None and not method.static:
+                        methods.add(node.fn)
+                continue
+            else:
+                continue
+
+            while isinstance(target, Parentheses):
+                target = target.body
+            if isinstance(target, AttributeReference):
+                written_attributes.add(target.name)
+            elif isinstance(target, VariableReference):
+                written_variables.add(target.var)
+
+        def key(node):
+            # The value that the node looks up, if it can be hoisted.
+            if isinstance(node, AttributeReference) and isinstance(node.instance, SelfReference):
+                if node.name not in written_attributes and (node in methods or not calls):
+                    return ('self', node.name)
+            elif isinstance(node, VariableReference):
+                if isinstance(node.var, Function):
+                    return node.var
+                elif (isinstance(node.var, Variable) and isinstance(node.var.context, Module)
+                        and node.var not in written_variables
+                        and (node.var.const or not calls)):
+                    return node.var
+
+        lookups = OrderedDict()
+        for part in parts:
+            if not isinstance(part, Expression):
+                continue
+            for node in part.walk():
+                k = key(node)
+                if k is not None and k not in lookups:
+                    lookups[k] = node
+
+        assignments = []
+        locals_ = {}
+        for k, node in lookups.items():
+            if isinstance(node, AttributeReference):
+                typekind = node.typekind
+            else:
+                typekind = getattr(node.var, 'typekind', None)
+            var = Variable(
+                loop.context, self.local_name(node.name), _copy(node, lambda e: None),
+                typekind=typekind
+            )
+            assignments.append(var)
+            locals_[k] = var
+
+        def replacement(node):
+            k = key(node)
+            if k in locals_:
+                return VariableReference(locals_[k], None)
+
+        _replace(loop, replacement, fields)
+        return assignments
+
+
+###########################################################################
+# Columnar storage
+###########################################################################
+
+def _replace_child(parent, old, new):
+    # Replace the child `old` of `parent` with `new`.
+    for field in parent.fields:
+        value = getattr(parent, field)
+        if value is old:
+            setattr(parent, field, new)
+        elif isinstance(value, list):
+            value[:] = [new if item is old else item for item in value]
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                if item is old:
+                    value[key] = new
+
+
+class ColumnarLowering(Transformer):
+    """Store fixed-size arrays of plain-data structs as columns.
+
+    An array of a struct whose attributes are all numbers is stored as a
+    single object with one typed array per attribute, rather than a list
+    of struct instances, and `points[i].x` becomes `points.x[i]`. This
+    is only possible if every use of the array is an access to an
+    attribute of one of its elements. Arrays that are attributes are
+    referred to by name, so all the attributes with a given name (in any
+    class) must be stored in the same way.
+    """
+    def run(self, module):
+        # The analysis covers the whole tree, including submodules.
+        nodes = []
+        parents = {}
+        modules = [module]
+        while modules:
+            mod = modules.pop()
+            modules.extend(mod.submodules.values())
+            for node in mod.walk():
+                nodes.append(node)
+                for child in node.children():
+                    parents[child] = node
+
+        # Find the arrays that could be stored in columns.
+        variables = {}
+        attributes = {}
+        for node in nodes:
+            if not isinstance(node, (Variable, Attribute)):
+                continue
+            record = getattr(node.value, 'record', None) if isinstance(node.value, ArrayStorage) else None
+            if not (isinstance(record, Struct) and isinstance(record.context, Module)
+                    and record.columns is not None):
+                record = None
+
+            if isinstance(node, Variable):
+                if record:
+                    variables[node] = record
+            elif attributes.get(node.name, record) is record:
+                attributes[node.name] = record
+            else:
+                attributes[node.name] = None
+
+        def target(node):
+            # The struct stored in the array that `node` refers to.
+            if isinstance(node, VariableReference):
+                return variables.get(node.var)
+            elif isinstance(node, AttributeReference):
+                return attributes.get(node.name)
+
+        def access(node):
+            # The attribute access `array[index].name` that uses `node`.
+            subscript = parents.get(node)
+            attr = parents.get(subscript)
+            if (isinstance(subscript, ArraySubscript) and subscript.value is node
+                    and isinstance(attr, AttributeReference) and attr.instance is subscript
+                    and attr.name in target(node).columns):
+                return attr
+
+        # Every use of the array must be an access to an attribute of
+        # one of its elements.
+        for node in nodes:
+            if target(node) and access(node) is None:
+                if isinstance(node, VariableReference):
+                    del variables[node.var]
+                else:
+                    attributes[node.name] = None
+
+        for node in nodes:
+            if isinstance(node, Variable):
+                record = variables.get(node)
+            elif isinstance(node, Attribute):
+                record = attributes.get(node.name)
+            else:
+                record = None
+            if record:
+                node.value = ColumnStorage(record, node.value.size)
+                node.value.add_imports(node.context)
+                record.columnar = True
+                record.module.add_import('array', 'array')
+
+        # Nested accesses (in an index) are rewritten first.
+        for node in reversed(nodes):
+            if target(node):
+                attr = access(node)
+                _replace_child(
+                    parents[attr], attr,
+                    ArraySubscript(
+                        AttributeReference(node, attr.name, typekind=attr.typekind),
+                        parents[node].index,
+                        typekind=attr.typekind
+                    )
+                )
+
+
+###########################################################################
+# NumPy vectorization
+###########################################################################
+
+# The operators that NumPy applies to each element of an array with the
+# same result as C. Division and remainder round differently.
+ELEMENTWISE_OPERATORS = ('+', '-', '*', '&', '|', '^', '<<', '>>')
+
+# How tightly each elementwise operator binds in Python; an operand that
+# binds more tightly than its operator doesn't need parentheses.
+BINDING = {'|': 1, '^': 2, '&': 3, '<<': 4, '>>': 4, '+': 5, '-': 5, '*': 6}
+
+# The NumPy function that combines the elements of an array, for each
+# operator that can accumulate a value in a loop.
+REDUCTIONS = {
+    '+=': 'sum',
+    '-=': 'sum',
+    '*=': 'prod',
+}
+
+# The range of integers that NumPy can hold in its default integer type.
+NUMPY_INT_RANGE = (-2 ** 63, 2 ** 63 - 1)
+
+# The integer types that C promotes to int before doing arithmetic. An
+# array.array of these types becomes a NumPy array of the same width,
+# whose arithmetic would overflow, so its elements are widened first.
+PROMOTED_TYPES = (TypeKind.SCHAR, TypeKind.SHORT, TypeKind.USHORT)
+
+
+def _is_number(literal):
+    value = integer_value(literal)
+    if value is not None:
+        return NUMPY_INT_RANGE[0] <= value <= NUMPY_INT_RANGE[1]
+    try:
+        float(text(literal.value).rstrip('fFlL'))
+        return True
+    except ValueError:
+        return False
+
+
+def _storage(array, context):
+    """Return the (storage, typecode) of the array that an expression
+    refers to, in the given context.
+
+    The storage is as described by ArrayStorage, or None if it isn't
+    known.
+    """
+    def value(expr):
+        # The value that an array variable or attribute is given.
+        if isinstance(expr, VariableReference):
+            return getattr(expr.var, 'value', None)
+        elif isinstance(expr, AttributeReference) and isinstance(expr.instance, SelfReference):
+            klass = context
+            while not isinstance(klass, (Class, Struct, Union)):
+                if klass.is_module:
+                    return None
+                klass = klass.context
+            attr = klass.attributes.get(expr.name)
+            return attr.value if attr else None
+
+    if isinstance(array, AttributeReference):
+        columns = value(array.instance)
+        if isinstance(columns, ColumnStorage):
+            return 'array', columns.record.columns.get(array.name)
+
+    storage = value(array)
+    if isinstance(storage, ArrayStorage):
+        return storage.storage, storage.typecode
+    elif isinstance(storage, ListLiteral):
+        return 'list', None
+    return None, None
+
+
+def _numpy(name, *arguments):
+    # Call a function in the numpy module.
+    call = Invoke(NumpyReference(name))
+    for argument in arguments:
+        call.add_argument(argument)
+    return call
+
+
+def _method(instance, name, *arguments):
+    # Call a method.
+    call = Invoke(AttributeReference(_bracket(instance), name))
+    for argument in arguments:
+        call.add_argument(argument)
+    return call
+
+
+class Vectorizer(FunctionTransformer):
+    """Replace elementwise loops over arrays with NumPy operations.
+
+    A `for` loop over a range is vectorized if every statement in its
+    body either assigns to element `i` of an array, or accumulates a
+    sum or product in a local variable; and the values involved are
+    computed with arithmetic on element `i` of arrays, the loop variable
+    `i`, and values that the loop doesn't change. Each iteration then
+    only uses element `i` of each array, so no iteration depends on
+    another, and each statement can be applied to the whole range at
+    once. Floating point sums may round differently, as NumPy adds the
+    elements in a different order. Elements of types narrower than int
+    are widened to 64 bits, as C would promote them. An integer sum or
+    product is only vectorized if every array it uses is known to be
+    an array.array of integers, as a NumPy array made from an empty
+    list holds floats, so its sum would be 0.0.
+
+    The result is converted back to Python numbers before it is stored,
+    so the array being assigned must be a local variable or attribute
+    of self whose storage is known. Any loop that doesn't meet these
+    conditions is left as it is.
+    """
+    def transform_children(self, node, fields=None):
+        statements = getattr(node, 'statements', None)
+        if isinstance(statements, list):
+            vectorized = []
+            for statement in statements:
+                replacement = self.vectorize(statement) if isinstance(statement, For) else None
+                if replacement is None:
+                    vectorized.append(statement)
+                else:
+                    vectorized.extend(replacement)
+            statements[:] = vectorized
+        return super(Vectorizer, self).transform_children(node, fields)
+
+    def vectorize(self, loop):
+        "Return the statements that replace `loop`, or None if it can't be vectorized."
+        arguments = loop.range_arguments
+        if arguments is None or not loop.statements.statements:
+            return None
+        start, stop, step = arguments
+        if step < 0:
+            return None
+
+        # Every statement must assign to element i of an array, or
+        # accumulate a value in a local variable.
+        reductions = set()
+        for statement in loop.statements.statements:
+            if not (isinstance(statement, BinaryOperation)
+                    and statement.name in ASSIGNMENT_OPERATORS):
+                return None
+            target = statement.lvalue
+            if isinstance(target, ArraySubscript):
+                if statement.name != '=' and statement.name[:-1] not in ELEMENTWISE_OPERATORS:
+                    return None
+            elif (isinstance(target, VariableReference) and statement.name in REDUCTIONS
+                    and isinstance(target.var, (Variable, Parameter))
+                    and not isinstance(target.var.context, (Module, Class, Struct, Union))
+                    and target.var not in reductions):
+                reductions.add(target.var)
+            else:
+                return None
+
+        def invariant(expr):
+            # Does the expression have the same value on every iteration?
+            for node in expr.walk():
+                if isinstance(node, VariableReference):
+                    if loop._is_var(node, loop.init_stmt) or node.var in reductions:
+                        return False
+                elif not isinstance(node, (SelfReference, AttributeReference, ArraySubscript,
+                                           Literal, EnumValue, Parentheses)):
+                    return False
+            return True
+
+        def element(node):
+            # Is the node element i of an array of numbers?
+            return (
+                isinstance(node, ArraySubscript)
+                and loop._is_var(node.index, loop.init_stmt)
+                and node.typekind not in CHARACTER_TYPES
+                and node.typekind != TypeKind.BOOL
+                and invariant(node.value)
+                and _storage(node.value, loop.context)[0] != 'bytearray'
+            )
+
+        def typed_integers(node):
+            # Is the node element i of an array.array of integers?
+            storage, typecode = _storage(node.value, loop.context)
+            return storage == 'array' and node.typekind not in FLOAT_TYPES
+
+        if not (isinstance(start, Literal) or invariant(start)):
+            return None
+
+        # The bounds of the slice. A negative stop would count from the
+        # end of the array, so it is clamped, unless it can't be negative.
+        first = None if integer_value(start) == 0 else start
+        stride = None if step == 1 else Literal(step)
+        if integer_value(stop) is not None:
+            if integer_value(stop) < 0:
+                return None
+            clamp = False
+        else:
+            clamp = not (isinstance(stop, VariableReference)
+                         and getattr(stop.var, 'typekind', None) in UNSIGNED_BITS)
+
+        # The assignments that store to an array.array.
+        typed = []
+
+        def rewrite(last):
+            # The statements that apply the loop body to the slice
+            # ending at `last`, or None.
+            def part(array):
+                # The part of the array that the loop uses.
+                return Slice(
+                    _copy(array, lambda e: None),
+                    None if first is None else _copy(first, lambda e: None),
+                    _copy(last, lambda e: None),
+                    stride,
+                )
+
+            vector = []
+
+            def convert(node):
+                # The equivalent of `node` for every iteration at once.
+                if element(node):
+                    vector.append(node)
+                    values = _numpy('asarray', part(node.value))
+                    if node.typekind in PROMOTED_TYPES:
+                        values = _method(values, 'astype', NumpyReference('int64'))
+                    return values
+                elif loop._is_var(node, loop.init_stmt):
+                    vector.append(node)
+                    indices = _numpy('arange')
+                    if first is not None or stride is not None:
+                        indices.add_argument(_copy(start, lambda e: None))
+                    indices.add_argument(_copy(last, lambda e: None))
+                    if stride is not None:
+                        indices.add_argument(stride)
+                    return indices
+                elif isinstance(node, BinaryOperation) and node.name in ELEMENTWISE_OPERATORS:
+                    lvalue = convert(node.lvalue)
+                    rvalue = convert(node.rvalue)
+                    if lvalue is None or rvalue is None:
+                        return None
+                    return BinaryOperation(lvalue, node.name, rvalue, typekind=node.typekind)
+                elif isinstance(node, UnaryOperation) and node.name in ('-', '~'):
+                    value = convert(node.value)
+                    if value is None:
+                        return None
+                    return UnaryOperation(node.name, value, typekind=node.typekind)
+                elif isinstance(node, Parentheses):
+                    body = convert(node.body)
+                    return None if body is None else Parentheses(body)
+                elif isinstance(node, Literal):
+                    return _copy(node, lambda e: None) if _is_number(node) else None
+                elif (isinstance(node, (VariableReference, AttributeReference))
+                        and invariant(node)):
+                    return _copy(node, lambda e: None)
+
+            statements = []
+            for statement in loop.statements.statements:
+                del vector[:]
+                values = convert(statement.rvalue)
+                if values is None or not vector:
+                    return None
+
+                target = statement.lvalue
+                if isinstance(target, ArraySubscript):
+                    storage, typecode = _storage(target.value, loop.context)
+                    if not element(target) or storage not in ('list', 'array'):
+                        return None
+                    if statement.name != '=':
+                        op = statement.name[:-1]
+                        if not (isinstance(values, BinaryOperation)
+                                and BINDING.get(values.name, 0) > BINDING[op]):
+                            values = _bracket(values)
+                        values = BinaryOperation(
+                            _numpy('asarray', part(target.value)),
+                            op,
+                            values,
+                            typekind=statement.typekind
+                        )
+
+                    # Store Python numbers, not NumPy scalars.
+                    values = _method(values, 'tolist')
+                    if storage == 'array':
+                        copy = Invoke(PrimitiveTypeReference('array'))
+                        copy.add_argument(Literal("'%s'" % typecode))
+                        copy.add_argument(values)
+                        values = copy
+                        typed.append(target)
+                    statements.append(BinaryOperation(part(target.value), '=', values))
+                else:
+                    if getattr(target.var, 'typekind', None) not in FLOAT_TYPES and not all(
+                                typed_integers(node)
+                                for node in vector
+                                if isinstance(node, ArraySubscript)
+                            ):
+                        return None
+                    statements.append(BinaryOperation(
+                        _copy(target, lambda e: None), statement.name,
+                        _method(_numpy(REDUCTIONS[statement.name], values), 'item'),
+                        typekind=statement.typekind
+                    ))
+            return statements
+
+        if rewrite(stop) is None:
+            return None
+
+        if clamp:
+            bound = Invoke(PrimitiveTypeReference('max'))
+            bound.add_argument(stop)
+            bound.add_argument(Literal(0))
+            var = Variable(
+                loop.context,
+                self.local_name(
+                    stop.name if isinstance(stop, (VariableReference, AttributeReference)) else 'stop'
+                ),
+                bound,
+                typekind=getattr(stop, 'typekind', None)
+            )
+            statements = [var] + rewrite(VariableReference(var, None))
+        else:
+            statements = rewrite(stop)
+
+        for statement in statements:
+            statement.add_imports(loop.context)
+        if typed:
+            loop.context.module.add_import('array', 'array')
+        return statements
+
+
+###########################################################################
+# Byte buffer cursors
+###########################################################################
+
+# The operators that compare two values.
+COMPARISON_OPERATORS = ('==', '!=', '<', '<=', '>', '>=')
+
+
+def _strip(expr):
+    # Remove any parentheses around an expression.
+    while isinstance(expr, Parentheses):
+        expr = expr.body
+    return expr
+
+
+def _offset(offset, op, amount):
+    # Move an offset (None for the start of a buffer) by an amount.
+    if offset is None:
+        return amount if op == '+' else UnaryOperation('-', _bracket(amount))
+    return BinaryOperation(offset, op, _bracket(amount))
+
+
+def _call(name, *arguments):
+    # Call a builtin function.
+    call = Invoke(PrimitiveTypeReference(name))
+    for argument in arguments:
+        call.add_argument(argument)
+    return call
+
+
+class CursorLowering(FunctionTransformer):
+    """Represent pointers into byte buffers as a buffer and an index.
+
+    A local `char *` (or `unsigned char *`) that a function moves is
+    stored as the buffer it points into, plus an integer cursor: `p++`
+    becomes `p_pos += 1`, and `*p` and `p[i]` become `p[p_pos]` and
+    `p[p_pos + i]`, so walking a buffer doesn't copy it. Where a moved
+    pointer (or the sum of a pointer and an offset) is passed on as a
+    value, it becomes a memoryview of the rest of the buffer; a plain
+    `char` buffer may be a str, so it is sliced instead. Pointers with
+    the same origin are compared by their cursors; other pointers are
+    compared by the length of the buffer that remains after them.
+
+    A pointer is left as it is if its address is taken, or if it is
+    moved or assigned anywhere other than a statement of its own (or
+    the increment of a `for` loop) -- for example, in a condition.
+    """
+    def __init__(self):
+        super(CursorLowering, self).__init__()
+        self.function = None
+        self.parents = {}
+        self.cursors = {}
+        self.origins = {}
+
+    def transform_body(self, node):
+        # The lowered code calls these builtins.
+        if node.statements is None or self.local_names & set(['len', 'memoryview']):
+            return
+
+        # Each node of the function, and the node that contains it.
+        self.parents = {}
+        for parent in node.walk():
+            for child in parent.children():
+                self.parents[child] = parent
+        self.function = node
+
+        # The cursor variable of each pointer that is lowered; None if
+        # the pointer always points to the start of its buffer.
+        self.cursors = {}
+        bindings = {}
+        moved = set()
+        for decl in node.walk():
+            if isinstance(decl, (Variable, Parameter)) and getattr(decl, 'pointee', None) in BYTE_TYPES:
+                uses = self.uses(decl)
+                if uses is not None:
+                    self.cursors[decl] = None
+                    bindings[decl], is_moved = uses
+                    if is_moved:
+                        moved.add(decl)
+
+        # A pointer needs a cursor if it is moved, or if it could be
+        # given a pointer into the middle of a buffer.
+        changed = True
+        while changed:
+            changed = False
+            for decl in self.cursors:
+                if self.cursors[decl] is None and (decl in moved or any(
+                    self.pointer(value) is not None and self.pointer(value)[1] is not None
+                    for value in bindings[decl]
+                )):
+                    self.cursors[decl] = Variable(
+                        decl.context, self.local_name(decl.name, '%s_pos'), None,
+                        typekind=TypeKind.LONG
+                    )
+                    changed = True
+
+        # The buffer that each pointer points into, if it is always
+        # the same one.
+        self.origins = {}
+        for decl in self.cursors:
+            self.origins[decl] = self.origin(decl, bindings, set())
+
+        # A parameter's cursor starts at the beginning of the buffer
+        # that is passed in.
+        for decl in reversed(node.parameters):
+            if self.cursors.get(decl) is not None:
+                self.cursors[decl].value = Literal('0')
+                node.statements.insert(0, self.cursors[decl])
+
+        self.transform_children(node)
+        self.cursors = {}
+        self.parents = {}
+
+    def statement(self, node):
+        # The statement that contains the node, if the node is always
+        # evaluated when the statement is.
+        while True:
+            parent = self.parents.get(node)
+            if parent is None:
+                return None
+            statements = getattr(parent, 'statements', None)
+            if isinstance(statements, list) and any(s is node for s in statements):
+                return node
+            if isinstance(parent, (Parent, ConditionalOperation)) or (
+                        isinstance(parent, BinaryOperation) and parent.name in ('&&', '||')):
+                return None
+            node = parent
+
+    def uses(self, decl):
+        """Check that a pointer can be lowered.
+
+        Returns the values that the pointer is given and whether it is
+        moved, or None if it can't be lowered.
+        """
+        if isinstance(decl, Variable):
+            if self.statement(decl) is not decl:
+                return None
+            values = [decl.value] if isinstance(decl.value, Expression) else []
+        else:
+            values = []
+
+        moved = False
+        for node in self.function.walk():
+            if not (isinstance(node, VariableReference) and node.var is decl):
+                continue
+            op = self.parents.get(node)
+            while isinstance(op, Parentheses):
+                op = self.parents.get(op)
+
+            if isinstance(op, UnaryOperation) and op.name == '&':
+                return None
+            elif isinstance(op, UnaryOperation) and op.name in ('++', '--'):
+                moved = True
+                parent = self.parents.get(op)
+                if not (self.statement(op) is not None
+                        or (isinstance(parent, For) and parent.end_expr is op)):
+                    return None
+            elif (isinstance(op, BinaryOperation) and op.name in ASSIGNMENT_OPERATORS
+                    and _strip(op.lvalue) is node):
+                parent = self.parents.get(op)
+                if op.name == '=':
+                    if self.statement(op) is not op:
+                        return None
+                    values.append(op.rvalue)
+                elif op.name in ('+=', '-='):
+                    moved = True
+                    if not (self.statement(op) is op
+                            or (isinstance(parent, For) and parent.end_expr is op)):
+                        return None
+                else:
+                    return None
+        return values, moved
+
+    def origin(self, decl, bindings, seen):
+        # The declaration of the buffer that a pointer always points
+        # into; the pointer itself if it can point into more than one.
+        if isinstance(decl, Variable) and decl not in seen and bindings[decl]:
+            seen.add(decl)
+            origins = set()
+            for value in bindings[decl]:
+                base = self.pointer(value)
+                buffer = base and _strip(base[0])
+                if not isinstance(buffer, VariableReference):
+                    return decl
+                elif buffer.var in self.cursors:
+                    origins.add(self.origin(buffer.var, bindings, seen))
+                else:
+                    origins.add(buffer.var)
+            if len(origins) == 1:
+                return origins.pop()
+        return decl
+
+    def pointer(self, expr):
+        """Split a pointer into a byte buffer into (buffer, offset).
+
+        The offset is None if the pointer is to the start of the buffer.
+        Returns None if the expression isn't known to be a pointer into
+        a byte buffer. Neither part has been transformed.
+        """
+        expr = _strip(expr)
+        if isinstance(expr, VariableReference) and expr.var in self.cursors:
+            cursor = self.cursors[expr.var]
+            return expr, None if cursor is None else VariableReference(cursor, None)
+        elif isinstance(expr, (VariableReference, AttributeReference)):
+            if _storage(expr, self.function)[0] == 'bytearray':
+                return expr, None
+        elif (isinstance(expr, BinaryOperation) and expr.name in ('+', '-')
+                and expr.typekind == TypeKind.POINTER):
+            base, amount = self.pointer(expr.lvalue), expr.rvalue
+            if base is None and expr.name == '+':
+                base, amount = self.pointer(expr.rvalue), expr.lvalue
+            if base is not None:
+                return base[0], _offset(base[1], expr.name, amount)
+        elif isinstance(expr, UnaryOperation) and expr.name == '&':
+            element = _strip(expr.value)
+            if isinstance(element, ArraySubscript):
+                base = self.pointer(element.value)
+                if base is not None:
+                    return base[0], _offset(base[1], '+', element.index)
+        return None
+
+    def view(self, buffer, offset):
+        # The rest of the buffer after the offset, without copying it
+        # (unless it is a str).
+        if offset is None:
+            return buffer
+        decl = getattr(_strip(buffer), 'var', None)
+        if getattr(decl, 'pointee', None) in (TypeKind.CHAR_S, TypeKind.CHAR_U):
+            return Slice(buffer, self.transform(offset))
+        return Slice(_call('memoryview', buffer), self.transform(offset))
+
+    def remaining(self, buffer, offset):
+        # The length of the buffer after the offset.
+        length = _call('len', buffer)
+        if offset is None:
+            return length
+        return BinaryOperation(length, '-', _bracket(self.transform(offset)))
+
+    def step(self, cursor, op, amount):
+        # Move a cursor.
+        return BinaryOperation(VariableReference(cursor, None), op, amount)
+
+    def expand(self, statement):
+        "Return the (transformed) statements that replace a statement."
+        before = []
+        after = []
+        if not isinstance(statement, Parent):
+            # A pointer that is moved as part of a larger statement is
+            # moved before or after the statement.
+            for node in list(statement.walk()):
+                value = _strip(getattr(node, 'value', None))
+                if (isinstance(node, UnaryOperation) and node.name in ('++', '--')
+                        and node is not statement and isinstance(value, VariableReference)
+                        and self.cursors.get(value.var) is not None):
+                    _replace_child(self.parents[node], node, node.value)
+                    step = self.step(
+                        self.cursors[value.var],
+                        '+=' if node.name == '++' else '-=',
+                        Literal('1')
+                    )
+                    (after if node.postfix else before).append(step)
+            if isinstance(statement, Return):
+                after = []
+
+        if isinstance(statement, Variable) and self.cursors.get(statement) is not None:
+            cursor = self.cursors[statement]
+            if isinstance(statement.value, Expression):
+                statement.value, cursor.value = self.rebind(statement.value)
+            else:
+                cursor.value = statement.value
+            return before + [statement, cursor] + after
+
+        lvalue = _strip(getattr(statement, 'lvalue', None))
+        if (isinstance(statement, BinaryOperation) and statement.name == '='
+                and isinstance(lvalue, VariableReference)
+                and self.cursors.get(lvalue.var) is not None):
+            buffer, offset = self.rebind(statement.rvalue)
+            statements = [self.step(self.cursors[lvalue.var], '=', offset)]
+            if not (isinstance(_strip(buffer), VariableReference) and _strip(buffer).var is lvalue.var):
+                statements.insert(0, BinaryOperation(statement.lvalue, '=', buffer))
+            return before + statements + after
+
+        return before + [self.transform(statement)] + after
+
+    def rebind(self, value):
+        # The (transformed) buffer and offset for a pointer's new value.
+        base = self.pointer(value)
+        if base is None:
+            return self.transform(value), Literal('0')
+        buffer, offset = base
+        return buffer, Literal('0') if offset is None else self.transform(offset)
+
+    def transform_children(self, node, fields=None):
+        statements = getattr(node, 'statements', None)
+        if self.cursors and isinstance(statements, list):
+            expanded = []
+            for statement in statements:
+                expanded.extend(self.expand(statement))
+            statements[:] = expanded
+            fields = [
+                field
+                for field in (node.fields if fields is None else fields)
+                if field != 'statements'
+            ]
+        return super(CursorLowering, self).transform_children(node, fields)
+
+    def transform_arraysubscript(self, node):
+        base = self.pointer(node.value)
+        if base is None:
+            return self.transform_children(node)
+
+        buffer, offset = base
+        node.value = buffer
+        if offset is None:
+            node.index = self.transform(node.index)
+        elif integer_value(node.index) == 0:
+            node.index = self.transform(offset)
+        else:
+            node.index = self.transform(_offset(offset, '+', node.index))
+        return node
+
+    def transform_unaryoperation(self, node):
+        value = _strip(node.value)
+        if (node.name in ('++', '--') and isinstance(value, VariableReference)
+                and self.cursors.get(value.var) is not None):
+            return self.step(
+                self.cursors[value.var], '+=' if node.name == '++' else '-=', Literal('1')
+            )
+        elif node.name == '&':
+            base = self.pointer(node)
+            if base is not None:
+                return self.view(*base)
+        return self.transform_children(node)
+
+    def transform_binaryoperation(self, node):
+        lvalue = _strip(node.lvalue)
+        if (node.name in ('+=', '-=') and isinstance(lvalue, VariableReference)
+                and self.cursors.get(lvalue.var) is not None):
+            return self.step(self.cursors[lvalue.var], node.name, self.transform(node.rvalue))
+
+        if node.name in COMPARISON_OPERATORS or (
+                    node.name == '-' and node.typekind != TypeKind.POINTER):
+            left = self.pointer(node.lvalue)
+            right = self.pointer(node.rvalue)
+            if left is not None and right is not None:
+                origins = set(
+                    self.origins.get(base.var, base.var) if isinstance(base, VariableReference) else base
+                    for base in (_strip(left[0]), _strip(right[0]))
+                )
+                if len(origins) == 1:
+                    # Compare the positions in the same buffer.
+                    return BinaryOperation(
+                        Literal('0') if left[1] is None else self.transform(left[1]),
+                        node.name,
+                        _bracket(Literal('0') if right[1] is None else self.transform(right[1])),
+                        typekind=node.typekind
+                    )
+                # A pointer that is further into a buffer has less of
+                # the buffer remaining after it.
+                return BinaryOperation(
+                    self.remaining(*right), node.name, _bracket(self.remaining(*left)),
+                    typekind=node.typekind
+                )
+
+        if node.name in ('+', '-') and node.typekind == TypeKind.POINTER:
+            base = self.pointer(node)
+            if base is not None:
+                return self.view(*base)
+        return self.transform_children(node)
+
+    def transform_variablereference(self, node):
+        cursor = self.cursors.get(node.var)
+        if cursor is None:
+            return node
+
+        # A pointer that is only tested for null is the buffer.
+        parent = self.parents.get(node)
+        while isinstance(parent, Parentheses):
+            parent = self.parents.get(parent)
+        if (isinstance(parent, (If, While, Do, For, ConditionalOperation))
+                or (isinstance(parent, UnaryOperation) and parent.name == '!')
+                or (isinstance(parent, BinaryOperation)
+                    and parent.name in COMPARISON_OPERATORS + ('&&', '||'))):
+            return node
+        return self.view(node, VariableReference(cursor, None))
+
+
+###########################################################################
+# Character codes
+###########################################################################
+
+# A segment of a C string literal, and a sequence of adjacent segments.
+STRING_SEGMENT = re.compile(r'(?:L|u8|u|U)?("(?:[^"\\]|\\.)*")')
+STRING_SEGMENTS = re.compile(r'\s*(?:%s\s*)+$' % STRING_SEGMENT.pattern)
+
+# The escape sequences used in a bytes literal.
+BYTES_ESCAPES = {
+    ord('\\'): '\\\\',
+    ord("'"): "\\'",
+    ord('\n'): '\\n',
+    ord('\r'): '\\r',
+    ord('\t'): '\\t',
+}
+
+
+def _character_code(literal):
+    # The integer code of a character literal, or None.
+    if not isinstance(literal, Literal):
+        return None
+    source = text(literal.value).lstrip('LuU8')
+    if not source.startswith("'"):
+        return None
+    try:
+        value = ast.literal_eval(source)
+    except (SyntaxError, ValueError):
+        return None
+    if len(value) == 1:
+        return ord(value)
+
+
+def _string_data(literal):
+    # The bytes of a string literal, or None. Each segment of the literal
+    # is evaluated as bytes, so that an escape like \xff is a single
+    # byte, as in C; any other character is encoded as UTF-8.
+    if not isinstance(literal, Literal):
+        return None
+    source = ''.join(
+        char if ord(char) < 128 else ''.join(
+            '\\x%02x' % byte for byte in bytearray(char.encode('utf-8'))
+        )
+        for char in text(literal.value)
+    )
+    if not STRING_SEGMENTS.match(source):
+        return None
+    try:
+        return ast.literal_eval(STRING_SEGMENT.sub(r'b\1', source))
+    except (SyntaxError, ValueError):
+        return None
+
+
+def _bytes_literal(data):
+    # The Python source for a bytes literal.
+    return "b'%s'" % ''.join(
+        BYTES_ESCAPES.get(byte, chr(byte) if 32 <= byte < 127 else '\\x%02x' % byte)
+        for byte in bytearray(data)
+    )
+
+
+class CharacterCodes(Transformer):
+    """Represent C char values as their integer codes.
+
+    Character literals become integers, and a cast to a char type
+    doesn't make a str. A string literal becomes a bytes literal with
+    a NUL terminator (or a bytearray, if it initializes a char array,
+    padded with NULs to the size of the array), so that each of its
+    characters is also an integer; but a string
+    literal that is passed straight to a function that isn't being
+    converted (such as a library function) is left as a str.
+    """
+    def transform_literal(self, node):
+        code = _character_code(node)
+        if code is not None:
+            return Literal(text(code), typekind=node.typekind)
+        data = _string_data(node)
+        if data is not None:
+            return Literal(_bytes_literal(data + b'\0'), typekind=node.typekind)
+        return node
+
+    def transform_variable(self, node):
+        data = _string_data(node.value)
+        if node.typekind == TypeKind.CONSTANTARRAY and data is not None:
+            size = getattr(node, 'size', None)
+            if size is None:
+                data += b'\0'
+            else:
+                # As in C, the rest of the array is zeroed; an array
+                # that is exactly as long as the string has no NUL.
+                data = data[:size] + b'\0' * (size - len(data))
+            storage = Invoke(PrimitiveTypeReference('bytearray'))
+            storage.add_argument(Literal(_bytes_literal(data), typekind=node.value.typekind))
+            node.value = storage
+            return node
+        return self.transform_children(node)
+
+    transform_attribute = transform_variable
+
+    def transform_parameter(self, node):
+        node.char_codes = True
+        return node
+
+    def transform_invoke(self, node):
+        if (isinstance(node.fn, VariableReference) and isinstance(node.fn.var, Function)
+                and node.fn.var.statements is None):
+            node.arguments[:] = [
+                argument if _string_data(argument) is not None else self.transform(argument)
+                for argument in node.arguments
+            ]
+            return node
+        return self.transform_children(node)
+
+    def transform_cast(self, node):
+        self.transform_children(node)
+        if node.typekind not in CHARACTER_TYPES:
+            return node
+
+        value = node.value
+        if (getattr(value, 'typekind', None) in FLOAT_TYPES
+                or (isinstance(value, Literal) and value.typekind is None
+                    and integer_value(value) is None)):
+            value = Cast(TypeKind.INT, value)
+        if node.typekind in (TypeKind.UCHAR, TypeKind.CHAR_U):
+            value = BinaryOperation(_bracket(value), '&', Literal('0xFF'))
+        return value
+
+
+###########################################################################
+# Dead code elimination
+###########################################################################
+
+# The statements that can be removed if their result isn't used.
+PURE_STATEMENTS = (
+    Literal, VariableReference, AttributeReference, Parentheses, ArraySubscript,
+    UnaryOperation, BinaryOperation, ConditionalOperation, Cast,
+)
+
+
+def _terminates(statement):
+    # Does control never continue past this statement?
+    if isinstance(statement, (Return, Break, Continue)):
+        return True
+    elif isinstance(statement, If) and statement.if_false is not None:
+        if isinstance(statement.if_false, If):
+            if_false = _terminates(statement.if_false)
+        else:
+            if_false = bool(statement.if_false.statements) and _terminates(statement.if_false.statements[-1])
+        return if_false and bool(statement.if_true.statements) and _terminates(statement.if_true.statements[-1])
+    return False
+
+
+def _assigned(statement):
+    # The variable reference that is assigned by a statement, or None.
+    if isinstance(statement, BinaryOperation) and statement.name in ASSIGNMENT_OPERATORS:
+        target = statement.lvalue
+    elif isinstance(statement, UnaryOperation) and statement.name in ('++', '--'):
+        target = statement.value
+    else:
+        return None
+    if isinstance(target, VariableReference):
+        return target
+
+
+class DeadCodeEliminator(FunctionTransformer):
+    """Remove the statements of functions that can never be executed, or
+    whose result is never used.
+
+    An if, while or `do ... while (0)` whose condition is a constant
+    (such as an expanded macro, an enumerated value or an initialized
+    const variable) is replaced by the statements that are executed;
+    statements that follow a return, break or continue are removed;
+    and so are local variables whose value is never read, along with
+    the assignments to them, unless computing the value has side
+    effects.
+
+    `removed` records the number of each kind of code that was removed,
+    keyed by the full name of the function it was removed from.
+    """
+    def __init__(self):
+        super(DeadCodeEliminator, self).__init__()
+        self.folder = ConstantFolder()
+        self.removed = OrderedDict()
+        self.function = None
+
+    def report(self, out):
+        "Describe the code that was removed."
+        for name, counts in self.removed.items():
+            print('Removed from %s: %s' % (name, ', '.join(
+                '%s %s%s' % (count, kind, '' if count == 1 else 's')
+                for kind, count in counts.items()
+            )), file=out)
+
+    def count(self, kind, number=1):
+        if number:
+            counts = self.removed.setdefault(self.function.full_name, OrderedDict())
+            counts[kind] = counts.get(kind, 0) + number
+
+    def constant(self, condition):
+        "Return the value of a constant condition, or None."
+        result = self.folder.evaluate(condition)
+        if result is not None:
+            return result[0]
+
+    def transform_body(self, node):
+        if node.statements is None:
+            return
+        self.function = node
+        self.prune(node.statements)
+        while self.remove_unused(node):
+            self.prune(node.statements)
+        self.function = None
+
+    def prune(self, statements):
+        "Remove the unreachable statements from a list of statements."
+        pruned = []
+        for i, statement in enumerate(statements):
+            pruned.extend(self.simplify(statement))
+            if pruned and _terminates(pruned[-1]):
+                self.count('unreachable statement', len(statements) - i - 1)
+                break
+        statements[:] = pruned
+
+    def simplify(self, statement):
+        "Return the statements that replace `statement`."
+        if isinstance(statement, If):
+            value = self.constant(statement.condition)
+            if value is None:
+                self.prune(statement.if_true.statements)
+                if isinstance(statement.if_false, If):
+                    if_false = self.simplify(statement.if_false)
+                    if len(if_false) == 1 and isinstance(if_false[0], If):
+                        statement.if_false = if_false[0]
+                    elif if_false:
+                        statement.if_false = Block(statement)
+                        statement.if_false.statements = if_false
+                    else:
+                        statement.if_false = None
+                elif statement.if_false is not None:
+                    self.prune(statement.if_false.statements)
+
+                if statement.if_false is not None and not statement.if_false.statements:
+                    statement.if_false = None
+                if (not statement.if_true.statements and statement.if_false is None
+                        and not _has_side_effects(statement.condition)):
+                    self.count('empty if statement')
+                    return []
+                return [statement]
+
+            self.count('constant condition')
+            if value:
+                self.prune(statement.if_true.statements)
+                return statement.if_true.statements
+            elif isinstance(statement.if_false, If):
+                return self.simplify(statement.if_false)
+            elif statement.if_false is not None:
+                self.prune(statement.if_false.statements)
+                return statement.if_false.statements
+            return []
+
+        elif isinstance(statement, While):
+            if self.constant(statement.condition) == 0:
+                self.count('constant condition')
+                return []
+            self.prune(statement.statements.statements)
+
+        elif isinstance(statement, Do):
+            self.prune(statement.statements.statements)
+            # A `do ... while (0)` runs its body once, unless the body
+            # leaves the loop early.
+            if self.constant(statement.condition) == 0 and not any(
+                (isinstance(node, Break) and node.target is statement)
+                or (isinstance(node, Continue) and node.loop is statement)
+                for node in statement.statements.walk()
+            ):
+                self.count('constant condition')
+                return statement.statements.statements
+
+        elif isinstance(statement, For):
+            self.prune(statement.statements.statements)
+
+        elif isinstance(statement, Switch):
+            for case in statement.cases:
+                self.prune(case.statements)
+
+        elif isinstance(statement, Block):
+            self.prune(statement.statements)
+
+        elif isinstance(statement, PURE_STATEMENTS) and not _has_side_effects(statement):
+            self.count('unused expression')
+            return []
+
+        return [statement]
+
+    def remove_unused(self, node):
+        """Remove the local variables of a function that are never read.
+
+        Returns True if anything was removed.
+        """
+        lists = [node.statements] + [
+            block.statements for block in node.walk() if isinstance(block, Block)
+        ]
+        targets = set()
+        for statements in lists:
+            for statement in statements:
+                target = _assigned(statement)
+                if target is not None:
+                    targets.add(id(target))
+
+        read = set(
+            ref.var.name
+            for ref in node.walk()
+            if isinstance(ref, VariableReference) and id(ref) not in targets
+            and isinstance(ref.var, (Variable, Parameter))
+        )
+        unused = set(
+            decl
+            for decl in node.walk()
+            if isinstance(decl, Variable) and decl.name not in read
+        )
+        if not unused:
+            return False
+
+        changed = False
+        for statements in lists:
+            kept = []
+            for statement in statements:
+                if statement in unused:
+                    self.count('unused variable')
+                    value = statement.value
+                elif _assigned(statement) is not None and _assigned(statement).var in unused:
+                    self.count('unused assignment')
+                    value = getattr(statement, 'rvalue', None)
+                else:
+                    kept.append(statement)
+                    continue
+
+                changed = True
+                if value not in (None, UNDEFINED) and _has_side_effects(value):
+                    kept.append(value)
+            statements[:] = kept
+        return changed
+
+
+###########################################################################
+# Tree shaking
+###########################################################################
+
+class TreeShaker(object):
+    """Remove the declarations that can't be reached from a set of entry
+    points.
+
+    `entries` are the full C++ names of the entry points (e.g.,
+    `ns::function` or `ns::Class`). Every declaration that an entry
+    point refers to, directly or indirectly, is kept, along with the
+    module-level statements that refer to a declaration that is kept;
+    everything else is removed, and modules that are left empty are
+    removed entirely. A class is kept (or removed) as a whole.
+
+    If `expand` is provided, it is called with each node that is
+    reached, before the nodes it contains are examined (e.g., to convert
+    a function body whose conversion was deferred).
+
+    `removed` records the full names of the declarations that were
+    removed.
+    """
+    def __init__(self, entries, expand=None):
+        self.entries = entries
+        self.expand = expand
+        self.removed = []
+
+    def report(self, out):
+        "Describe the declarations that were removed."
+        for name in self.removed:
+            print('Removed unreachable %s' % name, file=out)
+
+    def run(self, module):
+        entries = []
+        for name in self.entries:
+            # Names are looked up exactly, part by part, rather than
+            # with the normalization used to look up type names.
+            decl = module
+            for part in name.split('::'):
+                try:
+                    decl = decl.names[part]
+                except (AttributeError, KeyError):
+                    raise Exception("Unknown entry point '%s'" % name)
+            entries.append(decl)
+
+        reached = set()
+        pending = entries
+        while pending:
+            self.reach(pending, reached)
+            pending = [
+                statement
+                for statement in self.statements(module)
+                if statement not in reached and any(
+                    getattr(node, reference) in reached
+                    for node in statement.walk()
+                    for reference in node.references
+                )
+            ]
+        self.prune(module, reached)
+
+    def statements(self, module):
+        "Iterate over the module-level statements that aren't declarations."
+        for decl in module.declarations:
+            if not isinstance(decl, Declaration):
+                yield decl
+        for submodule in module.submodules.values():
+            for statement in self.statements(submodule):
+                yield statement
+
+    def reach(self, pending, reached):
+        "Add the nodes that are needed by the `pending` nodes to `reached`."
+        while pending:
+            node = pending.pop()
+            if node in reached:
+                continue
+            reached.add(node)
+
+            if isinstance(node, Declaration) and node.context is not None:
+                pending.append(node.context)
+            if isinstance(node, Module):
+                # A module is needed to hold a declaration; that doesn't
+                # make the rest of its content reachable.
+                continue
+
+            if self.expand is not None:
+                self.expand(node)
+            pending.extend(node.children())
+            for reference in node.references:
+                target = getattr(node, reference)
+                if isinstance(target, Expression):
+                    pending.append(target)
+            if isinstance(node, Parameter) and isinstance(node.python_type, Declaration):
+                # A class that is used to choose between overloads.
+                pending.append(node.python_type)
+
+    def prune(self, module, reached):
+        "Remove the unreached declarations from a module and its submodules."
+        for decl in module.declarations:
+            if decl not in reached and isinstance(decl, Declaration):
+                self.removed.append(decl.full_name)
+        module.declarations[:] = [decl for decl in module.declarations if decl in reached]
+        module.classes &= reached
+        if module.using:
+            for name, decl in list(module.using.names.items()):
+                if decl not in reached:
+                    del module.using.names[name]
+
+        # Recompute the imports needed by the declarations that are left.
+        module.imports = {}
+        for decl in module.declarations:
+            decl.add_imports(module)
+
+        for name, submodule in list(module.submodules.items()):
+            if submodule in reached:
+                self.prune(submodule, reached)
+            else:
+                self.removed.append(submodule.full_name)
+                del module.submodules[name]
+
+
+###########################################################################
+# Destructors
+###########################################################################
+
+def _releases_memory(statement):
+    # Is the statement only needed to manage memory? The parser drops
+    # `delete` expressions, so this only needs to recognize pointers
+    # being reset to null.
+    if not (isinstance(statement, BinaryOperation) and statement.name == '='
+            and isinstance(statement.lvalue, AttributeReference)
+            and isinstance(statement.lvalue.instance, SelfReference)
+            and statement.lvalue.typekind == TypeKind.POINTER):
+        return False
+    value = _strip(statement.rvalue)
+    while isinstance(value, Cast):
+        value = _strip(value.value)
+    return (isinstance(value, Literal) and value.value is None) or integer_value(value) == 0
+
+
+def _walk_modules(module):
+    # Iterate over every node of a module, and of its submodules.
+    for node in module.walk():
+        yield node
+    for submodule in module.submodules.values():
+        for node in _walk_modules(submodule):
+            yield node
+
+
+def _is_subclass(klass, base):
+    # Is `klass` the class `base`, or a subclass of it?
+    while klass is not None:
+        if klass is base:
+            return True
+        klass = klass.superclass
+    return False
+
+
+class DestructorLowering(Transformer):
+    """Choose how the destructor of each class is provided.
+
+    A destructor that only releases memory (by deleting objects, or
+    resetting pointers) is removed, as the garbage collector does that
+    work. Any other destructor is given the requested `style` (see
+    Destructor), where that is possible:
+
+    * A finalizer can't hold a reference to the instance (or the
+      instance would never be collected), so it is passed the values of
+      the attributes that the destructor reads. This is only possible
+      for a class whose constructors set those attributes (and don't
+      return early, which would skip registering the finalizer), and
+      whose destructor doesn't otherwise use the instance, if nothing
+      changes the attributes after the instance is constructed. (With
+      `slots`, a finalizer can still be registered, as the base class
+      keeps a `__weakref__` slot.)
+    * `close` isn't used for a class that already has a `close()`
+      method.
+
+    Otherwise, the destructor is provided as `__del__`.
+
+    `dropped` records the full names of the classes whose destructors
+    were removed; `kept` records the classes whose destructors couldn't
+    be given the requested style.
+    """
+    def __init__(self, style):
+        self.style = style
+        self.dropped = []
+        self.kept = []
+
+    def report(self, out):
+        "Describe the destructors that were removed, or left as __del__."
+        for name in self.dropped:
+            print('Removed destructor of %s' % name, file=out)
+        for name in self.kept:
+            print('Kept __del__ for the destructor of %s' % name, file=out)
+
+    def transform_class(self, node):
+        self.transform_children(node)
+        destructor = node.destructor
+        if destructor is None:
+            return node
+
+        if all(_releases_memory(statement) for statement in destructor.statements or []):
+            node.destructor = None
+            self.dropped.append(node.full_name)
+        elif self.style == 'finalize':
+            names = self.finalizer_state(node)
+            if names is None:
+                self.kept.append(node.full_name)
+                return node
+
+            destructor.style = 'finalize'
+            destructor.state = [Parameter(destructor, name, '', UNDEFINED) for name in names]
+            state = dict((param.name, param) for param in destructor.state)
+            _replace(destructor, lambda expr: (
+                VariableReference(state[expr.name], None)
+                if isinstance(expr, AttributeReference) and isinstance(expr.instance, SelfReference)
+                else None
+            ))
+
+            for constructor in node.constructors.values():
+                register = Invoke(PrimitiveTypeReference('weakref.finalize'))
+                register.add_argument(SelfReference())
+                register.add_argument(AttributeReference(TypeReference(node), '_finalize'))
+                for name in names:
+                    register.add_argument(AttributeReference(SelfReference(), name))
+                constructor.statements.append(register)
+            node.module.add_import('weakref')
+        elif self.style == 'close':
+            if 'close' in node.methods:
+                self.kept.append(node.full_name)
+            else:
+                destructor.style = 'close'
+        return node
+
+    transform_struct = transform_class
+
+    def finalizer_state(self, node):
+        """Return the names of the attributes that the destructor of
+        `node` reads, or None if it can't be run by a finalizer.
+        """
+        destructor = node.destructor
+        if not isinstance(node, Class) or not node.constructors:
+            return None
+
+        names = []
+        for expr in destructor.walk():
+            if isinstance(expr, AttributeReference) and isinstance(expr.instance, SelfReference):
+                if expr.name not in node.attributes:
+                    return None
+                if expr.name not in names:
+                    names.append(expr.name)
+            elif isinstance(expr, Variable) and expr.name in node.attributes:
+                # A local variable would clash with the attribute.
+                return None
+        # Every use of self must be to read an attribute.
+        selves = len([expr for expr in destructor.walk() if isinstance(expr, SelfReference)])
+        attributes = len([
+            expr for expr in destructor.walk()
+            if isinstance(expr, AttributeReference) and isinstance(expr.instance, SelfReference)
+        ])
+        if selves != attributes:
+            return None
+
+        # Every constructor must set the attributes, and reach the end
+        # (where the finalizer is registered)...
+        for constructor in node.constructors.values():
+            if any(isinstance(expr, Return) for expr in constructor.walk()):
+                return None
+            assigned = set(
+                expr.lvalue.name
+                for expr in constructor.walk()
+                if isinstance(expr, BinaryOperation) and expr.name == '='
+                and isinstance(expr.lvalue, AttributeReference)
+                and isinstance(expr.lvalue.instance, SelfReference)
+            )
+            for name in names:
+                if node.attributes[name].value is None and name not in assigned:
+                    return None
+
+        # ... and nothing else may change them. Changes made to self by
+        # a class that isn't this class (or a subclass) can be ignored.
+        ignored = set(
+            id(expr)
+            for constructor in list(node.constructors.values()) + [destructor]
+            for expr in constructor.walk()
+        )
+        unrelated = set()
+        for klass in _walk_modules(node.root):
+            if isinstance(klass, (Class, Struct, Union)) and not _is_subclass(klass, node):
+                members = list(getattr(klass, 'constructors', {}).values()) + list(klass.methods.values())
+                for member in members + [getattr(klass, 'destructor', None)]:
+                    if member is not None:
+                        unrelated.update(id(expr) for expr in member.walk())
+
+        for expr in _walk_modules(node.root):
+            if id(expr) in ignored:
+                continue
+            target = None
+            if isinstance(expr, BinaryOperation) and expr.name in ASSIGNMENT_OPERATORS:
+                target = expr.lvalue
+            elif isinstance(expr, UnaryOperation) and expr.name in ('++', '--', '&'):
+                target = expr.value
+            if (isinstance(target, AttributeReference) and target.name in names
+                    and not (isinstance(target.instance, SelfReference) and id(expr) in unrelated)):
+                return None
+        return names
+
+
+###########################################################################
+# Memoization
+###########################################################################
+
+# The default number of results cached for each memoized function.
+MEMOIZE_SIZE = 128
+
+# The Python types of the parameters that can be part of a cache key.
+HASHABLE_TYPES = ('bool', 'int', 'float', 'str')
+
+# The C types whose values are represented by immutable Python values
+# (bools, ints, floats or strs), so that a cached result can be shared.
+IMMUTABLE_TYPES = (TypeKind.BOOL,) + INTEGER_TYPES + FLOAT_TYPES + CHARACTER_TYPES
+
+
+class Memoizer(Transformer):
+    """Cache the results of functions that are declared to have no side
+    effects.
+
+    A module-level function can be memoized if it is declared constexpr
+    or with the `const` attribute; or with the `pure` attribute, if it
+    doesn't read any module-level variable that isn't const (as the
+    result of a pure function may depend on global state). Its
+    parameters must also all be numbers, bools or characters, so that
+    the arguments can be used as a cache key. (A `char *` isn't, as it
+    may be passed a bytearray or a memoryview.) Its result must be
+    immutable too, as every caller gets the same cached value.
+
+    The results are cached by `functools.lru_cache`, or in a dict that
+    is emptied when it holds `size` results (`policy` is 'lru_cache' or
+    'dict').
+
+    `memoized` records the full names of the functions whose results
+    are cached.
+    """
+    def __init__(self, policy, size):
+        self.policy = policy
+        self.size = size
+        self.memoized = []
+
+    def report(self, out):
+        "Describe the functions that were memoized."
+        for name in self.memoized:
+            print('Memoized %s' % name, file=out)
+
+    def transform_function(self, node):
+        if node.statements is None or node.purity is None:
+            return node
+        if node.result_typekind not in IMMUTABLE_TYPES:
+            return node
+        if any(param.python_type not in HASHABLE_TYPES or '*' in param.ctype
+               for param in node.parameters):
+            return node
+        if node.purity == 'pure' and any(
+                isinstance(ref, VariableReference) and isinstance(ref.var, Variable)
+                and ref.var.context.is_module and not ref.var.const
+                for ref in node.walk()):
+            return node
+
+        node.cache_policy = self.policy
+        node.cache_size = self.size
+        if self.policy == 'lru_cache':
+            node.module.add_import('functools')
+        self.memoized.append(node.full_name)
+        return node
+
+
+###########################################################################
+# Annotations
+###########################################################################
+
+class Annotator(Transformer):
+    """Make the type annotations agree with the code that is generated.
+
+    mypy rejects a second annotation of the same name in a function, so
+    a local variable is only annotated where it is first declared. If a
+    name is declared (in different C++ scopes) as both an int and a
+    float, it is annotated as a float; if it is declared with any other
+    mix of types, or with a type that can't be annotated, it isn't
+    annotated at all.
+
+    A parameter whose default is None is annotated as Optional.
+
+    A bool conversion is removed from a condition, as Python tests the
+    truth of any value.
+    """
+    def transform_function(self, node):
+        for param in node.parameters:
+            default = _strip(param.default)
+            if param.annotation and (default is None or (
+                    isinstance(default, Literal) and default.value in (None, 'None'))):
+                param.annotation.optional = True
+                node.module.add_import('typing', 'Optional')
+
+        # The declarations of each local variable.
+        declarations = OrderedDict()
+        for decl in node.walk():
+            if isinstance(decl, Variable):
+                declarations.setdefault(decl.name, []).append(decl)
+
+        parameters = set(param.name for param in node.parameters)
+        for name, decls in declarations.items():
+            types = set(
+                (decl.annotation.type, decl.annotation.optional) if decl.annotation else None
+                for decl in decls
+            )
+            if types == set([('int', False), ('float', False)]):
+                # An int can be stored in a float variable.
+                decls[0].annotation.type = 'float'
+                types = set([('float', False)])
+            for i, decl in enumerate(decls):
+                if i > 0 or name in parameters or len(types) > 1:
+                    decl.annotation = None
+
+        return self.transform_children(node)
+
+    transform_method = transform_function
+    transform_constructor = transform_function
+    transform_destructor = transform_function
+
+    def condition(self, expr):
+        "Return a condition without any conversions to bool."
+        while isinstance(expr, Cast) and expr.typekind == TypeKind.BOOL:
+            expr = expr.value
+        if isinstance(expr, Parentheses):
+            expr.body = self.condition(expr.body)
+        elif isinstance(expr, BinaryOperation) and expr.name in ('&&', '||'):
+            expr.lvalue = self.condition(expr.lvalue)
+            expr.rvalue = self.condition(expr.rvalue)
+        return expr
+
+    def transform_if(self, node):
+        self.transform_children(node)
+        node.condition = self.condition(node.condition)
+        return node
+
+    transform_while = transform_if
+    transform_do = transform_if
+    transform_conditionaloperation = transform_if
+
+    def transform_for(self, node):
+        self.transform_children(node)
+        if node.expr_stmt is not None:
+            node.expr_stmt = self.condition(node.expr_stmt)
+        return node
+
+    def transform_unaryoperation(self, node):
+        self.transform_children(node)
+        if node.name == '!':
+            node.value = self.condition(node.value)
+        return node
@@ -7,9 +7,11 @@
 from __future__ import unicode_literals, print_function
 
 import argparse
+import io
 import os
 import re
 import sys
+from collections import OrderedDict
 
 from clang.cindex import (
     CursorKind,
@@ -21,9 +23,21 @@ from clang.cindex import (
 )
 
 from .model import *
+from .optimize import (
+    INLINE_SIZE, MEMOIZE_SIZE,
+    Annotator, CharacterCodes, ColumnarLowering, ConstantFolder, CursorLowering,
+    DeadCodeEliminator, DestructorLowering, Inliner, LoopHoister, Memoizer, OverflowMasker,
+    TreeShaker, Vectorizer,
+)
+from .sourcemap import SourceMap, map_filename
 from .writer import CodeWriter
 
 
+# The default number of case labels at which a switch is dispatched
+# using a lookup table.
+SWITCH_TABLE_SIZE = 8
+
+
 # Python 2 compatibility shims
 if sys.version_info.major <= 2:
     text = unicode
@@ -53,23 +67,177 @@ class BaseParser(object):
 
 
 class CodeConverter(BaseParser):
-    def __init__(self, name, verbosity=0):
+    """Convert C++ source into a tree of Python modules.
+
+    Any extra keyword arguments are options that control the style of
+    the generated code:
+
+    * `slots`: if True, declare the instance attributes of each class,
+      struct and union using __slots__. Classes without a superclass
+      also have a `__weakref__` slot, which costs a pointer per instance,
+      so that instances can be referred to weakly.
+    * `fold_constants`: if True, replace integer expressions whose value
+      is known at conversion time with a literal.
+    * `inline_enums`: if True, use the integer value of an enumerated
+      value wherever it is used, rather than looking it up on the
+      enumeration.
+    * `switch_table_size`: the number of case labels at which a switch
+      over integer constants is dispatched using a lookup table, rather
+      than an if/elif chain (default: 8). Use 0 to disable lookup tables.
+    * `inline`: if True, replace calls to small functions and non-virtual
+      methods with the body of the function.
+    * `inline_size`: the largest function body (as a number of nodes in
+      the model) that will be inlined (default: 12).
+    * `wrap_unsigned`: if True (the default), mask the result of unsigned
+      integer arithmetic to the width of its type, wherever it could
+      otherwise be out of range. Unsigned division is output as floor
+      division (`//`).
+    * `hoist_lookups`: if True, read attributes of self, module-level
+      functions and globals that don't change inside a loop into local
+      variables before the loop starts.
+    * `columnar_structs`: if True, store a fixed-size array of a struct
+      that only contains numbers as one typed array per attribute.
+    * `byte_cursors`: if True (the default), represent a pointer that
+      moves through a byte buffer as the buffer and an integer index,
+      and pass on a pointer into a buffer as a memoryview.
+    * `numpy`: if True, replace loops that apply the same arithmetic to
+      each element of some arrays with the equivalent NumPy operations.
+      The generated code then requires NumPy.
+    * `char_codes`: if True, represent char values as their integer
+      codes; string literals become NUL-terminated bytes, except where
+      they are passed to a function that isn't being converted.
+    * `eliminate_dead_code`: if True, remove the statements of functions
+      that can never be executed (because they follow a return, or are
+      in a branch whose condition is a constant), and local variables
+      whose value is never read. With a verbosity of 1 or more, what was
+      removed is reported.
+    * `entries`: a list of the full C++ names (e.g., `ns::function` or
+      `ns::Class`) of the declarations that the generated code must
+      provide. If given, only these declarations, and the declarations
+      they depend on, are generated.
+    * `lazy_bodies`: if True, the body of each function and method is
+      only converted when code is generated, rather than when it is
+      parsed; combined with `entries`, the bodies of declarations that
+      aren't needed are never converted.
+    * `destructors`: how C++ destructors are converted. With `del` (the
+      default), each becomes a `__del__` method. Any other style drops
+      destructors that only release memory, and provides the rest as a
+      `__del__` method (`drop`), as a finalizer that is registered with
+      weakref.finalize (`finalize`), or as a `close()` method, which is
+      also called at the end of a `with` block (`close`).
+    * `memoize`: if given, cache the results of functions that are
+      declared constexpr, or with the `const` or `pure` attribute, using
+      `functools.lru_cache` (`lru_cache`) or a dict that is emptied when
+      it is full (`dict`).
+    * `memoize_size`: the number of results that each memoized function
+      caches (default: 128).
+    * `annotate`: if True, annotate parameters, return values, instance
+      attributes and variables with the Python types that represent their
+      C++ types (PEP 484), so the generated modules can be type checked,
+      and compiled with mypyc. The generated code then requires Python 3.6
+      or later.
+    """
+    def __init__(self, name, verbosity=0, **options):
         super(CodeConverter, self).__init__()
         # Tools for debugging.
         self.verbosity = verbosity
         self._depth = 0
 
+        self.options = options
+        self.optimized = False
+
         self.root_module = Module(name)
         self.filenames = set()
         self.macros = {}
         self.instantiated_macros = {}
 
+        # The function bodies whose conversion has been deferred, and
+        # the parser state needed to convert them.
+        self.deferred_bodies = OrderedDict()
+
+        # The lookup tables for switch statements that haven't been
+        # added to their module yet, as (module, variable) pairs.
+        self.switch_tables = []
+
         self.ignored_files = set()
         self.last_decl = []
 
         self.namespace = self.root_module
 
+    def optimize(self):
+        """Apply the optimization passes selected by the options.
+
+        The passes are applied once, after parsing is complete and before
+        any code is generated.
+        """
+        if self.optimized:
+            return
+        self.optimized = True
+
+        if self.options.get('entries'):
+            shaker = TreeShaker(self.options['entries'], expand=self.convert_body)
+            shaker.run(self.root_module)
+            if self.verbosity > 0:
+                shaker.report(sys.stderr)
+            # Any body that hasn't been converted yet isn't needed.
+            self.deferred_bodies.clear()
+
+        for decl in list(self.deferred_bodies):
+            self.convert_body(decl)
+        self.add_switch_tables()
+
+        if self.options.get('destructors', 'del') != 'del':
+            lowering = DestructorLowering(self.options['destructors'])
+            lowering.run(self.root_module)
+            if self.verbosity > 0:
+                lowering.report(sys.stderr)
+
+        if self.options.get('char_codes'):
+            CharacterCodes().run(self.root_module)
+
+        if self.options.get('byte_cursors', True):
+            CursorLowering().run(self.root_module)
+
+        if self.options.get('inline'):
+            inliner = Inliner(size=self.options.get('inline_size', INLINE_SIZE))
+            inliner.run(self.root_module)
+            if self.verbosity > 0:
+                inliner.report(sys.stderr)
+
+        if self.options.get('columnar_structs'):
+            ColumnarLowering().run(self.root_module)
+
+        if self.options.get('fold_constants'):
+            ConstantFolder().run(self.root_module)
+
+        if self.options.get('eliminate_dead_code'):
+            eliminator = DeadCodeEliminator()
+            eliminator.run(self.root_module)
+            if self.verbosity > 0:
+                eliminator.report(sys.stderr)
+
+        if self.options.get('wrap_unsigned', True):
+            OverflowMasker(self.options.get('char_codes')).run(self.root_module)
+
+        if self.options.get('numpy'):
+            Vectorizer().run(self.root_module)
+
+        if self.options.get('hoist_lookups'):
+            LoopHoister().run(self.root_module)
+
+        if self.options.get('memoize'):
+            memoizer = Memoizer(self.options['memoize'], self.options.get('memoize_size', MEMOIZE_SIZE))
+            memoizer.run(self.root_module)
+            if self.verbosity > 0:
+                memoizer.report(sys.stderr)
+
+        # The annotations must agree with the code that the other
+        # passes generate, so this comes last.
+        if self.options.get('annotate'):
+            Annotator().run(self.root_module)
+
     def output(self, module, out):
+        self.optimize()
         module_path = module.split('.')
 
         mod = None
@@ -83,19 +251,177 @@ class CodeConverter(BaseParser):
                 raise Exception("Unknown module '%s'" % '.'.join(module_path[:i+1]))
 
         if mod:
-            mod.output(CodeWriter(out))
+            mod.output(CodeWriter(out, options=self.options))
         else:
             raise Exception('No module name specified')
 
+    def convert_body(self, decl):
+        """Convert the body of a function, method or destructor, if its
+        conversion was deferred.
+
+        Returns True if there was a body to convert.
+        """
+        try:
+            node, namespace = self.deferred_bodies.pop(decl)
+        except KeyError:
+            return False
+
+        # Convert the body with the parser in the state it was in when
+        # the body was found.
+        state = self.namespace, self.last_decl
+        self.namespace = namespace
+        try:
+            self.handle(node, decl)
+        finally:
+            self.namespace, self.last_decl = state
+        self.add_switch_tables()
+        return True
+
+    def add_switch_tables(self):
+        """Add the lookup tables of the switch statements that have been
+        converted to their modules.
+
+        This is done once the top-level declaration that contains the
+        switch has been added to the module, because the table may refer
+        to it (for example, to the values of an enumeration that is
+        declared in a class).
+        """
+        for module, var in self.switch_tables:
+            module.add_variable(var)
+        self.switch_tables = []
+
     def _output_module(self, mod, out):
         out.write('===== %s.py ==================================================\n' % mod.full_name)
-        mod.output(CodeWriter(out))
+        mod.output(CodeWriter(out, options=self.options))
         for submodule in mod.submodules.values():
             self._output_module(submodule, out)
 
     def output_all(self, out):
+        self.optimize()
         self._output_module(self.root_module, out)
 
+    def write(self, directory, compiler=None, source_map=False, lazy=True,
+              shard_lines=None, shard_declarations=None, cache=None):
+        """Write every module as a file in a package rooted at `directory`.
+
+        A module with submodules is written as a package (a directory
+        with an __init__.py); any other module is written as a single
+        .py file. If a compiler is provided, each file is handed to it
+        as soon as it has been written. If `source_map` is True, a
+        sidecar map from generated lines to C++ source locations is
+        written next to each module.
+
+        The submodules of a package are loaded on first access, unless
+        `lazy` is False, in which case they are imported along with the
+        package.
+
+        If a module would be longer than `shard_lines` lines, or contain
+        more than `shard_declarations` declarations, it is split into
+        several shard modules, plus a facade that provides every name
+        defined in the shards.
+
+        If an emission cache is provided, the code for top-level classes,
+        structs and functions whose model hasn't changed since it was
+        cached is taken from the cache.
+
+        Returns a list of the filenames that were written.
+        """
+        self.optimize()
+        filenames = []
+        self._write_module(self.root_module, directory, filenames, {
+            'compiler': compiler,
+            'source_map': source_map,
+            'lazy': lazy,
+            'shard_lines': shard_lines,
+            'shard_declarations': shard_declarations,
+            'cache': cache,
+        })
+        return filenames
+
+    def _write_module(self, mod, directory, filenames, options):
+        path = mod.full_name.replace('::', '.')
+        if mod.submodules:
+            directory = os.path.join(directory, mod.name)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            filename = os.path.join(directory, '__init__.py')
+            shard_name = os.path.join(directory, '_shard%s.py')
+            shard_path = path + '._shard%s'
+        else:
+            filename = os.path.join(directory, '%s.py' % mod.name)
+            shard_name = os.path.join(directory, '_%s_shard%%s.py' % mod.name)
+            shard_path = path[:-len(mod.name)] + '_%s_shard%%s' % mod.name
+
+        groups = self._shard_groups(
+            mod,
+            options['shard_lines'],
+            options['shard_declarations']
+        )
+        if groups:
+            paths = [shard_path % i for i in range(len(groups))]
+            facade, shards, exports = mod.shard(groups, paths)
+            for i, shard in enumerate(shards):
+                self._write_file(shard, None, shard_name % i, filenames, options)
+            self._write_file(facade, mod, filename, filenames, options, exports)
+        else:
+            self._write_file(mod, mod, filename, filenames, options)
+
+        for submodule in mod.submodules.values():
+            self._write_module(submodule, directory, filenames, options)
+
+    def _write_file(self, mod, interface, filename, filenames, options, exports=None):
+        # Write the content of `mod`, followed by the interface
+        # (submodules and exported names) of the `interface` module.
+        with io.open(filename, 'w', encoding='utf-8') as out:
+            writer = CodeWriter(
+                out,
+                source_map=options['source_map'],
+                cache=options['cache'],
+                options=self.options
+            )
+            mod.output(writer)
+            if interface:
+                interface.output_interface(writer, lazy=options['lazy'], exports=exports)
+        filenames.append(filename)
+
+        if options['source_map']:
+            SourceMap(filename, writer.source_map).save(map_filename(filename))
+
+        if options['compiler']:
+            options['compiler'].compile(filename)
+
+    def _shard_groups(self, mod, max_lines, max_declarations):
+        # Work out how to divide the named declarations of a module into
+        # shards, preserving declaration order. Returns None if the module
+        # doesn't need to be split.
+        if not max_lines and not max_declarations:
+            return None
+
+        declarations = mod.named_declarations
+        sizes = []
+        for decl in declarations:
+            if max_lines:
+                buf = io.StringIO()
+                decl.output(CodeWriter(buf, options=self.options))
+                sizes.append(buf.getvalue().count('\n') + 2)
+            else:
+                sizes.append(0)
+
+        groups = [[]]
+        lines = 0
+        for decl, size in zip(declarations, sizes):
+            if groups[-1] and (
+                        (max_lines and lines + size > max_lines)
+                        or (max_declarations and len(groups[-1]) >= max_declarations)
+                    ):
+                groups.append([])
+                lines = 0
+            groups[-1].append(decl)
+            lines += size
+
+        if len(groups) > 1:
+            return groups
+
     def parse(self, filenames, flags):
         abs_filenames = [os.path.abspath(f) for f in filenames]
         self.filenames.update(abs_filenames)
@@ -108,6 +434,7 @@ class CodeConverter(BaseParser):
                     options=TranslationUnit.PARSE_DETAILED_PROCESSING_RECORD
                 )
                 self.handle(self.tu.cursor, self.root_module)
+        self.optimized = False
 
     def parse_text(self, content, flags):
         for f, c in content:
@@ -121,6 +448,7 @@ class CodeConverter(BaseParser):
                 options=TranslationUnit.PARSE_DETAILED_PROCESSING_RECORD
             )
             self.handle(self.tu.cursor, self.root_module)
+        self.optimized = False
 
     def localize_namespace(self, namespace):
         """Strip any namespace parts that are implied by the current namespace.
@@ -223,6 +551,17 @@ class CodeConverter(BaseParser):
             result = handler(node, context)
             self._depth -= 1
 
+            # Remember where in the C++ source the node came from.
+            # Nodes can be returned more than once (e.g., references
+            # to an existing declaration); keep the first location.
+            if (result is not None and node.location.file
+                    and getattr(result, 'location', None) is None):
+                result.location = (
+                    node.location.file.name,
+                    node.location.line,
+                    node.location.column,
+                )
+
             # Some definitions might be part of an inline typdef.
             # Keep a track of the last type defined, just in case
             # it needs to be referenced as part of a typedef.
@@ -314,17 +653,32 @@ class CodeConverter(BaseParser):
                 value = self.handle(child, context)
 
             # If the node is of type CONSTANTARRAY, then the field
-            # is an array; set the value to a tuple of that size.
+            # is an array; preallocate storage of that size.
             # Otherwise, ignore the value; You need to be at C++11
             # to be using that feature, anyway.
-            if node.type.kind == TypeKind.CONSTANTARRAY:
-                value = Literal(text(tuple(None for i in range(0, int(value.value)))))
+            if node.type.get_canonical().kind == TypeKind.CONSTANTARRAY:
+                value = self.array_storage(node.type.get_canonical(), context)
             else:
                 value = None
 
-            attr = Attribute(context, node.spelling, value=value, static=is_static)
+            attr = Attribute(
+                context, node.spelling, value=value, static=is_static,
+                typekind=node.type.get_canonical().kind,
+            )
         except StopIteration:
-            attr = Attribute(context, node.spelling, value=None, static=is_static)
+            attr = Attribute(
+                context, node.spelling, value=None, static=is_static,
+                typekind=node.type.get_canonical().kind,
+            )
+
+        if not is_static:
+            attr.annotation = self.annotation(node.type, context)
+            # The attributes of a struct default to None, unless they
+            # are numbers (which default to zero), so any other
+            # attribute can't be annotated.
+            if (attr.annotation and attr.value is None and attr.annotation.zero is None
+                    and isinstance(context, (Struct, Union))):
+                attr.annotation = None
 
         # A field decl will have param children if the field
         # is a function pointer. However, we don't care about
@@ -332,11 +686,126 @@ class CodeConverter(BaseParser):
 
         return attr
 
+    def array_storage(self, typ, context=None):
+        # Work out the most compact storage for a fixed-size array
+        # of the given (canonical) type.
+        size = typ.get_array_size()
+        element = typ.get_array_element_type().get_canonical()
+        if element.kind == TypeKind.CONSTANTARRAY:
+            return ArrayStorage('list', size, element=self.array_storage(element, context))
+        elif self.is_byte_array(element):
+            return ArrayStorage('bytearray', size)
+        elif element.kind in BYTE_TYPES:
+            # The elements are characters, represented as a str each.
+            return ArrayStorage('list', size, element=Literal("''"))
+        elif element.kind in ARRAY_TYPECODES:
+            return ArrayStorage(
+                'array', size,
+                typecode=ARRAY_TYPECODES[element.kind],
+                element=Literal('0.0' if element.kind in FLOAT_TYPES else '0')
+            )
+        elif element.kind == TypeKind.BOOL:
+            return ArrayStorage('list', size, element=Literal('False'))
+        elif element.kind == TypeKind.RECORD and context is not None:
+            # Remember the declaration of the elements, so the array can
+            # be stored in columns.
+            try:
+                record = context[element.spelling.replace('struct ', '')]
+            except KeyError:
+                record = None
+            return ArrayStorage('list', size, record=record)
+        else:
+            return ArrayStorage('list', size)
+
+    def is_byte_array(self, element):
+        """Is an array of the given (canonical) element type stored as
+        a bytearray?
+
+        An element of a bytearray is an int, so only arrays of unsigned
+        char (whose values are numbers) are, unless characters are
+        represented by their codes.
+        """
+        if self.options.get('char_codes'):
+            return element.kind in BYTE_TYPES
+        return element.kind == TypeKind.UCHAR
+
+    def pointee(self, typ):
+        # The canonical kind of the type that a pointer type points to;
+        # None if the type isn't a pointer.
+        typ = typ.get_canonical()
+        if typ.kind == TypeKind.POINTER:
+            return typ.get_pointee().get_canonical().kind
+
+    def annotation(self, typ, context):
+        """The annotation for a value of the given type, if the generated
+        code is annotated.
+
+        Returns None if the type isn't represented by a single Python
+        type. This includes all pointers: a pointer to an object may be
+        null, or point into a list, and a pointer to a char buffer may
+        be a str, bytes, a bytearray or a memoryview. For the same
+        reason, a char is only annotated if characters are represented
+        by their codes; otherwise it may be a str, or an element of a
+        bytearray (an int).
+        """
+        if not self.options.get('annotate'):
+            return None
+
+        typ = typ.get_canonical()
+        if typ.kind in (TypeKind.LVALUEREFERENCE, TypeKind.RVALUEREFERENCE):
+            typ = typ.get_pointee().get_canonical()
+
+        if typ.kind == TypeKind.VOID:
+            return Annotation('None')
+        elif typ.kind == TypeKind.BOOL:
+            return Annotation('bool')
+        elif typ.kind in (TypeKind.CHAR_S, TypeKind.CHAR_U):
+            if self.options.get('char_codes'):
+                return Annotation('int')
+        elif typ.kind in INTEGER_TYPES or typ.kind in (TypeKind.SCHAR, TypeKind.UCHAR):
+            return Annotation('int')
+        elif typ.kind in FLOAT_TYPES:
+            return Annotation('float')
+        elif typ.kind in (TypeKind.RECORD, TypeKind.ENUM):
+            decl = self.type_declaration(typ, context)
+            if decl is not None:
+                return Annotation(decl)
+        elif typ.kind == TypeKind.CONSTANTARRAY:
+            # The storage that array_storage() provides. An array of
+            # structs isn't annotated, as it may be stored in columns.
+            element = typ.get_array_element_type().get_canonical()
+            if self.is_byte_array(element):
+                return Annotation('bytearray')
+            elif element.kind in ARRAY_TYPECODES:
+                # Quoted, as array can't be subscripted before Python 3.12.
+                return Annotation("'array[%s]'" % ('float' if element.kind in FLOAT_TYPES else 'int'))
+            elif element.kind in (TypeKind.BOOL, TypeKind.CONSTANTARRAY) or element.kind in BYTE_TYPES:
+                return Annotation('list')
+
+    def type_declaration(self, typ, context):
+        # The class, struct, union or enumeration that declares a
+        # (canonical) type; None if it isn't known.
+        name = re.sub(r'^(struct|union|enum) ', '', typ.spelling)
+        try:
+            decl = context[name]
+        except KeyError:
+            return None
+        if isinstance(decl, (Class, Struct, Union, Enumeration)):
+            return decl
+
     def handle_enum_constant_decl(self, node, context):
         return EnumValue(context, node.spelling, node.enum_value)
 
     def handle_function_decl(self, node, context):
+        # A definition keeps the purity declared on its prototype.
+        prototype = context.names.get(node.spelling)
         function = Function(context, node.spelling)
+        function.returns = self.annotation(node.result_type, context)
+        function.result_typekind = node.result_type.get_canonical().kind
+        if isinstance(prototype, Function):
+            function.purity = prototype.purity
+        if self.is_constexpr(node):
+            function.purity = 'constexpr'
         try:
             # print("FUNCTION DECL")
             children = node.get_children()
@@ -371,6 +840,17 @@ class CodeConverter(BaseParser):
         if function.statements is not None:
             return function
 
+    def is_constexpr(self, node):
+        "Is the function or method declared constexpr?"
+        for token in node.get_tokens():
+            if token.spelling == node.spelling:
+                # The name has been reached; anything after it is
+                # part of the parameters or the body.
+                return False
+            elif token.spelling == 'constexpr':
+                return True
+        return False
+
     def handle_var_decl(self, node, context):
         try:
             # print("VAR DECL")
@@ -406,7 +886,12 @@ class CodeConverter(BaseParser):
                 try:
                     value = self.handle(next(children), context)
                 except StopIteration:
-                    pass
+                    # An array without an initializer; preallocate
+                    # storage for it.
+                    if (node.type.get_canonical().kind == TypeKind.CONSTANTARRAY
+                            and child.kind not in (CursorKind.INIT_LIST_EXPR,
+                                                   CursorKind.STRING_LITERAL)):
+                        value = self.array_storage(node.type.get_canonical(), context)
 
             # If the current context is a module, then we are either defining a
             # global variable, or setting a static constant. If the context is a
@@ -434,7 +919,22 @@ class CodeConverter(BaseParser):
                     )
                 else:
                     # print("VAR DECL with value %s, %s, %s, %s" % (context, namespace, node.spelling, value))
-                    return Variable(decl_context, namespace + node.spelling, value)
+                    # An array is only annotated if it has the storage
+                    # that array_storage() provides.
+                    if (node.type.get_canonical().kind != TypeKind.CONSTANTARRAY
+                            or isinstance(value, ArrayStorage)):
+                        annotation = self.annotation(node.type, context)
+                    else:
+                        annotation = None
+                    canonical = node.type.get_canonical()
+                    return Variable(
+                        decl_context, namespace + node.spelling, value,
+                        const=node.type.is_const_qualified(),
+                        typekind=canonical.kind,
+                        pointee=self.pointee(node.type),
+                        size=canonical.get_array_size() if canonical.kind == TypeKind.CONSTANTARRAY else None,
+                        annotation=annotation,
+                    )
 
         except StopIteration:
             # No initial value for the variable. If the context is a module,
@@ -449,7 +949,11 @@ class CodeConverter(BaseParser):
                 return Attribute(context, node.spelling, value=None, static=is_static)
             else:
                 # print("pre-decl no value %s, %s" % (context, node.spelling))
-                return Variable(context, node.spelling, value=UNDEFINED)
+                return Variable(
+                    context, node.spelling, value=UNDEFINED,
+                    pointee=self.pointee(node.type),
+                    annotation=self.annotation(node.type, context),
+                )
 
     def handle_parm_decl(self, node, function):
         try:
@@ -474,7 +978,12 @@ class CodeConverter(BaseParser):
         except StopIteration:
             value = UNDEFINED
 
-        param = Parameter(function, node.spelling, node.type.spelling, value)
+        param = Parameter(
+            function, node.spelling, node.type.spelling, value,
+            typekind=node.type.get_canonical().kind,
+            pointee=self.pointee(node.type),
+            annotation=self.annotation(node.type, function),
+        )
 
         try:
             value = self.handle(next(children), function)
@@ -528,7 +1037,15 @@ class CodeConverter(BaseParser):
         # prototype method (which will be the TYPE_REF in the first
         # child node), and adds the body definition.
         if isinstance(context, (Class, Struct, Union)):
-            method = Method(context, node.spelling, node.is_pure_virtual_method(), node.is_static_method())
+            method = Method(
+                context, node.spelling,
+                node.is_pure_virtual_method(),
+                node.is_static_method(),
+                virtual=node.is_virtual_method(),
+            )
+            if self.is_constexpr(node):
+                method.purity = 'constexpr'
+            method.returns = self.annotation(node.result_type, context)
             is_prototype = True
             # print("IS PROTOTYPE")
         else:
@@ -602,6 +1119,7 @@ class CodeConverter(BaseParser):
             decl = self.handle(child, submodule)
             if decl:
                 decl.add_to_context(submodule)
+            self.add_switch_tables()
 
         # Restore the previously active namespace and using list.
         self.namespace = module
@@ -818,7 +1336,8 @@ class CodeConverter(BaseParser):
         # (and should be only) child unaltered.
         try:
             children = node.get_children()
-            expr = self.handle(next(children), statement)
+            child = next(children)
+            expr = self.handle(child, statement)
         except StopIteration:
             return None
 
@@ -828,6 +1347,24 @@ class CodeConverter(BaseParser):
         except StopIteration:
             pass
 
+        if self.options.get('annotate') and expr is not None:
+            expr = self.implicit_cast(node.type, child.type, expr)
+
+        return expr
+
+    def implicit_cast(self, typ, source, expr):
+        # Make an implicit conversion explicit where the Python type of
+        # the value changes, so the value matches its annotation: a
+        # number becomes a bool, or a float becomes an int.
+        kind = typ.get_canonical().kind
+        source_kind = source.get_canonical().kind
+        numbers = INTEGER_TYPES + FLOAT_TYPES
+        if kind == TypeKind.BOOL and source_kind in numbers:
+            if integer_value(expr) in (0, 1):
+                return Literal('True' if integer_value(expr) else 'False')
+            return Cast(TypeKind.BOOL, expr)
+        elif kind in INTEGER_TYPES and source_kind in FLOAT_TYPES:
+            return Cast(kind, expr)
         return expr
 
     def handle_decl_ref_expr(self, node, context):
@@ -860,10 +1397,16 @@ class CodeConverter(BaseParser):
         try:
             children = node.get_children()
             first_child = next(children)
-            ref = AttributeReference(self.handle(first_child, context), node.spelling)
+            ref = AttributeReference(
+                self.handle(first_child, context), node.spelling,
+                typekind=node.type.get_canonical().kind,
+            )
         except StopIteration:
             # An implicit reference to `this`
-            ref = AttributeReference(SelfReference(), node.spelling)
+            ref = AttributeReference(
+                SelfReference(), node.spelling,
+                typekind=node.type.get_canonical().kind,
+            )
         try:
             next(children)
             raise Exception("Member reference expression has > 1 children.")
@@ -897,6 +1440,13 @@ class CodeConverter(BaseParser):
                         and first_child.node.type.kind == TypeKind.FUNCTIONPROTO)
                     or isinstance(first_child, AttributeReference)):
                 fn = Invoke(first_child)
+                if isinstance(first_child, AttributeReference):
+                    # Record the class that declares the method, so the
+                    # call can be resolved to the method's definition.
+                    try:
+                        fn.klass = context[node.referenced.semantic_parent.type.spelling]
+                    except (AttributeError, KeyError):
+                        pass
 
                 for child in children:
                     arg = self.handle(child, context)
@@ -949,7 +1499,7 @@ class CodeConverter(BaseParser):
             # No tokens
             value = literal_value
 
-        return Literal(value)
+        return Literal(value, typekind=node.type.get_canonical().kind)
 
     def handle_floating_literal(self, node, context):
         try:
@@ -995,13 +1545,25 @@ class CodeConverter(BaseParser):
 
             op = node.unary_operator
 
-            # Dereferencing operator is a pass through.
-            # All others must be processed as defined.
+            # Dereferencing operator is a pass through, except for
+            # a pointer into a byte buffer, which reads the first
+            # element of the buffer. All others must be processed
+            # as defined.
             if op == UnaryOperator.DEREF:
                 unaryop = self.handle(child, context)
+                if node.type.get_canonical().kind in BYTE_TYPES:
+                    unaryop = ArraySubscript(
+                        unaryop, Literal('0'),
+                        typekind=node.type.get_canonical().kind,
+                    )
             else:
                 value = self.handle(child, context)
-                unaryop = UnaryOperation(node.operator, value)
+                unaryop = UnaryOperation(
+                    node.operator, value,
+                    typekind=node.type.get_canonical().kind,
+                    # A postfix operator follows its operand.
+                    postfix=child.extent.start.offset == node.extent.start.offset,
+                )
 
         except StopIteration:
             raise Exception("Unary expression requires 1 child node.")
@@ -1020,7 +1582,10 @@ class CodeConverter(BaseParser):
 
             subject = self.handle(next(children), context)
             index = self.handle(next(children), context)
-            value = ArraySubscript(subject, index)
+            value = ArraySubscript(
+                subject, index,
+                typekind=node.type.get_canonical().kind,
+            )
         except StopIteration:
             raise Exception("Array subscript requires 2 child nodes.")
 
@@ -1043,7 +1608,10 @@ class CodeConverter(BaseParser):
             rnode = next(children)
             rvalue = self.handle(rnode, context)
 
-            binop = BinaryOperation(lvalue, op, rvalue)
+            binop = BinaryOperation(
+                lvalue, op, rvalue,
+                typekind=node.type.get_canonical().kind,
+            )
         except StopIteration:
             raise Exception("Binary operator requires 2 child nodes.")
 
@@ -1067,7 +1635,10 @@ class CodeConverter(BaseParser):
             rnode = next(children)
             rvalue = self.handle(rnode, context)
 
-            binop = BinaryOperation(lvalue, op, rvalue)
+            binop = BinaryOperation(
+                lvalue, op, rvalue,
+                typekind=node.type.get_canonical().kind,
+            )
         except StopIteration:
             raise Exception("Binary operator requires 2 child nodes.")
 
@@ -1232,28 +1803,7 @@ class CodeConverter(BaseParser):
         try:
             children = node.get_children()
 
-            if node.type.kind in (
-                        TypeKind.CHAR_U,
-                        TypeKind.UCHAR,
-                        TypeKind.CHAR16,
-                        TypeKind.CHAR32,
-                        TypeKind.CHAR_S,
-                        TypeKind.SCHAR,
-                        TypeKind.WCHAR,
-                        TypeKind.USHORT,
-                        TypeKind.UINT,
-                        TypeKind.ULONG,
-                        TypeKind.ULONGLONG,
-                        TypeKind.UINT128,
-                        TypeKind.SHORT,
-                        TypeKind.INT,
-                        TypeKind.LONG,
-                        TypeKind.LONGLONG,
-                        TypeKind.INT128,
-                        TypeKind.FLOAT,
-                        TypeKind.DOUBLE,
-                        TypeKind.LONGDOUBLE,
-                    ):
+            if node.type.kind in CHARACTER_TYPES + INTEGER_TYPES + FLOAT_TYPES:
                 cast = Cast(node.type.kind, self.handle(next(children), context))
             else:
                 cast = Invoke(self.handle(next(children), context))
@@ -1319,6 +1869,11 @@ class CodeConverter(BaseParser):
     def handle_compound_stmt(self, node, context):
         if context.statements is None:
             context.statements = []
+            if self.options.get('lazy_bodies') and isinstance(context, (Function, Method, Destructor)):
+                # Remember where the body is, and the state needed to
+                # convert it, so it can be converted when it is needed.
+                self.deferred_bodies[context] = (node, self.namespace)
+                return
         for child in node.get_children():
             statement = self.handle(child, context)
             if statement:
@@ -1363,7 +1918,121 @@ class CodeConverter(BaseParser):
 
         return if_statement
 
-    # def handle_switch_stmt(self, node, context):
+    def handle_switch_stmt(self, node, context):
+        children = node.get_children()
+        condition = self.handle(next(children), context)
+        switch = Switch(condition, context)
+
+        # The body of the switch is a compound statement. Each case
+        # (or default) statement contains the first statement after
+        # the label; the statements that follow it in the body are
+        # siblings of the case statement. Consecutive labels are nested.
+        case = None
+        for child in next(children).get_children():
+            if child.kind in (CursorKind.CASE_STMT, CursorKind.DEFAULT_STMT):
+                case = Case(switch)
+                switch.add_case(case)
+                while child.kind in (CursorKind.CASE_STMT, CursorKind.DEFAULT_STMT):
+                    label_children = list(child.get_children())
+                    if child.kind == CursorKind.CASE_STMT:
+                        case.add_label(self.handle(label_children[0], case))
+                    else:
+                        case.default = True
+                    child = label_children[-1]
+
+            if case is None:
+                # Statements before the first label can't be reached.
+                continue
+
+            statement = self.handle(child, case)
+            if statement:
+                case.add_statement(statement)
+
+        try:
+            next(children)
+            raise Exception("Unexpected content in switch statement")
+        except StopIteration:
+            pass
+
+        # A switch that must be wrapped in a loop (so that a case can
+        # break early) can't continue a loop that encloses it; it is
+        # output as an if/elif chain instead (see Switch).
+        if not (switch.breaks_early and switch.continues_outer):
+            self.build_switch_table(switch)
+
+        return switch
+
+    def build_switch_table(self, switch):
+        # A large switch over integer constants is dispatched using a
+        # dictionary at module level, rather than an if/elif chain.
+        threshold = self.options.get('switch_table_size', SWITCH_TABLE_SIZE)
+        labels = [
+            (label, case)
+            for case in switch.cases
+            for label in case.labels
+        ]
+        if not threshold or len(labels) < threshold:
+            return
+
+        folder = ConstantFolder()
+        values = [folder.evaluate(label) for label, case in labels]
+        if None in values:
+            return
+
+        # If every case just returns a constant, or assigns a constant to
+        # the same target, the table can hold the result of the case;
+        # otherwise it holds the index of the case.
+        def constant(expr):
+            # Can the expression be evaluated at module level?
+            if isinstance(expr, UnaryOperation) and expr.name == '-':
+                expr = expr.value
+            return isinstance(expr, (Literal, EnumValue))
+
+        bodies = switch.bodies()
+        results = []
+        for statements in bodies:
+            if len(statements) != 1:
+                break
+            statement = statements[0]
+            if isinstance(statement, Return) and constant(statement.value):
+                results.append(statement.value)
+            elif (isinstance(statement, BinaryOperation) and statement.name == '='
+                    and isinstance(statement.lvalue, VariableReference)
+                    and constant(statement.rvalue)
+                    and isinstance(bodies[0][0], BinaryOperation)
+                    and statement.lvalue.var is bodies[0][0].lvalue.var):
+                results.append(statement.rvalue)
+            else:
+                break
+
+        if len(results) == len(bodies) and len(set(type(statements[0]) for statements in bodies)) == 1:
+            switch.table_kind = 'value'
+        else:
+            switch.table_kind = 'index'
+
+        table = DictLiteral()
+        for (label, case), (value, ctype) in zip(labels, values):
+            # Enumerated values are looked up by member, because that
+            # is what the switch value will be.
+            key = label if isinstance(label, EnumValue) else Literal(text(value))
+            index = switch.cases.index(case)
+            if switch.table_kind == 'value':
+                table.add_item(key, results[index])
+            else:
+                table.add_item(key, Literal(text(index)))
+
+        module = switch.module
+        # Tables that are still waiting to be added count as taken.
+        taken = set(module.names)
+        taken.update(var.name for queued, var in self.switch_tables if queued is module)
+        n = 0
+        while '_switch_table%s' % n in taken:
+            n += 1
+        var = Variable(module, '_switch_table%s' % n, table)
+        self.switch_tables.append((module, var))
+        switch.table = VariableReference(var, None)
+
+    # Case and default statements are handled by handle_switch_stmt.
     # def handle_case_stmt(self, node, context):
     # def handle_default_stmt(self, node, context):
 
@@ -1409,20 +2078,28 @@ class CodeConverter(BaseParser):
         expr_stmt = None
         end_stmt = None
         
+        integral = False
+        
         # initial statement
         if child.kind == CursorKind.DECL_STMT:
             init_stmt = self.handle(child, context)
+            # Loops over an integer variable can be expressed as a range.
+            try:
+                integral = next(child.get_children()).type.get_canonical().kind in INTEGER_TYPES
+            except StopIteration:
+                pass
             child = next(children)
             
         if child.kind == CursorKind.BINARY_OPERATOR:
             expr_stmt = self.handle(child, context)
             child = next(children)
         
-        if child.kind == CursorKind.UNARY_OPERATOR:
+        if child.kind in (CursorKind.UNARY_OPERATOR, CursorKind.COMPOUND_ASSIGNMENT_OPERATOR):
             end_stmt = self.handle(child, context)
             child = next(children)
         
         for_statement = For(init_stmt, expr_stmt, end_stmt, context)
+        for_statement.integral = integral
         
         # content
         self.handle(child, for_statement.statements)
@@ -1446,19 +2123,19 @@ class CodeConverter(BaseParser):
     
     def handle_continue_stmt(self, node, context):
         # for loop cares if there's a continue
-        end_expr = None
         parent = context
         while parent and not (isinstance(parent, (For, While, Do))):
             parent = parent.context
-                              
-        if isinstance(parent, For):
-            end_expr = parent.end_expr
-            
-            
-        return Continue(end_expr)
+
+        return Continue(parent)
     
     def handle_break_stmt(self, node, context):
-        return Break()
+        # A break leaves the innermost loop or switch.
+        parent = context
+        while parent and not (isinstance(parent, (For, While, Do, Switch))):
+            parent = parent.context
+
+        return Break(parent)
 
     def handle_return_stmt(self, node, context):
         retval = Return()
@@ -1501,6 +2178,7 @@ class CodeConverter(BaseParser):
             decl = self.handle(child, tu)
             if decl:
                 decl.add_to_context(tu)
+            self.add_switch_tables()
 
     # def handle_unexposed_attr(self, node, context):
     # def handle_ib_action_attr(self, node, context):
@@ -1517,8 +2195,16 @@ class CodeConverter(BaseParser):
     # def handle_annotate_attr(self, node, context):
     # def handle_asm_label_attr(self, node, context):
     # def handle_packed_attr(self, node, context):
-    # def handle_pure_attr(self, node, context):
-    # def handle_const_attr(self, node, context):
+
+    def handle_pure_attr(self, node, context):
+        # The result of the function only depends on its arguments and
+        # global state.
+        context.purity = 'pure'
+
+    def handle_const_attr(self, node, context):
+        # The result of the function only depends on its arguments.
+        context.purity = 'const'
+
     # def handle_noduplicate_attr(self, node, context):
     # def handle_cudaconstant_attr(self, node, context):
     # def handle_cudadevice_attr(self, node, context):
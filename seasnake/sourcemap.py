@@ -0,0 +1,124 @@
+###########################################################################
+# Source maps
+#
+# A source map records, for each line of a generated Python module, the
+# location in the C++ source of the node that produced that line. Maps
+# are written as a JSON sidecar next to the generated module; they can
+# be used to rewrite profiler output (or tracebacks) so that hot lines
+# point back at the original C++ code.
+###########################################################################
+from __future__ import unicode_literals, print_function
+
+import argparse
+import io
+import json
+import os
+import re
+import sys
+
+
+# Matches the ways profilers and tracebacks refer to a line of a
+# Python file:
+#   foo.py:42(function)         (cProfile/pstats)
+#   function (foo.py:42)        (py-spy, most sampling profilers)
+#   File "foo.py", line 42      (tracebacks)
+PYTHON_LINE = re.compile(r'(?P<filename>[^\s"\'()]+\.py)(?P<sep>:|", line )(?P<line>\d+)')
+
+
+class SourceMap(object):
+    def __init__(self, filename, lines):
+        self.filename = filename
+        self.lines = lines
+
+    @classmethod
+    def load(cls, map_filename):
+        with io.open(map_filename, encoding='utf-8') as data:
+            content = json.load(data)
+        return cls(
+            content['file'],
+            dict(
+                (int(line), tuple(location))
+                for line, location in content['lines'].items()
+            )
+        )
+
+    def save(self, map_filename):
+        with io.open(map_filename, 'w', encoding='utf-8') as out:
+            out.write(json.dumps({
+                'file': self.filename,
+                'lines': dict(
+                    (str(line), list(location))
+                    for line, location in sorted(self.lines.items())
+                )
+            }, indent=1, sort_keys=True))
+
+    def lookup(self, line):
+        "Return the (filename, line, column) that produced the given line."
+        return self.lines.get(line)
+
+
+def map_filename(filename):
+    "Return the name of the source map sidecar for a generated module."
+    return filename + '.map'
+
+
+def rewrite(text, source_maps):
+    """Rewrite references to generated Python lines onto C++ locations.
+
+    `source_maps` is an iterable of SourceMap objects. Any reference to
+    a line in one of the mapped files is replaced with the C++
+    filename, line and column; references to unmapped files or lines
+    are left untouched.
+    """
+    by_filename = {}
+    for source_map in source_maps:
+        by_filename[os.path.abspath(source_map.filename)] = source_map
+        by_filename.setdefault(os.path.basename(source_map.filename), source_map)
+
+    def replace(match):
+        filename = match.group('filename')
+        source_map = by_filename.get(os.path.abspath(filename), by_filename.get(filename))
+        if source_map:
+            location = source_map.lookup(int(match.group('line')))
+            if location:
+                if match.group('sep') == ':':
+                    return '%s:%s:%s' % location
+                return '%s", line %s, column %s' % location
+        return match.group(0)
+
+    return PYTHON_LINE.sub(replace, text)
+
+
+def main():
+    opts = argparse.ArgumentParser(
+        description='Rewrite profiler output to refer to the original C++ sources.',
+    )
+
+    opts.add_argument(
+        'maps',
+        metavar='module.py.map',
+        help='The source map(s) produced when converting the code.',
+        nargs='+'
+    )
+
+    opts.add_argument(
+        '-i', '--input',
+        metavar='profile.txt',
+        help='The profiler output to rewrite (default: stdin)',
+    )
+
+    args = opts.parse_args()
+
+    source_maps = [SourceMap.load(filename) for filename in args.maps]
+
+    if args.input:
+        with io.open(args.input, encoding='utf-8') as data:
+            content = data.read()
+    else:
+        content = sys.stdin.read()
+
+    sys.stdout.write(rewrite(content, source_maps))
+
+
+if __name__ == '__main__':
+    main()
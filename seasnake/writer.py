@@ -9,45 +9,111 @@ from __future__ import unicode_literals, print_function
 
 
 class CodeWriter(object):
-    def __init__(self, out, preamble=None):
+    def __init__(self, out, preamble=None, source_map=False, cache=None, options=None):
         self.out = out
         self.line_cleared = True
         self.blank_lines = 2
         self.depth = 0
         self.empty = True
 
+        # If a source map has been requested, keep track of the line
+        # being written, and the source location of the most recently
+        # marked node at each block depth.
+        self.line = 1
+        self.locations = {}
+        self.source_map = {} if source_map else None
+
+        # An optional cache of the code generated for declarations.
+        self.cache = cache
+
+        # Options that control the style of the generated code.
+        self.options = options if options else {}
+
+        # Comments to be added to the end of the current line.
+        self.comments = []
+
         if preamble:
-            self.out.write(preamble)
+            self._emit(preamble)
+
+    def _emit(self, content):
+        self.out.write(content)
+        if self.source_map is not None:
+            self.line += content.count('\n')
+
+    def mark(self, node):
+        """Record that subsequent output is produced by `node`.
+
+        The location is used for every line written at the current
+        depth (or deeper) until another node is marked at the same or
+        a shallower depth.
+        """
+        if self.source_map is not None:
+            location = getattr(node, 'location', None)
+            if location:
+                for depth in [d for d in self.locations if d > self.depth]:
+                    del self.locations[depth]
+                self.locations[self.depth] = location
 
     def write(self, content):
         if not self.empty:
             for i in range(0, self.blank_lines):
-                self.out.write('\n')
+                self._emit('\n')
         self.blank_lines = 0
         if content:
             if self.line_cleared:
-                self.out.write('    ' * self.depth)
-            self.out.write(content)
+                self._emit('    ' * self.depth)
+            if self.source_map is not None and self.line not in self.source_map:
+                depths = [d for d in self.locations if d <= self.depth]
+                if depths:
+                    self.source_map[self.line] = self.locations[max(depths)]
+            self._emit(content)
             self.empty = False
             self.line_cleared = False
 
+    def comment(self, content):
+        "Add a comment to the end of the line currently being written."
+        if content not in self.comments:
+            self.comments.append(content)
+
+    def _end_line(self):
+        if self.comments:
+            self._emit('  # %s' % '; '.join(self.comments))
+            self.comments = []
+        self._emit('\n')
+        self.line_cleared = True
+
+    def write_block(self, content, source_map=None):
+        """Write a block of code that has already been generated.
+
+        `content` is the output of a separate CodeWriter, starting at a
+        depth of 0; `source_map` is the source map for that content.
+        """
+        # Output any pending blank lines.
+        self.write('')
+        for i, line in enumerate(content.splitlines(), start=1):
+            if self.source_map is not None and source_map and i in source_map:
+                self.source_map[self.line] = source_map[i]
+            if line:
+                self._emit('    ' * self.depth + line)
+            self._emit('\n')
+            self.empty = False
+        self.line_cleared = True
+        self.blank_lines = 0
+
     def clear_line(self):
         if not self.line_cleared:
-            self.out.write('\n')
-            self.line_cleared = True
+            self._end_line()
             self.blank_lines = 0
 
     def clear_minor_block(self):
         if not self.line_cleared:
-            self.out.write('\n')
-            self.line_cleared = True
+            self._end_line()
         while self.blank_lines < 1:
             self.blank_lines += 1
 
     def clear_major_block(self):
         if not self.line_cleared:
-            self.out.write('\n')
-            self.line_cleared = True
+            self._end_line()
         while self.blank_lines < max(1, 2 - self.depth):
             self.blank_lines += 1
 
@@ -0,0 +1,206 @@
+from __future__ import unicode_literals
+
+from tests.utils import ConverterTestCase
+
+
+class AnnotationsTestCase(ConverterTestCase):
+    def test_functions(self):
+        self.assertGeneratedOutput(
+            """
+            int clamp(int value, int limit) {
+                int result = value;
+                if (result > limit) {
+                    result = limit;
+                }
+                return result;
+            }
+
+            double scale(double x, float factor) {
+                return x * factor;
+            }
+
+            void reset(bool flag, const char *name) {
+            }
+            """,
+            """
+            def clamp(value: int, limit: int) -> int:
+                result: int = value
+                if result > limit:
+                    result = limit
+                return result
+
+
+            def scale(x: float, factor: float) -> float:
+                return x * factor
+
+
+            def reset(flag: bool, name) -> None:
+                pass
+            """,
+            annotate=True
+        )
+
+    def test_class(self):
+        self.assertGeneratedOutput(
+            """
+            class Node {
+              public:
+                int value;
+                double weight;
+                Node *next;
+
+                Node(int value) {
+                    this->value = value;
+                    this->weight = 1.0;
+                    this->next = nullptr;
+                }
+
+                bool heavier(const Node &other) {
+                    return this->weight > other.weight;
+                }
+            };
+            """,
+            """
+            class Node:
+                value: int
+                weight: float
+
+                def __init__(self, value: int):
+                    self.value = value
+                    self.weight = 1.0
+                    self.next = None
+
+                def heavier(self, other: 'Node') -> bool:
+                    return self.weight > other.weight
+            """,
+            annotate=True
+        )
+
+    def test_struct(self):
+        self.assertGeneratedOutput(
+            """
+            struct Point {
+                double x;
+                double y;
+                bool visible;
+                char label;
+            };
+            """,
+            """
+            class Point:
+                x: float
+                y: float
+                visible: bool
+
+                def __init__(self, x: float = 0.0, y: float = 0.0, visible: bool = False, label=None):
+                    self.x = x
+                    self.y = y
+                    self.visible = visible
+                    self.label = label
+            """,
+            annotate=True
+        )
+
+    def test_conversions(self):
+        self.assertGeneratedOutput(
+            """
+            bool is_odd(int n) {
+                if (n % 2) {
+                    return 1;
+                }
+                return false;
+            }
+
+            int truncate(double x) {
+                int whole = x;
+                return whole;
+            }
+            """,
+            """
+            def is_odd(n: int) -> bool:
+                if n % 2:
+                    return True
+                return False
+
+
+            def truncate(x: float) -> int:
+                whole: int = int(x)
+                return whole
+            """,
+            annotate=True
+        )
+
+    def test_redeclared(self):
+        self.assertGeneratedOutput(
+            """
+            int pick(int n) {
+                if (n > 0) {
+                    int value = n * 2;
+                    return value;
+                }
+                int value = 1;
+                return value;
+            }
+
+            double mix(int n) {
+                if (n > 0) {
+                    int step = n;
+                    return step;
+                }
+                double step = 0.5;
+                return step;
+            }
+            """,
+            """
+            def pick(n: int) -> int:
+                if n > 0:
+                    value: int = n * 2
+                    return value
+                value = 1
+                return value
+
+
+            def mix(n: int) -> float:
+                if n > 0:
+                    step: float = n
+                    return step
+                step = 0.5
+                return step
+            """,
+            annotate=True
+        )
+
+    def test_char_buffer(self):
+        self.assertGeneratedOutput(
+            """
+            char pick(int i) {
+                char buf[8];
+                char c = buf[i];
+                return c;
+            }
+            """,
+            """
+            def pick(i: int):
+                buf: list = [''] * 8
+                c = buf[i]
+                return c
+            """,
+            annotate=True
+        )
+
+    def test_char_codes(self):
+        self.assertGeneratedOutput(
+            """
+            char first(const char *text) {
+                char c = text[0];
+                return c;
+            }
+            """,
+            """
+            def first(text) -> int:
+                c: int = text[0]
+                return c
+            """,
+            annotate=True,
+            char_codes=True
+        )
@@ -39,3 +39,133 @@ class ArraysTestCase(ConverterTestCase):
                 answer = foo[index]
             """
         )
+
+    def test_field_storage(self):
+        self.assertGeneratedOutput(
+            """
+            struct Foo {
+                int counts[4];
+                double weights[3];
+                unsigned char data[16];
+                bool flags[2];
+                Foo *children[2];
+                short grid[2][3];
+            };
+            """,
+            """
+            from array import array
+
+
+            class Foo:
+                def __init__(self, counts=None, weights=None, data=None, flags=None, children=None, grid=None):
+                    self.counts = counts if counts else array('i', [0]) * 4
+                    self.weights = weights if weights else array('d', [0.0]) * 3
+                    self.data = data if data else bytearray(16)
+                    self.flags = flags if flags else [False] * 2
+                    self.children = children if children else [None] * 2
+                    self.grid = grid if grid else [array('h', [0]) * 3 for _ in range(2)]
+            """
+        )
+
+    def test_char_storage(self):
+        self.assertGeneratedOutput(
+            """
+            void test() {
+                char text[4];
+                unsigned char data[4];
+                text[0] = 'a';
+            }
+            """,
+            """
+            def test():
+                text = [''] * 4
+                data = bytearray(4)
+                text[0] = 'a'
+            """
+        )
+
+    def test_char_codes_storage(self):
+        self.assertGeneratedOutput(
+            """
+            void test() {
+                char text[4];
+                text[0] = 'a';
+            }
+            """,
+            """
+            def test():
+                text = bytearray(4)
+                text[0] = 97
+            """,
+            char_codes=True
+        )
+
+    def test_columnar_structs(self):
+        self.assertGeneratedOutput(
+            """
+            struct Point {
+                float x;
+                float y;
+            };
+
+            struct Cloud {
+                Point points[8];
+            };
+
+            void consume(Point *points) {
+            }
+
+            float test(Cloud *cloud) {
+                Point local[4];
+                Point other[2];
+                float total = 0;
+                for (int i = 0; i < 4; i++) {
+                    local[i].x = cloud->points[i].x * 2;
+                    total += local[i].x + cloud->points[i].y;
+                }
+                consume(other);
+                return total;
+            }
+            """,
+            """
+            from array import array
+
+
+            class Point:
+                def __init__(self, x=None, y=None):
+                    self.x = x
+                    self.y = y
+
+
+            class PointColumns:
+                __slots__ = ('x', 'y')
+
+                def __init__(self, size):
+                    self.x = array('f', [0.0]) * size
+                    self.y = array('f', [0.0]) * size
+
+                def __len__(self):
+                    return len(self.x)
+
+
+            class Cloud:
+                def __init__(self, points=None):
+                    self.points = points if points else PointColumns(8)
+
+
+            def consume(points):
+                pass
+
+
+            def test(cloud):
+                local = PointColumns(4)
+                other = [None] * 2
+                total = 0
+                for i in range(4):
+                    local.x[i] = cloud.points.x[i] * 2
+                    total += local.x[i] + cloud.points.y[i]
+                consume(other)
+                return total
+            """,
+            columnar_structs=True
+        )
@@ -0,0 +1,70 @@
+from __future__ import unicode_literals
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from seasnake.bytecode import BytecodeCompiler
+
+
+class BytecodeCompilerTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content):
+        filename = os.path.join(self.directory, name)
+        with io.open(filename, 'w', encoding='utf-8') as out:
+            out.write(content)
+        return filename
+
+    @unittest.skipIf(sys.version_info < (3, 5), 'Optimization levels require Python 3.5')
+    def test_compile(self):
+        "Modules are compiled at each requested optimization level"
+        filename = self.write('good.py', 'def test():\n    return 42\n')
+
+        compiler = BytecodeCompiler([0, 2], workers=2)
+        compiler.compile(filename)
+        self.assertEqual(compiler.join(), [])
+
+        import importlib.util
+        self.assertTrue(os.path.exists(
+            importlib.util.cache_from_source(filename, optimization='')
+        ))
+        self.assertTrue(os.path.exists(
+            importlib.util.cache_from_source(filename, optimization=2)
+        ))
+
+    def test_failure(self):
+        "Modules that fail to compile are reported"
+        good = self.write('good.py', 'x = 1\n')
+        bad = self.write('bad.py', 'def test(:\n    pass\n')
+
+        compiler = BytecodeCompiler(workers=2)
+        compiler.compile(good)
+        compiler.compile(bad)
+        failures = compiler.join()
+
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(failures[0][0], bad)
+        self.assertEqual(failures[0][1], -1)
+
+    def test_no_optimize(self):
+        "Without optimization levels, modules are compiled once"
+        import seasnake.bytecode
+        filename = self.write('good.py', 'x = 1\n')
+
+        has_optimize = seasnake.bytecode.HAS_OPTIMIZE
+        seasnake.bytecode.HAS_OPTIMIZE = False
+        try:
+            compiler = BytecodeCompiler([0, 2], workers=1)
+            self.assertEqual(compiler.optimize, [-1])
+            compiler.compile(filename)
+            self.assertEqual(compiler.join(), [])
+        finally:
+            seasnake.bytecode.HAS_OPTIMIZE = has_optimize
@@ -0,0 +1,98 @@
+from __future__ import unicode_literals
+
+from io import StringIO
+import shutil
+import tempfile
+
+from tests.utils import ConverterTestCase, adjust, capture_output
+from seasnake.cache import EmissionCache, fingerprint
+from seasnake.parser import CodeConverter
+from seasnake.writer import CodeWriter
+
+
+class EmissionCacheTestCase(ConverterTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def convert(self, cpp):
+        converter = CodeConverter('test')
+        with capture_output(redirect_stdout=False) as console:
+            converter.parse_text([('test.cpp', adjust(cpp))], flags=['-std=c++0x'])
+        self.assertEqual('', console.getvalue())
+        return converter.root_module
+
+    def output(self, module, cache=None):
+        buf = StringIO()
+        module.output(CodeWriter(buf, cache=cache))
+        return buf.getvalue()
+
+    def test_cached_output(self):
+        cpp = """
+            class Foo {
+                int x;
+              public:
+                int get() { return x; }
+            };
+
+            int test(int a) {
+                return a + 1;
+            }
+            """
+        expected = self.output(self.convert(cpp))
+
+        cache = EmissionCache(self.directory)
+        self.assertEqual(expected, self.output(self.convert(cpp), cache=cache))
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+        cache = EmissionCache(self.directory)
+        self.assertEqual(expected, self.output(self.convert(cpp), cache=cache))
+        self.assertEqual((cache.hits, cache.misses), (2, 0))
+
+    def test_changed_declaration(self):
+        original = self.convert("""
+            int test(int a) {
+                return a + 1;
+            }
+
+            int other() {
+                return 1;
+            }
+            """)
+        changed = self.convert("""
+            int test(int a) {
+                return a + 2;
+            }
+
+            int other() {
+                return 1;
+            }
+            """)
+
+        self.assertNotEqual(
+            fingerprint(original.names['test']),
+            fingerprint(changed.names['test'])
+        )
+        self.assertEqual(
+            fingerprint(original.names['other']),
+            fingerprint(changed.names['other'])
+        )
+
+        cache = EmissionCache(self.directory)
+        self.output(original, cache=cache)
+        self.assertEqual(
+            self.output(changed, cache=cache),
+            adjust(
+                """
+                def test(a):
+                    return a + 2
+
+
+                def other():
+                    return 1
+                """
+            )
+        )
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
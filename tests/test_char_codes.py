@@ -0,0 +1,84 @@
+from __future__ import unicode_literals
+
+from tests.utils import ConverterTestCase
+
+
+class CharCodesTestCase(ConverterTestCase):
+    def test_char_literals(self):
+        self.assertGeneratedOutput(
+            """
+            int count_lines(const char *text, int size) {
+                int lines = 0;
+                for (int i = 0; i < size; i++) {
+                    if (text[i] == '\\n') {
+                        lines++;
+                    }
+                }
+                return lines;
+            }
+
+            char upper(char c) {
+                if (c >= 'a' && c <= 'z') {
+                    return (char) (c - 'a' + 'A');
+                }
+                return c;
+            }
+            """,
+            """
+            def count_lines(text, size):
+                lines = 0
+                for i in range(size):
+                    if text[i] == 10:
+                        lines += 1
+                return lines
+
+
+            def upper(c):
+                if c >= 97 and c <= 122:
+                    return (c - 97 + 65)
+                return c
+            """,
+            char_codes=True
+        )
+
+    def test_strings(self):
+        self.assertGeneratedOutput(
+            """
+            int puts(const char *s);
+
+            int test() {
+                char name[8] = "abc";
+                const char *sep = ", ";
+                puts("done");
+                return name[0] + sep[1];
+            }
+            """,
+            """
+            def test():
+                name = bytearray(b'abc\\x00\\x00\\x00\\x00\\x00')
+                sep = b', \\x00'
+                puts("done")
+                return name[0] + sep[1]
+            """,
+            char_codes=True
+        )
+
+    def test_array_sizes(self):
+        self.assertGeneratedOutput(
+            """
+            int test() {
+                char padded[6] = "ab";
+                char exact[3] = "xyz";
+                char sized[] = "hi";
+                return padded[5] + exact[2] + sized[2];
+            }
+            """,
+            """
+            def test():
+                padded = bytearray(b'ab\\x00\\x00\\x00\\x00')
+                exact = bytearray(b'xyz')
+                sized = bytearray(b'hi\\x00')
+                return padded[5] + exact[2] + sized[2]
+            """,
+            char_codes=True
+        )
@@ -167,13 +167,25 @@ class ClassTestCase(ConverterTestCase):
             """,
             """
             class Foo:
-                def __init__(self):
+                def __init__(self, *args):
+                    arity = len(args)
+                    if arity == 0:
+                        self._init_0(*args)
+                    elif arity == 1:
+                        if isinstance(args[0], Foo):
+                            self._init_1(*args)
+                        else:
+                            self._init_2(*args)
+                    else:
+                        raise TypeError('No constructor for Foo takes %s arguments' % arity)
+
+                def _init_0(self):
                     self.m_x = 42
 
-                def __init__(self, foo):
+                def _init_1(self, foo):
                     self.m_x = foo.m_x
 
-                def __init__(self, x):
+                def _init_2(self, x):
                     self.m_x = x
 
 
@@ -432,13 +444,25 @@ class ClassTestCase(ConverterTestCase):
             """,
             """
             class Foo:
-                def __init__(self):
+                def __init__(self, *args):
+                    arity = len(args)
+                    if arity == 0:
+                        self._init_0(*args)
+                    elif arity == 1:
+                        if isinstance(args[0], Foo):
+                            self._init_1(*args)
+                        else:
+                            self._init_2(*args)
+                    else:
+                        raise TypeError('No constructor for Foo takes %s arguments' % arity)
+
+                def _init_0(self):
                     self.m_x = 42
 
-                def __init__(self, foo):
+                def _init_1(self, foo):
                     self.m_x = foo.m_x
 
-                def __init__(self, x):
+                def _init_2(self, x):
                     self.m_x = x
 
 
@@ -0,0 +1,111 @@
+from __future__ import unicode_literals
+
+from tests.utils import ConverterTestCase
+
+
+class ConstantFoldingTestCase(ConverterTestCase):
+    def test_literal_arithmetic(self):
+        self.assertGeneratedOutput(
+            """
+            void test() {
+                int a = (1 << 4) | 0x10;
+                int b = (2 + 3) * 4;
+                int c = -7 / 2;
+                int d = -7 % 2;
+                bool e = 3 > 2 && 1 == 1;
+            }
+            """,
+            """
+            def test():
+                a = 16
+                b = 20
+                c = -3
+                d = -1
+                e = True
+            """,
+            fold_constants=True
+        )
+
+    def test_c_semantics(self):
+        self.assertGeneratedOutput(
+            """
+            void test() {
+                unsigned int a = 0u - 1u;
+                bool b = -1 < 10u;
+                unsigned char c = (unsigned char) 300;
+                int d = 2147483647 + 1;
+                int e = 1 / 0;
+            }
+            """,
+            """
+            def test():
+                a = 4294967295
+                b = False
+                c = str(300)
+                d = 2147483647 + 1
+                e = 1 / 0
+            """,
+            fold_constants=True
+        )
+
+    def test_enum_values(self):
+        self.assertGeneratedOutput(
+            """
+            enum Flags {
+                READ = 1,
+                WRITE = 2
+            };
+
+            void test() {
+                int mode = READ | WRITE;
+            }
+            """,
+            """
+            from enum import Enum
+
+
+            class Flags(Enum):
+                READ = 1
+                WRITE = 2
+
+
+            def test():
+                mode = 3
+            """,
+            fold_constants=True
+        )
+
+    def test_const_variables(self):
+        self.assertGeneratedOutput(
+            """
+            void test(int x) {
+                const int size = 4;
+                int y = 8;
+                int a = size * 2;
+                int b = x + size;
+                int c = y + 1;
+            }
+            """,
+            """
+            def test(x):
+                size = 4
+                y = 8
+                a = 8
+                b = x + 4
+                c = y + 1
+            """,
+            fold_constants=True
+        )
+
+    def test_not_folded_by_default(self):
+        self.assertGeneratedOutput(
+            """
+            void test() {
+                int a = (1 << 4) | 0x10;
+            }
+            """,
+            """
+            def test():
+                a = (1 << 4) | 0x10
+            """
+        )
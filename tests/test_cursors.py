@@ -0,0 +1,79 @@
+from __future__ import unicode_literals
+
+from tests.utils import ConverterTestCase
+
+
+class CursorsTestCase(ConverterTestCase):
+    def test_walk_buffer(self):
+        self.assertGeneratedOutput(
+            """
+            int sum(const unsigned char *data, int size) {
+                const unsigned char *p = data;
+                const unsigned char *end = data + size;
+                int total = 0;
+                while (p < end) {
+                    total += *p++;
+                }
+                return total;
+            }
+            """,
+            """
+            def sum(data, size):
+                p = data
+                p_pos = 0
+                end = data
+                end_pos = size
+                total = 0
+                while p_pos < end_pos:
+                    total += p[p_pos]
+                    p_pos += 1
+                return total
+            """
+        )
+
+    def test_views(self):
+        self.assertGeneratedOutput(
+            """
+            int checksum(const unsigned char *data, int size) {
+                return size;
+            }
+
+            int header(const unsigned char *packet) {
+                unsigned char buf[8];
+                buf[0] = *(packet + 2);
+                return checksum(packet + 4, 8) + checksum(buf + 1, 4);
+            }
+            """,
+            """
+            def checksum(data, size):
+                return size
+
+
+            def header(packet):
+                buf = bytearray(8)
+                buf[0] = packet[2]
+                return checksum(memoryview(packet)[4:], 8) + checksum(memoryview(buf)[1:], 4)
+            """
+        )
+
+    def test_compare(self):
+        self.assertGeneratedOutput(
+            """
+            int skip_spaces(const char *p, const char *end) {
+                const char *start = p;
+                while (p < end && *p == ' ') {
+                    p++;
+                }
+                return p - start;
+            }
+            """,
+            """
+            def skip_spaces(p, end):
+                p_pos = 0
+                start = p
+                start_pos = p_pos
+                while len(end) < (len(p) - p_pos) and p[p_pos] == ' ':
+                    p_pos += 1
+                return p_pos - start_pos
+            """
+        )
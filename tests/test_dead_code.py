@@ -0,0 +1,68 @@
+from __future__ import unicode_literals
+
+from tests.utils import ConverterTestCase
+
+
+class DeadCodeTestCase(ConverterTestCase):
+    def test_constant_branches(self):
+        self.assertGeneratedOutput(
+            """
+            #define DEBUG 0
+
+            void trace(int x);
+
+            int test(int x) {
+                if (DEBUG) {
+                    trace(x);
+                }
+                if (1) {
+                    x += 1;
+                } else {
+                    x -= 1;
+                }
+                while (0) {
+                    trace(x);
+                }
+                do {
+                    x *= 2;
+                } while (0);
+                return x;
+                trace(x);
+            }
+            """,
+            """
+            def test(x):
+                x += 1
+                x *= 2
+                return x
+            """,
+            eliminate_dead_code=True
+        )
+
+    def test_unused_locals(self):
+        self.assertGeneratedOutput(
+            """
+            int next();
+
+            int test(int n) {
+                int total = 0;
+                int twice = n * 2;
+                int skipped = next();
+                int half = twice / 2;
+                for (int i = 0; i < n; i++) {
+                    total += i;
+                    half = i;
+                }
+                return total;
+            }
+            """,
+            """
+            def test(n):
+                total = 0
+                next()
+                for i in range(n):
+                    total += i
+                return total
+            """,
+            eliminate_dead_code=True
+        )
@@ -0,0 +1,174 @@
+from __future__ import unicode_literals
+
+from tests.utils import ConverterTestCase
+
+
+class DestructorsTestCase(ConverterTestCase):
+    def test_drop_memory_only(self):
+        self.assertGeneratedOutput(
+            """
+            class Buffer {
+                int *data;
+              public:
+                Buffer() {
+                    this->data = nullptr;
+                }
+
+                ~Buffer() {
+                    delete[] this->data;
+                    this->data = nullptr;
+                }
+            };
+            """,
+            """
+            class Buffer:
+                def __init__(self):
+                    self.data = None
+            """,
+            destructors='drop'
+        )
+
+    def test_finalize(self):
+        self.assertGeneratedOutput(
+            """
+            void release(int handle);
+
+            class Handle {
+                int handle;
+              public:
+                Handle(int handle) {
+                    this->handle = handle;
+                }
+
+                ~Handle() {
+                    release(this->handle);
+                }
+            };
+            """,
+            """
+            import weakref
+
+
+            class Handle:
+                def __init__(self, handle):
+                    self.handle = handle
+                    weakref.finalize(self, Handle._finalize, self.handle)
+
+                @staticmethod
+                def _finalize(handle):
+                    release(handle)
+            """,
+            destructors='finalize'
+        )
+
+    def test_finalize_slots(self):
+        self.assertGeneratedOutput(
+            """
+            void release(int handle);
+
+            class Handle {
+                int handle;
+              public:
+                Handle(int handle) {
+                    this->handle = handle;
+                }
+
+                ~Handle() {
+                    release(this->handle);
+                }
+            };
+            """,
+            """
+            import weakref
+
+
+            class Handle:
+                __slots__ = ('handle', '__weakref__')
+
+                def __init__(self, handle):
+                    self.handle = handle
+                    weakref.finalize(self, Handle._finalize, self.handle)
+
+                @staticmethod
+                def _finalize(handle):
+                    release(handle)
+            """,
+            destructors='finalize',
+            slots=True
+        )
+
+    def test_finalize_early_return(self):
+        self.assertGeneratedOutput(
+            """
+            void release(int handle);
+
+            class Handle {
+                int handle;
+              public:
+                Handle(int handle) {
+                    this->handle = handle;
+                    if (handle < 0) {
+                        return;
+                    }
+                    this->handle = handle + 1;
+                }
+
+                ~Handle() {
+                    release(this->handle);
+                }
+            };
+            """,
+            """
+            class Handle:
+                def __init__(self, handle):
+                    self.handle = handle
+                    if handle < 0:
+                        return
+                    self.handle = handle + 1
+
+                def __del__(self):
+                    release(self.handle)
+            """,
+            destructors='finalize'
+        )
+
+    def test_close(self):
+        self.assertGeneratedOutput(
+            """
+            void release(int handle);
+
+            class Handle {
+                int handle;
+              public:
+                Handle(int handle) {
+                    this->handle = handle;
+                }
+
+                ~Handle() {
+                    release(this->handle);
+                }
+
+                void reset(int handle) {
+                    this->handle = handle;
+                }
+            };
+            """,
+            """
+            class Handle:
+                def __init__(self, handle):
+                    self.handle = handle
+
+                def close(self):
+                    release(self.handle)
+
+                def __enter__(self):
+                    return self
+
+                def __exit__(self, *exc_info):
+                    self.close()
+
+                def reset(self, handle):
+                    self.handle = handle
+            """,
+            destructors='close'
+        )
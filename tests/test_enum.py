@@ -159,3 +159,39 @@ class EnumTestCase(ConverterTestCase):
                 position = Bar.TOP
             """
         )
+
+    def test_inline_enum_reference(self):
+        self.assertGeneratedOutput(
+            """
+                enum Bar {
+                    TOP,
+                    RIGHT,
+                    BOTTOM,
+                    LEFT
+                };
+
+                bool test(Bar position) {
+                    if (position == LEFT || position == RIGHT) {
+                        return true;
+                    }
+                    return position == BOTTOM;
+                }
+            """,
+            """
+            from enum import Enum
+
+
+            class Bar(int, Enum):
+                TOP = 0
+                RIGHT = 1
+                BOTTOM = 2
+                LEFT = 3
+
+
+            def test(position):
+                if position == 3 or position == 1:  # Bar.LEFT; Bar.RIGHT
+                    return True
+                return position == 2  # Bar.BOTTOM
+            """,
+            inline_enums=True
+        )
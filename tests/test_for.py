@@ -15,9 +15,8 @@ class ForTestCase(ConverterTestCase):
             """,
             """
             def test():
-                i = 0
-                while i < 15:
-                    i += 1
+                for i in range(15):
+                    pass
             """
         )
 
@@ -77,12 +76,120 @@ class ForTestCase(ConverterTestCase):
                 }
             }
 
+            """,
+            """
+            def test():
+                for i in range(15):
+                    if i < 5:
+                        continue
+            """
+        )
+
+    def test_for_range_step(self):
+        self.assertGeneratedOutput(
+            """
+            void test(int n) {
+                for (int i = 1; i <= n; i += 2) {
+                }
+                for (int j = 10; j >= 0; j--) {
+                }
+            }
+
+            """,
+            """
+            def test(n):
+                for i in range(1, n + 1, 2):
+                    pass
+                for j in range(10, -1, -1):
+                    pass
+            """
+        )
+
+    def test_for_modified_variable(self):
+        self.assertGeneratedOutput(
+            """
+            void test() {
+                for (int i = 0; i < 15; i++) {
+                    if (i == 5) {
+                        i += 2;
+                    }
+                }
+            }
+
             """,
             """
             def test():
                 i = 0
                 while i < 15:
-                    if i < 5:
+                    if i == 5:
+                        i += 2
+                    i += 1
+            """
+        )
+
+    def test_for_typedef(self):
+        self.assertGeneratedOutput(
+            """
+            typedef unsigned long count_t;
+
+            int test(count_t n) {
+                int total = 0;
+                for (count_t i = 0; i < n; i++) {
+                    total += i;
+                }
+                return total;
+            }
+            """,
+            """
+            count_t = int
+
+
+            def test(n):
+                total = 0
+                for i in range(n):
+                    total += i
+                return total
+            """
+        )
+
+    def test_for_modified_bound(self):
+        self.assertGeneratedOutput(
+            """
+            void test(int n) {
+                for (int i = 0; i < n; i++) {
+                    n--;
+                }
+            }
+
+            """,
+            """
+            def test(n):
+                i = 0
+                while i < n:
+                    n -= 1
+                    i += 1
+            """
+        )
+
+    def test_for_continue_while(self):
+        self.assertGeneratedOutput(
+            """
+            void test(int n) {
+                for (int i = 0; i < n; i++) {
+                    if (i == 5) {
+                        n--;
+                        continue;
+                    }
+                }
+            }
+
+            """,
+            """
+            def test(n):
+                i = 0
+                while i < n:
+                    if i == 5:
+                        n -= 1
                         i += 1
                         continue
                     i += 1
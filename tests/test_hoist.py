@@ -0,0 +1,91 @@
+from __future__ import unicode_literals
+
+from tests.utils import ConverterTestCase
+
+
+class HoistTestCase(ConverterTestCase):
+    def test_hoist_lookups(self):
+        self.assertGeneratedOutput(
+            """
+            int LIMIT = 10;
+            const int SCALE = 3;
+
+            int twice(int x) {
+                return x * 2;
+            }
+
+            class Counter {
+                int total;
+                int step;
+              public:
+                void run(int n) {
+                    for (int i = 0; i < n; i++) {
+                        this->total += twice(i) * SCALE + LIMIT;
+                    }
+                }
+
+                int sum(int n) {
+                    int s = 0;
+                    while (s < n) {
+                        s += this->step + LIMIT;
+                    }
+                    return s;
+                }
+            };
+            """,
+            """
+            LIMIT = 10
+
+            SCALE = 3
+
+
+            def twice(x):
+                return x * 2
+
+
+            class Counter:
+                def run(self, n):
+                    _twice = twice
+                    _SCALE = SCALE
+                    for i in range(n):
+                        self.total += _twice(i) * _SCALE + LIMIT
+
+                def sum(self, n):
+                    s = 0
+                    _step = self.step
+                    _LIMIT = LIMIT
+                    while s < n:
+                        s += _step + _LIMIT
+                    return s
+            """,
+            hoist_lookups=True
+        )
+
+    def test_writes(self):
+        self.assertGeneratedOutput(
+            """
+            class Counter {
+                int total;
+                int step;
+              public:
+                void run(Counter *other, int n) {
+                    int i = 0;
+                    while (i < n) {
+                        other->step = i;
+                        this->total = this->total + this->step;
+                        i++;
+                    }
+                }
+            };
+            """,
+            """
+            class Counter:
+                def run(self, other, n):
+                    i = 0
+                    while i < n:
+                        other.step = i
+                        self.total = self.total + self.step
+                        i += 1
+            """,
+            hoist_lookups=True
+        )
@@ -0,0 +1,118 @@
+from __future__ import unicode_literals
+
+from tests.utils import ConverterTestCase
+
+
+class InlineTestCase(ConverterTestCase):
+    def test_accessors(self):
+        self.assertGeneratedOutput(
+            """
+            class Foo {
+                int m_x;
+              public:
+                int x() { return this->m_x; }
+                void set_x(int x) { this->m_x = x; }
+            };
+
+            void test(Foo *foo) {
+                int y = foo->x();
+                foo->set_x(y + 1);
+            }
+            """,
+            """
+            class Foo:
+                def x(self):
+                    return self.m_x
+
+                def set_x(self, x):
+                    self.m_x = x
+
+
+            def test(foo):
+                y = foo.m_x
+                foo.m_x = y + 1
+            """,
+            inline=True
+        )
+
+    def test_functions(self):
+        self.assertGeneratedOutput(
+            """
+            int add(int a, int b) {
+                return a + b;
+            }
+
+            int test(int c) {
+                int d = add(c, 2) * 3;
+                return add(d, c * 2);
+            }
+            """,
+            """
+            def add(a, b):
+                return a + b
+
+
+            def test(c):
+                d = (c + 2) * 3
+                return d + (c * 2)
+            """,
+            inline=True
+        )
+
+    def test_not_inlined(self):
+        self.assertGeneratedOutput(
+            """
+            class Foo {
+                int m_x;
+              public:
+                virtual int x() { return this->m_x; }
+            };
+
+            int fact(int n) {
+                return n ? n * fact(n - 1) : 1;
+            }
+
+            void test(Foo *foo) {
+                int a = foo->x();
+                int b = fact(3);
+            }
+            """,
+            """
+            class Foo:
+                def x(self):
+                    return self.m_x
+
+
+            def fact(n):
+                return n * fact(n - 1) if n else 1
+
+
+            def test(foo):
+                a = foo.x()
+                b = fact(3)
+            """,
+            inline=True
+        )
+
+    def test_size(self):
+        self.assertGeneratedOutput(
+            """
+            int add(int a, int b) {
+                return a + b;
+            }
+
+            int test(int c) {
+                return add(c, 2);
+            }
+            """,
+            """
+            def add(a, b):
+                return a + b
+
+
+            def test(c):
+                return add(c, 2)
+            """,
+            inline=True,
+            inline_size=3
+        )
@@ -0,0 +1,78 @@
+from __future__ import unicode_literals
+
+from tests.utils import ConverterTestCase
+
+
+class LazyBodiesTestCase(ConverterTestCase):
+    def test_lazy_bodies(self):
+        self.assertGeneratedOutput(
+            """
+            const int SCALE = 3;
+
+            int scale(int x) {
+                return x * SCALE;
+            }
+
+            class Counter {
+                int total;
+              public:
+                Counter() {
+                    this->total = 0;
+                }
+
+                void add(int n) {
+                    this->total += scale(n);
+                }
+
+                ~Counter() {
+                    this->total = 0;
+                }
+            };
+            """,
+            """
+            SCALE = 3
+
+
+            def scale(x):
+                return x * SCALE
+
+
+            class Counter:
+                def __init__(self):
+                    self.total = 0
+
+                def __del__(self):
+                    self.total = 0
+
+                def add(self, n):
+                    self.total += scale(n)
+            """,
+            lazy_bodies=True
+        )
+
+    def test_entries(self):
+        self.assertGeneratedOutput(
+            """
+            int twice(int x) {
+                return x * 2;
+            }
+
+            int thrice(int x) {
+                return x * 3;
+            }
+
+            int test(int x) {
+                return twice(x) + 1;
+            }
+            """,
+            """
+            def twice(x):
+                return x * 2
+
+
+            def test(x):
+                return twice(x) + 1
+            """,
+            entries=['test'],
+            lazy_bodies=True
+        )
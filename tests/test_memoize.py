@@ -0,0 +1,197 @@
+from __future__ import unicode_literals
+
+from tests.utils import ConverterTestCase
+
+
+class MemoizeTestCase(ConverterTestCase):
+    def test_lru_cache(self):
+        self.assertGeneratedOutput(
+            """
+            int scale = 3;
+
+            __attribute__((const)) int fib(int n) {
+                return n < 2 ? n : fib(n - 1) + fib(n - 2);
+            }
+
+            constexpr int square(int x) {
+                return x * x;
+            }
+
+            __attribute__((pure)) int scaled(int x) {
+                return x * scale;
+            }
+
+            int plain(int x) {
+                return x + 1;
+            }
+            """,
+            """
+            import functools
+
+
+            scale = 3
+
+
+            @functools.lru_cache(maxsize=128)
+            def fib(n):
+                return n if n < 2 else fib(n - 1) + fib(n - 2)
+
+
+            @functools.lru_cache(maxsize=128)
+            def square(x):
+                return x * x
+
+
+            def scaled(x):
+                return x * scale
+
+
+            def plain(x):
+                return x + 1
+            """,
+            memoize='lru_cache'
+        )
+
+    def test_dict(self):
+        self.assertGeneratedOutput(
+            """
+            __attribute__((const)) int distance(int x, int y);
+
+            int distance(int x, int y) {
+                return x * x + y * y;
+            }
+            """,
+            """
+            def _distance(x, y):
+                return x * x + y * y
+
+
+            _distance_cache = {}
+
+
+            def distance(x, y):
+                try:
+                    return _distance_cache[(x, y)]
+                except KeyError:
+                    if len(_distance_cache) >= 16:
+                        _distance_cache.clear()
+                    result = _distance_cache[(x, y)] = _distance(x, y)
+                    return result
+            """,
+            memoize='dict',
+            memoize_size=16
+        )
+
+    def test_dict_defaults(self):
+        self.assertGeneratedOutput(
+            """
+            __attribute__((const)) int power(int x, int n = 2) {
+                return n == 0 ? 1 : x * power(x, n - 1);
+            }
+            """,
+            """
+            def _power(x, n=2):
+                return 1 if n == 0 else x * power(x, n - 1)
+
+
+            _power_cache = {}
+
+
+            def power(x, n=2):
+                try:
+                    return _power_cache[(x, n)]
+                except KeyError:
+                    if len(_power_cache) >= 16:
+                        _power_cache.clear()
+                    result = _power_cache[(x, n)] = _power(x, n)
+                    return result
+            """,
+            memoize='dict',
+            memoize_size=16
+        )
+
+    def test_pointers(self):
+        self.assertGeneratedOutput(
+            """
+            __attribute__((pure)) int length(const char *s) {
+                int n = 0;
+                while (s[n]) {
+                    n++;
+                }
+                return n;
+            }
+            """,
+            """
+            def length(s):
+                n = 0
+                while s[n]:
+                    n += 1
+                return n
+            """,
+            memoize='lru_cache'
+        )
+
+    def test_result_parameter(self):
+        self.assertGeneratedOutput(
+            """
+            __attribute__((const)) int offset(int result) {
+                return result + 1;
+            }
+            """,
+            """
+            def _offset(result):
+                return result + 1
+
+
+            _offset_cache = {}
+
+
+            def offset(result):
+                try:
+                    return _offset_cache[result]
+                except KeyError:
+                    if len(_offset_cache) >= 16:
+                        _offset_cache.clear()
+                    _result = _offset_cache[result] = _offset(result)
+                    return _result
+            """,
+            memoize='dict',
+            memoize_size=16
+        )
+
+    def test_mutable_result(self):
+        self.assertGeneratedOutput(
+            """
+            struct Point {
+                int x;
+                int y;
+            };
+
+            __attribute__((const)) Point make(int x) {
+                return Point();
+            }
+
+            __attribute__((const)) double half(int x) {
+                return x / 2.0;
+            }
+            """,
+            """
+            import functools
+
+
+            class Point:
+                def __init__(self, x=None, y=None):
+                    self.x = x
+                    self.y = y
+
+
+            def make(x):
+                return Point()
+
+
+            @functools.lru_cache(maxsize=128)
+            def half(x):
+                return x / 2.0
+            """,
+            memoize='lru_cache'
+        )
@@ -0,0 +1,175 @@
+from __future__ import unicode_literals
+
+from tests.utils import ConverterTestCase
+
+
+class NumpyTestCase(ConverterTestCase):
+    def test_elementwise(self):
+        self.assertGeneratedOutput(
+            """
+            double scale(const double *a, double k, int n) {
+                double out[8];
+                double total = 0;
+                for (int i = 0; i < n; i++) {
+                    out[i] = a[i] * k + i;
+                    total += a[i] * out[i];
+                }
+                return total;
+            }
+            """,
+            """
+            from array import array
+            import numpy
+
+
+            def scale(a, k, n):
+                out = array('d', [0.0]) * 8
+                total = 0
+                _n = max(n, 0)
+                out[:_n] = array('d', (numpy.asarray(a[:_n]) * k + numpy.arange(_n)).tolist())
+                total += numpy.sum(numpy.asarray(a[:_n]) * numpy.asarray(out[:_n])).item()
+                return total
+            """,
+            numpy=True
+        )
+
+    def test_step(self):
+        self.assertGeneratedOutput(
+            """
+            void test() {
+                int counts[16];
+                for (int i = 0; i < 16; i += 2) {
+                    counts[i] += i * 3;
+                }
+            }
+            """,
+            """
+            from array import array
+            import numpy
+
+
+            def test():
+                counts = array('i', [0]) * 16
+                counts[:16:2] = array('i', (numpy.asarray(counts[:16:2]) + numpy.arange(0, 16, 2) * 3).tolist())
+            """,
+            numpy=True
+        )
+
+    def test_inclusive_bound(self):
+        self.assertGeneratedOutput(
+            """
+            void test(double *a, int n) {
+                double b[8];
+                for (int i = 0; i <= n; i++) {
+                    b[i] = a[i] * 2;
+                }
+            }
+            """,
+            """
+            from array import array
+            import numpy
+
+
+            def test(a, n):
+                b = array('d', [0.0]) * 8
+                _stop = max(n + 1, 0)
+                b[:_stop] = array('d', (numpy.asarray(a[:_stop]) * 2).tolist())
+            """,
+            numpy=True
+        )
+
+    def test_promotion(self):
+        self.assertGeneratedOutput(
+            """
+            void test() {
+                short a[8];
+                int b[8];
+                for (int i = 0; i < 8; i++) {
+                    b[i] = a[i] * a[i];
+                }
+            }
+            """,
+            """
+            from array import array
+            import numpy
+
+
+            def test():
+                a = array('h', [0]) * 8
+                b = array('i', [0]) * 8
+                b[:8] = array('i', (numpy.asarray(a[:8]).astype(numpy.int64) * numpy.asarray(a[:8]).astype(numpy.int64)).tolist())
+            """,
+            numpy=True
+        )
+
+    def test_integer_reduction(self):
+        self.assertGeneratedOutput(
+            """
+            int test(const int *a, int n) {
+                int counts[8];
+                int total = 0;
+                for (int i = 0; i < n; i++) {
+                    total += a[i];
+                }
+                for (int i = 0; i < n; i++) {
+                    total += counts[i];
+                }
+                return total;
+            }
+            """,
+            """
+            from array import array
+            import numpy
+
+
+            def test(a, n):
+                counts = array('i', [0]) * 8
+                total = 0
+                for i in range(n):
+                    total += a[i]
+                _n = max(n, 0)
+                total += numpy.sum(numpy.asarray(counts[:_n])).item()
+                return total
+            """,
+            numpy=True
+        )
+
+    def test_not_vectorized(self):
+        self.assertGeneratedOutput(
+            """
+            int twice(int x) {
+                return x * 2;
+            }
+
+            void test(double *a, int n) {
+                double b[8];
+                for (int i = 1; i < 8; i++) {
+                    b[i] = b[i - 1] + a[i];
+                }
+                for (int i = 0; i < 8; i++) {
+                    b[i] = twice(i);
+                }
+                for (int i = 0; i < n; i++) {
+                    a[i] = b[i];
+                }
+            }
+            """,
+            """
+            from array import array
+
+
+            def twice(x):
+                return x * 2
+
+
+            def test(a, n):
+                b = array('d', [0.0]) * 8
+                for i in range(1, 8):
+                    b[i] = b[i - 1] + a[i]
+                for i in range(8):
+                    b[i] = twice(i)
+                for i in range(n):
+                    a[i] = b[i]
+            """,
+            numpy=True
+        )
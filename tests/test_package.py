@@ -0,0 +1,237 @@
+from __future__ import unicode_literals
+
+import io
+import os
+import shutil
+import tempfile
+
+from tests.utils import ConverterTestCase, adjust, capture_output
+from seasnake.parser import CodeConverter
+
+
+class PackageTestCase(ConverterTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assertPackageOutput(self, cpp, py, **kwargs):
+        self.maxDiff = None
+        converter = CodeConverter('test')
+
+        with capture_output(redirect_stdout=False) as console:
+            converter.parse_text([('test.cpp', adjust(cpp))], flags=['-std=c++0x'])
+        self.assertEqual('', console.getvalue())
+
+        filenames = converter.write(self.directory, **kwargs)
+        self.assertEqual(
+            sorted(os.path.relpath(f, self.directory) for f in filenames),
+            sorted(filename for filename, content in py)
+        )
+
+        for filename, content in py:
+            with io.open(os.path.join(self.directory, filename), encoding='utf-8') as f:
+                self.assertEqual(adjust(content), f.read())
+
+    def test_lazy_submodules(self):
+        self.assertPackageOutput(
+            """
+            namespace N {
+                class C {};
+            }
+
+            namespace M {
+                void test() {}
+            }
+
+            using N::C;
+            """,
+            [
+                (
+                    'test/__init__.py',
+                    """
+                    _submodules = ('M', 'N')
+                    _exports = {
+                        'C': 'test.N',
+                    }
+
+
+                    def __getattr__(name):
+                        import importlib
+                        if name in _submodules:
+                            return importlib.import_module('%s.%s' % (__name__, name))
+                        elif name in _exports:
+                            value = getattr(importlib.import_module(_exports[name]), name)
+                            globals()[name] = value
+                            return value
+                        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+                    def __dir__():
+                        return sorted(set(globals()) | set(_submodules) | set(_exports))
+                    """
+                ),
+                (
+                    'test/N.py',
+                    """
+                    class C:
+                        pass
+                    """
+                ),
+                (
+                    'test/M.py',
+                    """
+                    def test():
+                        pass
+                    """
+                ),
+            ]
+        )
+
+    def test_eager_submodules(self):
+        self.assertPackageOutput(
+            """
+            namespace N {
+                class C {};
+            }
+
+            namespace M {
+                void test() {}
+            }
+
+            using N::C;
+            """,
+            [
+                (
+                    'test/__init__.py',
+                    """
+                    from . import M, N
+                    from test.N import C
+                    """
+                ),
+                (
+                    'test/N.py',
+                    """
+                    class C:
+                        pass
+                    """
+                ),
+                (
+                    'test/M.py',
+                    """
+                    def test():
+                        pass
+                    """
+                ),
+            ],
+            lazy=False
+        )
+
+    def test_no_submodules(self):
+        self.assertPackageOutput(
+            """
+            void test() {}
+            """,
+            [
+                (
+                    'test.py',
+                    """
+                    def test():
+                        pass
+                    """
+                ),
+            ]
+        )
+
+    def test_shards(self):
+        self.assertPackageOutput(
+            """
+            class A {};
+
+            class B : public A {};
+
+            void test() {
+                B *b = new B();
+            }
+            """,
+            [
+                (
+                    '_test_shard0.py',
+                    """
+                    class A:
+                        pass
+                    """
+                ),
+                (
+                    '_test_shard1.py',
+                    """
+                    from _test_shard0 import A
+
+
+                    class B(A):
+                        pass
+                    """
+                ),
+                (
+                    '_test_shard2.py',
+                    """
+                    from _test_shard1 import B
+
+
+                    def test():
+                        b = B()
+                    """
+                ),
+                (
+                    'test.py',
+                    """
+                    _submodules = ()
+                    _exports = {
+                        'A': '_test_shard0',
+                        'B': '_test_shard1',
+                        'test': '_test_shard2',
+                    }
+
+
+                    def __getattr__(name):
+                        import importlib
+                        if name in _submodules:
+                            return importlib.import_module('%s.%s' % (__name__, name))
+                        elif name in _exports:
+                            value = getattr(importlib.import_module(_exports[name]), name)
+                            globals()[name] = value
+                            return value
+                        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+                    def __dir__():
+                        return sorted(set(globals()) | set(_submodules) | set(_exports))
+                    """
+                ),
+            ],
+            shard_declarations=1
+        )
+
+    def test_small_module_not_sharded(self):
+        self.assertPackageOutput(
+            """
+            class A {};
+
+            void test() {}
+            """,
+            [
+                (
+                    'test.py',
+                    """
+                    class A:
+                        pass
+
+
+                    def test():
+                        pass
+                    """
+                ),
+            ],
+            shard_lines=100
+        )
@@ -0,0 +1,91 @@
+from __future__ import unicode_literals
+
+from tests.utils import ConverterTestCase
+
+
+class SlotsTestCase(ConverterTestCase):
+    def test_empty_class(self):
+        self.assertGeneratedOutput(
+            """
+            class Foo {};
+            """,
+            """
+            class Foo:
+                __slots__ = ('__weakref__',)
+            """,
+            slots=True
+        )
+
+    def test_struct(self):
+        self.assertGeneratedOutput(
+            """
+            struct Foo {
+                float x;
+                float y;
+            };
+            """,
+            """
+            class Foo:
+                __slots__ = ('x', 'y', '__weakref__')
+
+                def __init__(self, x=None, y=None):
+                    self.x = x
+                    self.y = y
+            """,
+            slots=True
+        )
+
+    def test_class_with_super(self):
+        self.assertGeneratedOutput(
+            """
+            class Bar {
+                int m_x = 1;
+
+              public:
+                Bar() {
+                }
+            };
+
+            class Foo : public Bar {
+                int m_y = 2;
+
+              public:
+                Foo() {
+                }
+            };
+            """,
+            """
+            class Bar:
+                __slots__ = ('m_x', '__weakref__')
+
+                def __init__(self):
+                    self.m_x = 1
+
+
+            class Foo(Bar):
+                __slots__ = ('m_y',)
+
+                def __init__(self):
+                    self.m_y = 2
+            """,
+            slots=True
+        )
+
+    def test_union(self):
+        self.assertGeneratedOutput(
+            """
+            union Foo {
+                int i;
+                float f;
+            };
+            """,
+            """
+            class Foo:
+                __slots__ = ('i', 'f', '__weakref__')
+
+                def __init__(self, i=None, f=None):
+                    self.i = i
+                    self.f = f
+            """,
+            slots=True
+        )
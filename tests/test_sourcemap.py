@@ -0,0 +1,99 @@
+from __future__ import unicode_literals
+
+from io import StringIO
+import os
+import shutil
+import tempfile
+import unittest
+
+from seasnake.sourcemap import SourceMap, rewrite
+from seasnake.writer import CodeWriter
+
+
+class Node(object):
+    def __init__(self, location):
+        self.location = location
+
+
+class SourceMapWriterTests(unittest.TestCase):
+    def test_marked_lines(self):
+        "Each generated line is mapped to the most recently marked node"
+        buf = StringIO()
+        out = CodeWriter(buf, source_map=True)
+
+        out.mark(Node(('test.cpp', 1, 1)))
+        out.clear_major_block()
+        out.write('def test():')
+        out.start_block()
+        out.clear_line()
+        out.mark(Node(('test.cpp', 2, 5)))
+        out.write('if x:')
+        out.start_block()
+        out.clear_line()
+        out.mark(Node(('test.cpp', 3, 9)))
+        out.write('return 1')
+        out.end_block()
+        out.clear_line()
+        out.write('else:')
+        out.end_block()
+
+        self.assertEqual(
+            buf.getvalue(),
+            'def test():\n    if x:\n        return 1\n    else:'
+        )
+        self.assertEqual(out.source_map, {
+            1: ('test.cpp', 1, 1),
+            2: ('test.cpp', 2, 5),
+            3: ('test.cpp', 3, 9),
+            4: ('test.cpp', 2, 5),
+        })
+
+    def test_no_source_map(self):
+        "Marks are ignored if no source map was requested"
+        out = CodeWriter(StringIO())
+        out.mark(Node(('test.cpp', 1, 1)))
+        out.write('x = 1')
+        self.assertIsNone(out.source_map)
+
+
+class SourceMapRewriteTests(unittest.TestCase):
+    def setUp(self):
+        self.source_map = SourceMap('/tmp/output/test.py', {
+            3: ('/src/test.cpp', 10, 5),
+        })
+
+    def test_profile_output(self):
+        "cProfile and sampling profiler references are rewritten"
+        self.assertEqual(
+            rewrite('  100  0.5  /tmp/output/test.py:3(test)', [self.source_map]),
+            '  100  0.5  /src/test.cpp:10:5(test)',
+        )
+        self.assertEqual(
+            rewrite('test (test.py:3)', [self.source_map]),
+            'test (/src/test.cpp:10:5)',
+        )
+
+    def test_traceback(self):
+        "Traceback references are rewritten"
+        self.assertEqual(
+            rewrite('  File "/tmp/output/test.py", line 3, in test', [self.source_map]),
+            '  File "/src/test.cpp", line 10, column 5, in test',
+        )
+
+    def test_unmapped(self):
+        "References to unmapped lines and files are left alone"
+        text = 'test.py:4(test)\nother.py:3(other)'
+        self.assertEqual(rewrite(text, [self.source_map]), text)
+
+    def test_save_and_load(self):
+        "Source maps can be saved and reloaded"
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'test.py.map')
+            self.source_map.save(filename)
+            loaded = SourceMap.load(filename)
+            self.assertEqual(loaded.filename, self.source_map.filename)
+            self.assertEqual(loaded.lookup(3), ('/src/test.cpp', 10, 5))
+            self.assertIsNone(loaded.lookup(4))
+        finally:
+            shutil.rmtree(directory)
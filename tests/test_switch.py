@@ -0,0 +1,309 @@
+from __future__ import unicode_literals
+
+from tests.utils import ConverterTestCase
+
+
+class SwitchTestCase(ConverterTestCase):
+    def test_switch(self):
+        self.assertGeneratedOutput(
+            """
+            int test(int x) {
+                int y = 0;
+                switch (x) {
+                    case 1:
+                    case 2:
+                        y = 10;
+                        break;
+                    case 3:
+                        y = 20;
+                    case 4:
+                        y += 1;
+                        break;
+                    default:
+                        y = -1;
+                }
+                return y;
+            }
+            """,
+            """
+            def test(x):
+                y = 0
+                if x in (1, 2):
+                    y = 10
+                elif x == 3:
+                    y = 20
+                    y += 1
+                elif x == 4:
+                    y += 1
+                else:
+                    y = -1
+                return y
+            """
+        )
+
+    def test_switch_expression(self):
+        self.assertGeneratedOutput(
+            """
+            int test(int x) {
+                switch (x + 1) {
+                    case 1:
+                        return 10;
+                    case 2:
+                        return 20;
+                }
+                return 0;
+            }
+            """,
+            """
+            def test(x):
+                _switch = x + 1
+                if _switch == 1:
+                    return 10
+                elif _switch == 2:
+                    return 20
+                return 0
+            """
+        )
+
+    def test_early_break(self):
+        self.assertGeneratedOutput(
+            """
+            void test(int x, int y) {
+                switch (x) {
+                    case 1:
+                        if (y > 0) {
+                            break;
+                        }
+                        y = 0;
+                        break;
+                    default:
+                        y = 1;
+                }
+            }
+            """,
+            """
+            def test(x, y):
+                while True:
+                    if x == 1:
+                        if y > 0:
+                            break
+                        y = 0
+                    else:
+                        y = 1
+                    break
+            """
+        )
+
+    def test_value_table(self):
+        self.assertGeneratedOutput(
+            """
+            int test(int x) {
+                switch (x) {
+                    case 0: return 10;
+                    case 1: return 11;
+                    case 2: return 12;
+                    case 3: return 13;
+                    case 4: return 14;
+                    case 5: return 15;
+                    case 6: return 16;
+                    case 7: return 17;
+                    default: return -1;
+                }
+            }
+            """,
+            """
+            def test(x):
+                return _switch_table0.get(x, -1)
+
+
+            _switch_table0 = {
+                0: 10,
+                1: 11,
+                2: 12,
+                3: 13,
+                4: 14,
+                5: 15,
+                6: 16,
+                7: 17,
+            }
+            """
+        )
+
+    def test_index_table(self):
+        self.assertGeneratedOutput(
+            """
+            void test(int x) {
+                int y = 0;
+                switch (x) {
+                    case 0: y = 1; break;
+                    case 1: y += 2; break;
+                    case 2:
+                    case 3: y = 3;
+                    case 4: y *= 4; break;
+                    case 5: y = 5; break;
+                    case 6: y -= 6; break;
+                    case 7: y = 7; break;
+                }
+            }
+            """,
+            """
+            def test(x):
+                y = 0
+                _case = _switch_table0.get(x, -1)
+                if _case < 3:
+                    if _case == 0:
+                        y = 1
+                    elif _case == 1:
+                        y += 2
+                    elif _case == 2:
+                        y = 3
+                        y *= 4
+                else:
+                    if _case < 5:
+                        if _case == 3:
+                            y *= 4
+                        elif _case == 4:
+                            y = 5
+                    else:
+                        if _case == 5:
+                            y -= 6
+                        elif _case == 6:
+                            y = 7
+
+
+            _switch_table0 = {
+                0: 0,
+                1: 1,
+                2: 2,
+                3: 2,
+                4: 3,
+                5: 4,
+                6: 5,
+                7: 6,
+            }
+            """
+        )
+
+    def test_nested_enum_table(self):
+        self.assertGeneratedOutput(
+            """
+            class Light {
+              public:
+                enum Colour {
+                    RED,
+                    GREEN
+                };
+
+                int wavelength(Colour colour) {
+                    switch (colour) {
+                        case RED: return 700;
+                        case GREEN: return 530;
+                        default: return 0;
+                    }
+                }
+            };
+            """,
+            """
+            from enum import Enum
+
+
+            class Light:
+                class Colour(Enum):
+                    RED = 0
+                    GREEN = 1
+
+                def wavelength(self, colour):
+                    return _switch_table0.get(colour, 0)
+
+
+            _switch_table0 = {
+                Light.Colour.RED: 700,
+                Light.Colour.GREEN: 530,
+            }
+            """,
+            switch_table_size=2
+        )
+
+    def test_early_break_continue(self):
+        self.assertGeneratedOutput(
+            """
+            int test(int n, int x) {
+                int total = 0;
+                while (n > 0) {
+                    n--;
+                    switch (x) {
+                        case 1:
+                            if (n > 5) {
+                                break;
+                            }
+                            total += 1;
+                            break;
+                        case 2:
+                            continue;
+                        default:
+                            total += x;
+                    }
+                    total *= 2;
+                }
+                return total;
+            }
+            """,
+            """
+            def test(n, x):
+                total = 0
+                while n > 0:
+                    n -= 1
+                    if x == 1:
+                        if n > 5:
+                            pass
+                        else:
+                            total += 1
+                    elif x == 2:
+                        continue
+                    else:
+                        total += x
+                    total *= 2
+                return total
+            """,
+            switch_table_size=2
+        )
+
+    def test_no_tables(self):
+        self.assertGeneratedOutput(
+            """
+            int test(int x) {
+                switch (x) {
+                    case 0: return 10;
+                    case 1: return 11;
+                    case 2: return 12;
+                    case 3: return 13;
+                    case 4: return 14;
+                    case 5: return 15;
+                    case 6: return 16;
+                    case 7: return 17;
+                }
+                return 0;
+            }
+            """,
+            """
+            def test(x):
+                if x == 0:
+                    return 10
+                elif x == 1:
+                    return 11
+                elif x == 2:
+                    return 12
+                elif x == 3:
+                    return 13
+                elif x == 4:
+                    return 14
+                elif x == 5:
+                    return 15
+                elif x == 6:
+                    return 16
+                elif x == 7:
+                    return 17
+                return 0
+            """,
+            switch_table_size=0
+        )
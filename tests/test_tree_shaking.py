@@ -0,0 +1,86 @@
+from __future__ import unicode_literals
+
+from tests.utils import ConverterTestCase
+
+
+class TreeShakingTestCase(ConverterTestCase):
+    def test_function_entry(self):
+        self.assertGeneratedOutput(
+            """
+            int square(int x) {
+                return x * x;
+            }
+
+            int cube(int x) {
+                return x * x * x;
+            }
+
+            class Point {
+              public:
+                int x;
+                Point(int x) {
+                    this->x = x;
+                }
+            };
+
+            class Unused {
+            };
+
+            int norm(Point *p) {
+                return square(p->x);
+            }
+
+            int distance(int x) {
+                return norm(new Point(x));
+            }
+            """,
+            """
+            def square(x):
+                return x * x
+
+
+            class Point:
+                def __init__(self, x):
+                    self.x = x
+
+
+            def norm(p):
+                return square(p.x)
+
+
+            def distance(x):
+                return norm(Point(x))
+            """,
+            entries=['distance']
+        )
+
+    def test_class_entry(self):
+        self.assertGeneratedOutput(
+            """
+            int twice(int x) {
+                return x * 2;
+            }
+
+            int thrice(int x) {
+                return x * 3;
+            }
+
+            class Counter {
+                int total;
+              public:
+                void add(int n) {
+                    this->total += twice(n);
+                }
+            };
+            """,
+            """
+            def twice(x):
+                return x * 2
+
+
+            class Counter:
+                def add(self, n):
+                    self.total += twice(n)
+            """,
+            entries=['Counter']
+        )
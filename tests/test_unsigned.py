@@ -0,0 +1,116 @@
+from __future__ import unicode_literals
+
+from tests.utils import ConverterTestCase
+
+
+class UnsignedTestCase(ConverterTestCase):
+    def test_hash(self):
+        self.assertGeneratedOutput(
+            """
+            unsigned hash(const unsigned *data, unsigned n) {
+                unsigned h = 5381;
+                for (unsigned i = 0; i < n; i++) {
+                    h = h * 33 + data[i];
+                }
+                return h;
+            }
+            """,
+            """
+            def hash(data, n):
+                h = 5381
+                for i in range(n):
+                    h = (h * 33 + data[i]) & 0xFFFFFFFF
+                return h
+            """
+        )
+
+    def test_range_analysis(self):
+        self.assertGeneratedOutput(
+            """
+            unsigned test(unsigned x) {
+                unsigned y = (x & 0xFFFF) * (x >> 16);
+                unsigned z = y + 1;
+                unsigned neg = -x;
+                unsigned short s = x;
+                x -= 1;
+                return (y | z) % 10;
+            }
+            """,
+            """
+            def test(x):
+                y = (x & 0xFFFF) * (x >> 16)
+                z = (y + 1) & 0xFFFFFFFF
+                neg = -x & 0xFFFFFFFF
+                s = x & 0xFFFF
+                x = (x - 1) & 0xFFFFFFFF
+                return (y | z) % 10
+            """
+        )
+
+    def test_widths(self):
+        self.assertGeneratedOutput(
+            """
+            unsigned long long test(unsigned a, unsigned b) {
+                unsigned long long wide = (unsigned long long) a * b;
+                unsigned long long narrow = a * b;
+                return wide + narrow;
+            }
+            """,
+            """
+            def test(a, b):
+                wide = int(a) * b
+                narrow = (a * b) & 0xFFFFFFFF
+                return (wide + narrow) & 0xFFFFFFFFFFFFFFFF
+            """
+        )
+
+    def test_division(self):
+        self.assertGeneratedOutput(
+            """
+            unsigned test(unsigned x, unsigned y) {
+                unsigned half = x / 2;
+                unsigned rest = (x + y) % y;
+                x /= y;
+                return half / (y + 1);
+            }
+            """,
+            """
+            def test(x, y):
+                half = x // 2
+                rest = ((x + y) & 0xFFFFFFFF) % y
+                x //= y
+                return half // ((y + 1) & 0xFFFFFFFF)
+            """
+        )
+
+    def test_char_codes(self):
+        self.assertGeneratedOutput(
+            """
+            unsigned char test(unsigned char c) {
+                c += 1;
+                c++;
+                return c;
+            }
+            """,
+            """
+            def test(c):
+                c = (c + 1) & 0xFF
+                c = (c + 1) & 0xFF
+                return c
+            """,
+            char_codes=True
+        )
+
+    def test_disabled(self):
+        self.assertGeneratedOutput(
+            """
+            unsigned test(unsigned x) {
+                return x * 33 + 1;
+            }
+            """,
+            """
+            def test(x):
+                return x * 33 + 1
+            """,
+            wrap_unsigned=False
+        )
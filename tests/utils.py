@@ -58,9 +58,9 @@ def adjust(text):
 
 
 class ConverterTestCase(TestCase):
-    def assertGeneratedOutput(self, cpp, py, errors=None, flags=None):
+    def assertGeneratedOutput(self, cpp, py, errors=None, flags=None, **options):
         self.maxDiff = None
-        converter = CodeConverter('test')
+        converter = CodeConverter('test', **options)
 
         # Parse the content
         with capture_output(redirect_stdout=False) as console:
@@ -83,9 +83,9 @@ class ConverterTestCase(TestCase):
         # Compare the generated code to expectation.
         self.assertEqual(adjust(py), buf.getvalue())
 
-    def assertMultifileGeneratedOutput(self, cpp, py, errors=None, flags=None):
+    def assertMultifileGeneratedOutput(self, cpp, py, errors=None, flags=None, **options):
         self.maxDiff = None
-        converter = CodeConverter('test')
+        converter = CodeConverter('test', **options)
 
         # Parse the content of each file
         with capture_output(redirect_stdout=False) as console: